@@ -0,0 +1,298 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.embedding_cache import normalize_text
+from app.core.tracing import span
+
+# Resolve project root (one level above app/)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Relative paths are resolved against the project root
+ANSWER_CACHE_PATH = str(PROJECT_ROOT / os.getenv("ANSWER_CACHE_PATH", "data/answer_cache.db"))
+# Cosine similarity of the question embeddings needed to reuse an answer
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+# Seconds an answer stays servable; 0 disables expiry
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+# LRU bound on stored answers
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+# Tokens with digits ("Q3", "2024", "v2") must match exactly: embeddings
+# rate "Q3 goals" and "Q4 goals" as near-identical questions
+_GUARD_RE = re.compile(r"\w*\d\w*")
+
+
+def question_guard(question: str) -> str:
+    return " ".join(sorted(set(_GUARD_RE.findall(normalize_text(question).lower()))))
+
+
+class AnswerCache:
+    """
+    On-disk semantic cache of RAG answers. An answer is served for a new
+    question asked with the same parameters (model, retrieval settings, ...)
+    when the question embeddings are similar enough. Answers remember the
+    chunk ids they were generated from and are dropped when any of those
+    chunks is re-ingested or deleted (see invalidate_chunks).
+
+    The SQLite file is shared between processes (UI, CLI, ingestion); each
+    process keeps an in-memory matrix of the stored question vectors, reloaded
+    when another process changes the file.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, similarity: float = ANSWER_CACHE_SIMILARITY,
+                 ttl: float = ANSWER_CACHE_TTL, max_entries: int = ANSWER_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.similarity = similarity
+        self.ttl = ttl
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY,
+                    params TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    guard TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used)")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS answer_chunks (
+                    chunk_id TEXT NOT NULL,
+                    answer_id INTEGER NOT NULL REFERENCES answers (id) ON DELETE CASCADE,
+                    PRIMARY KEY (chunk_id, answer_id)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_answer_chunks_answer ON answer_chunks (answer_id)"
+            )
+        # params -> (ids, guards, created_at, matrix of unit question vectors)
+        self._index: Optional[Dict[str, Tuple[List[int], List[str], List[float], np.ndarray]]] = None
+        self._data_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.evicted = 0
+
+    # ---------- In-memory vector index ----------
+
+    def _current_index(self):
+        # Caller holds _lock. data_version changes when another connection commits.
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._index is None or version != self._data_version:
+            grouped: Dict[str, Tuple[List[int], List[str], List[float], List[np.ndarray]]] = {}
+            for row_id, params, guard, blob, created_at in self._conn.execute(
+                "SELECT id, params, guard, vector, created_at FROM answers"
+            ):
+                ids, guards, created, vectors = grouped.setdefault(params, ([], [], [], []))
+                ids.append(row_id)
+                guards.append(guard)
+                created.append(created_at)
+                vectors.append(np.frombuffer(blob, dtype=np.float32))
+            self._index = {
+                params: (ids, guards, created, np.stack(vectors))
+                for params, (ids, guards, created, vectors) in grouped.items()
+            }
+            self._data_version = version
+        return self._index
+
+    # ---------- Lookups / writes ----------
+
+    def lookup(self, params: str, question: str, vector: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Best cached answer for `question` under `params`, or None. Returns
+        {"answer", "question" (the cached one), "similarity"}.
+        """
+        vector = _unit(vector)
+        guard = question_guard(question)
+        now = time.time()
+        with self._lock, span("answer_cache.lookup") as s:
+            entry = self._current_index().get(params)
+            best = None
+            if entry is not None and entry[3].shape[1] == vector.shape[0]:
+                ids, guards, created, matrix = entry
+                sims = matrix @ vector
+                for i in np.argsort(-sims):
+                    if sims[i] < self.similarity:
+                        break
+                    if guards[i] != guard or (self.ttl and now - created[i] > self.ttl):
+                        continue
+                    row = self._conn.execute(
+                        "SELECT question, answer FROM answers WHERE id = ?", (ids[i],)
+                    ).fetchone()
+                    if row is not None:  # may have just been invalidated elsewhere
+                        best = (ids[i], row, float(sims[i]))
+                        break
+            if best is None:
+                self.misses += 1
+                s.set("hit", False)
+                return None
+            row_id, (cached_question, answer), similarity = best
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE answers SET last_used = ?, hits = hits + 1 WHERE id = ?", (now, row_id)
+                )
+            self.hits += 1
+            s.set("hit", True)
+            s.metric("similarity", similarity)
+        return {"answer": answer, "question": cached_question, "similarity": similarity}
+
+    def put(self, params: str, question: str, vector: np.ndarray, answer: str,
+            chunk_ids: Sequence[str]) -> None:
+        """
+        Store an answer together with the ids of the chunks it was built from.
+        """
+        vector = _unit(vector)
+        now = time.time()
+        guard = question_guard(question)
+        with self._lock:
+            index = self._current_index()
+            with self._conn:
+                cur = self._conn.execute(
+                    """
+                    INSERT INTO answers (params, question, guard, vector, answer, created_at, last_used)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (params, question, guard, vector.tobytes(), answer, now, now),
+                )
+                row_id = cur.lastrowid
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO answer_chunks (chunk_id, answer_id) VALUES (?, ?)",
+                    [(cid, row_id) for cid in dict.fromkeys(chunk_ids)],
+                )
+                evicted = self._evict(now)
+            if evicted:
+                self._index = None
+                return
+            # Own writes don't bump data_version: extend the index in place
+            ids, guards, created, matrix = index.get(params, ([], [], [], np.zeros((0, len(vector)), np.float32)))
+            if matrix.shape[1] == vector.shape[0]:
+                index[params] = (ids + [row_id], guards + [guard], created + [now], np.vstack([matrix, vector]))
+            else:
+                self._index = None
+
+    def _evict(self, now: float) -> int:
+        # Caller holds _lock inside a transaction: expired answers, then LRU down to 90%
+        removed = 0
+        if self.ttl:
+            removed += self._conn.execute(
+                "DELETE FROM answers WHERE created_at < ?", (now - self.ttl,)
+            ).rowcount
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count > self.max_entries:
+            removed += self._conn.execute(
+                "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used ASC LIMIT ?)",
+                (count - int(self.max_entries * 0.9),),
+            ).rowcount
+        self.evicted += removed
+        return removed
+
+    def invalidate_chunks(self, chunk_ids: Sequence[str]) -> int:
+        """
+        Drop every answer built from any of `chunk_ids`. Returns how many.
+        """
+        unique = list(dict.fromkeys(chunk_ids))
+        removed = 0
+        with self._lock:
+            with self._conn:
+                for start in range(0, len(unique), 500):
+                    part = unique[start:start + 500]
+                    placeholders = ",".join("?" * len(part))
+                    removed += self._conn.execute(
+                        f"""
+                        DELETE FROM answers WHERE id IN (
+                            SELECT answer_id FROM answer_chunks WHERE chunk_id IN ({placeholders})
+                        )
+                        """,
+                        part,
+                    ).rowcount
+            if removed:
+                self._index = None
+            self.invalidated += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM answers")
+            self._index = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "invalidated": self.invalidated,
+                "evicted": self.evicted,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """
+    Process-wide cache, or None when ANSWER_CACHE_ENABLED is off.
+    """
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
+
+
+def invalidate_chunks(chunk_ids: Sequence[str]) -> int:
+    """
+    Ingestion hook: called for every chunk written or deleted in the vector
+    store, so answers built on changed content are never served again.
+    """
+    cache = get_answer_cache()
+    if cache is None or not chunk_ids:
+        return 0
+    return cache.invalidate_chunks(chunk_ids)
+
+
+def answer_cache_stats() -> Dict[str, float]:
+    cache = get_answer_cache()
+    return cache.stats() if cache is not None else {}
@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from app.core.llm_client import aask_system
+from app.core.rag import NO_CONTEXT_ANSWER, RAG_TOP_K, SYSTEM_PROMPT, rag_prompt_from_results
+from app.core.retrieval import retrieve_many
+from app.core.tracing import span
+
+# Concurrent LLM calls (match OLLAMA_NUM_PARALLEL on the Ollama side)
+BATCH_QA_PARALLEL = int(os.getenv("BATCH_QA_PARALLEL", "4"))
+# Questions embedded and searched together per retrieval call
+BATCH_QA_RETRIEVAL_BATCH = int(os.getenv("BATCH_QA_RETRIEVAL_BATCH", "32"))
+
+
+def read_questions(path: str) -> List[Dict[str, Any]]:
+    """
+    Questions from JSONL: one {"question": str, "id"?: ...} object per line
+    ("q" is accepted for "question"). Items without an id get their line number.
+    """
+    items = []
+    seen: Set[str] = set()
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = (record.get("question") or record.get("q") or "").strip()
+            if not question:
+                print(f"Skipping line {lineno}: no question")
+                continue
+            item_id = record.get("id", lineno)
+            if str(item_id) in seen:
+                print(f"Skipping line {lineno}: duplicate id {item_id!r}")
+                continue
+            seen.add(str(item_id))
+            items.append({"id": item_id, "question": question})
+    return items
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids already answered in an existing output file (failed items are retried).
+    Unparseable lines (a record cut off by an interruption) are ignored.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record:
+                done.add(str(record.get("id")))
+    return done
+
+
+def _drop_partial_line(path: str) -> None:
+    # An interrupted run can leave half a record at the end; appending after it would corrupt the next one
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def _sources(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    metas = (results.get("metadatas") or [[]])[0] or []
+    out = []
+    seen = set()
+    for m in metas:
+        m = m or {}
+        key = (m.get("source"), m.get("chunk_index"))
+        if key not in seen:
+            seen.add(key)
+            out.append({"source": key[0], "chunk_index": key[1]})
+    return out
+
+
+def _batches(items: List[Dict[str, Any]], size: int) -> Iterable[List[Dict[str, Any]]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def _run(items: List[Dict[str, Any]], out, k: int, mode: Optional[str],
+               rerank: Optional[bool], parallel: int, batch_size: int,
+               collection_name: str, project: Optional[str]) -> Dict[str, int]:
+    # Retrieval of batch i+1 (worker thread) overlaps the LLM calls for batch i
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(parallel, batch_size))
+    counts = {"done": 0, "errors": 0}
+    started = time.perf_counter()
+
+    def write(record: Dict[str, Any]) -> None:
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()  # every finished item survives an interruption
+        counts["errors" if "error" in record else "done"] += 1
+        finished = counts["done"] + counts["errors"]
+        if finished % 10 == 0 or finished == len(items):
+            rate = finished / (time.perf_counter() - started)
+            print(f"{finished}/{len(items)} answered ({counts['errors']} errors, {rate:.2f}/s)")
+
+    async def produce() -> None:
+        for batch in _batches(items, batch_size):
+            t0 = time.perf_counter()
+            try:
+                with span("batch_qa.retrieve", questions=len(batch), k=k, mode=mode):
+                    results = await asyncio.to_thread(
+                        retrieve_many, [it["question"] for it in batch], k, mode, collection_name, rerank, project
+                    )
+            except Exception as e:
+                for it in batch:
+                    write({**it, "error": f"retrieval failed: {e}"})
+                continue
+            # Batched retrieval: each item is charged an equal share of the batch
+            share_ms = (time.perf_counter() - t0) * 1000 / len(batch)
+            for it, r in zip(batch, results):
+                await queue.put((it, r, share_ms))
+        for _ in range(parallel):
+            await queue.put(None)
+
+    async def answer() -> None:
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            it, results, retrieval_ms = entry
+            t0 = time.perf_counter()
+            try:
+                prompt = rag_prompt_from_results(it["question"], results)
+                text = NO_CONTEXT_ANSWER if prompt is None else await aask_system(prompt, SYSTEM_PROMPT)
+            except Exception as e:
+                write({**it, "error": str(e)})
+                continue
+            llm_ms = (time.perf_counter() - t0) * 1000
+            write({
+                **it,
+                "answer": text,
+                "sources": _sources(results),
+                "timings": {
+                    "retrieval_ms": round(retrieval_ms, 1),
+                    "llm_ms": round(llm_ms, 1),
+                    "total_ms": round(retrieval_ms + llm_ms, 1),
+                },
+            })
+
+    await asyncio.gather(produce(), *(answer() for _ in range(parallel)))
+    return counts
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    k: int = RAG_TOP_K,
+    mode: Optional[str] = None,
+    rerank: Optional[bool] = None,
+    parallel: int = BATCH_QA_PARALLEL,
+    batch_size: int = BATCH_QA_RETRIEVAL_BATCH,
+    collection_name: str = "pm_docs",
+    resume: bool = True,
+    project: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Answer every question in `input_path` with RAG and append one JSON line
+    per question to `output_path` as soon as it is done (in completion order):
+    {"id", "question", "answer", "sources", "timings"} or {"id", "question", "error"}.
+    With `resume`, questions already answered in `output_path` are skipped.
+    With `project`, retrieval only searches that project's documents.
+    """
+    items = read_questions(input_path)
+    if resume:
+        _drop_partial_line(output_path)
+        done = completed_ids(output_path)
+        pending = [it for it in items if str(it["id"]) not in done]
+        if done:
+            print(f"Resuming: {len(items) - len(pending)} of {len(items)} already answered")
+    else:
+        pending = items
+    if not pending:
+        print("Nothing to do")
+        return {"done": 0, "errors": 0}
+
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        counts = asyncio.run(
+            _run(pending, out, k, mode, rerank, max(1, parallel), max(1, batch_size), collection_name, project)
+        )
+    elapsed = time.perf_counter() - started
+    print(
+        f"Done: {counts['done']} answered, {counts['errors']} errors in {elapsed:.1f}s "
+        f"({len(pending) / elapsed:.2f} questions/s) -> {output_path}"
+    )
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with RAG")
+    parser.add_argument("input", help="JSONL with one {\"question\": ..., \"id\": ...} per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL answers (appended to when resuming)")
+    parser.add_argument("-k", type=int, default=RAG_TOP_K, help="Chunks retrieved per question")
+    parser.add_argument("--mode", default=None, help="dense | lexical | hybrid (default: RAG_RETRIEVAL_MODE)")
+    parser.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=None,
+                        help="Cross-encoder rerank (default: RERANK_ENABLED)")
+    parser.add_argument("--parallel", type=int, default=BATCH_QA_PARALLEL, help="Concurrent LLM calls")
+    parser.add_argument("--batch-size", type=int, default=BATCH_QA_RETRIEVAL_BATCH,
+                        help="Questions per batched retrieval")
+    parser.add_argument("--collection", default=os.getenv("INGEST_COLLECTION_NAME", "pm_docs"))
+    parser.add_argument("--project", default=None, help="Only search documents tagged with this project")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    args = parser.parse_args()
+
+    result = run_batch(
+        args.input,
+        args.output,
+        k=args.k,
+        mode=args.mode,
+        rerank=args.rerank,
+        parallel=args.parallel,
+        batch_size=args.batch_size,
+        collection_name=args.collection,
+        resume=not args.no_resume,
+        project=args.project,
+    )
+    sys.exit(1 if result["errors"] else 0)
@@ -0,0 +1,68 @@
+import os
+import threading
+
+import chromadb
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+from app.core.embeddings import (
+    EMBEDDING_DEVICE,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_NORMALIZE,
+    encode,
+)
+from app.core.vector_store import PERSIST_DIR_ABS
+
+
+class SharedSentenceTransformerEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """
+    Chroma embedding function backed by the shared model in app.core.embeddings
+    instead of loading its own copy. Keeps the "sentence_transformer" name and
+    config so existing collections open without an embedding-function conflict.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+        # Deliberately not calling super().__init__(): it would load the model
+        self.model_name = model_name
+        self.device = EMBEDDING_DEVICE or "cpu"
+        self.normalize_embeddings = EMBEDDING_NORMALIZE
+        self.kwargs = {}
+
+    def __call__(self, input):
+        return list(encode(input))
+
+
+_client = None
+_collections = {}
+_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The PersistentClient, opened on first use rather than at import.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                os.makedirs(PERSIST_DIR_ABS, exist_ok=True)
+                print("Chroma persist dir:", PERSIST_DIR_ABS)
+                # ✅ Use PersistentClient so data survives across runs
+                _client = chromadb.PersistentClient(path=PERSIST_DIR_ABS)
+    return _client
+
+
+def get_chroma_collection(name="pm_docs"):
+    """
+    Collection handle, cached per name: opening one is a round trip to
+    Chroma's system database, and handles stay valid across calls.
+    """
+    coll = _collections.get(name)
+    if coll is None:
+        client = get_client()
+        with _lock:
+            coll = _collections.get(name)
+            if coll is None:
+                coll = _collections[name] = client.get_or_create_collection(
+                    name=name, embedding_function=SharedSentenceTransformerEmbeddingFunction()
+                )
+    return coll
@@ -0,0 +1,142 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.tokens import count_tokens
+
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Longest suffix/prefix we look for when stitching adjacent chunks together
+MAX_STITCH_OVERLAP = 2000
+# Shorter matches between adjacent chunks are treated as coincidence
+MIN_STITCH_OVERLAP = 20
+
+
+@dataclass
+class _Block:
+    """
+    A run of adjacent chunks from one source, rendered under a single header.
+    """
+    source: str
+    first_index: int
+    last_index: int
+    text: str
+    rank: int
+    tokens: int = 0
+    # Section of the first chunk: heading path or page, when the chunker recorded one
+    location: str = ""
+
+    def header(self) -> str:
+        where = f" | {self.location}" if self.location else ""
+        if self.first_index == self.last_index:
+            return f"[Source: {self.source} (chunk {self.first_index}){where}]"
+        return f"[Source: {self.source} (chunks {self.first_index}-{self.last_index}){where}]"
+
+    def render(self) -> str:
+        return f"{self.header()}\n{self.text}"
+
+
+def _overlap(a: str, b: str) -> int:
+    """
+    Length of the longest suffix of `a` that is also a prefix of `b`.
+    """
+    limit = min(len(a), len(b), MAX_STITCH_OVERLAP)
+    for k in range(limit, MIN_STITCH_OVERLAP - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+
+def _stitch(a: str, b: str) -> str:
+    k = _overlap(a, b)
+    if k:
+        return a + b[k:]
+    return f"{a}\n{b}"
+
+
+def _location(metadata: Dict[str, Any]) -> str:
+    if metadata.get("page"):
+        return f"p. {metadata['page']}"
+    return metadata.get("heading_path") or ""
+
+
+def _result_items(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+    docs = (results.get("documents") or [[]])[0]
+    metas = (results.get("metadatas") or [[]])[0] or [{}] * len(docs)
+    items = []
+    seen = set()
+    for rank, (d, m) in enumerate(zip(docs, metas)):
+        m = m or {}
+        source = m.get("source", "unknown")
+        idx = int(m.get("chunk_index", 0))
+        if (source, idx) in seen:
+            continue
+        seen.add((source, idx))
+        items.append({"rank": rank, "source": source, "index": idx, "text": d or "",
+                      "location": _location(m)})
+    return items
+
+
+def _try_add(blocks: List[_Block], item: Dict[str, Any]) -> Tuple[Optional[int], _Block]:
+    """
+    Merge `item` into a copy of the block it is adjacent to, or start a new
+    one. Returns (position of the block it replaces or None, block), without
+    modifying `blocks`.
+    """
+    for pos, b in enumerate(blocks):
+        if b.source != item["source"]:
+            continue
+        if item["index"] == b.last_index + 1:
+            return pos, _Block(b.source, b.first_index, item["index"],
+                               _stitch(b.text, item["text"]), b.rank, location=b.location)
+        if item["index"] == b.first_index - 1:
+            return pos, _Block(b.source, item["index"], b.last_index,
+                               _stitch(item["text"], b.text), b.rank, location=item["location"])
+    return None, _Block(item["source"], item["index"], item["index"], item["text"], item["rank"],
+                        location=item["location"])
+
+
+def pack_context(results: Dict[str, Any], max_tokens: Optional[int] = None) -> str:
+    """
+    Turn Chroma query results into a context string within `max_tokens`.
+
+    Chunks are taken in relevance order. Adjacent chunks from the same
+    source are merged into one block with their shared overlap removed.
+    A chunk that does not fit is dropped whole (never cut mid-sentence),
+    and packing continues with the next, possibly smaller, chunk.
+    """
+    blocks: List[_Block] = []
+    sep_tokens = count_tokens(CONTEXT_SEPARATOR)
+    used = 0
+
+    for item in _result_items(results):
+        pos, candidate = _try_add(blocks, item)
+        candidate.tokens = count_tokens(candidate.render())
+        if pos is not None:
+            delta = candidate.tokens - blocks[pos].tokens
+        else:
+            delta = candidate.tokens + (sep_tokens if blocks else 0)
+        if max_tokens is not None and used + delta > max_tokens:
+            continue
+        if pos is not None:
+            blocks[pos] = candidate
+        else:
+            blocks.append(candidate)
+        used += delta
+
+    # Two blocks of one source may now touch (chunks 1-2 and 4 joined by 3)
+    blocks = _merge_touching(blocks)
+    blocks.sort(key=lambda b: b.rank)
+    return CONTEXT_SEPARATOR.join(b.render() for b in blocks)
+
+
+def _merge_touching(blocks: List[_Block]) -> List[_Block]:
+    merged: List[_Block] = []
+    for b in sorted(blocks, key=lambda b: (b.source, b.first_index)):
+        prev = merged[-1] if merged else None
+        if prev and prev.source == b.source and b.first_index == prev.last_index + 1:
+            merged[-1] = _Block(prev.source, prev.first_index, b.last_index,
+                                _stitch(prev.text, b.text), min(prev.rank, b.rank),
+                                location=prev.location)
+        else:
+            merged.append(b)
+    return merged
@@ -1,8 +1,10 @@
+import os
+import re
 import uuid
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
-from app.core.db import get_connection, init_schema
+from app.core.db import get_connection
 
 
 def _now_iso() -> str:
@@ -11,26 +13,28 @@ def _now_iso() -> str:
 
 # ---------- Projects ----------
 
-def create_project(name: str, description: str = "") -> str:
-    init_schema()
+def create_project(name: str, description: str = "", doc_tag: Optional[str] = None) -> str:
+    """
+    doc_tag: restrict the project's retrieval to documents ingested from the
+    folder of that name (see app/ingestion/ingest.py); None searches all.
+    """
     project_id = str(uuid.uuid4())
     with get_connection() as conn:
         conn.execute(
             """
-            INSERT INTO projects (id, name, description, created_at)
-            VALUES (?, ?, ?, ?)
+            INSERT INTO projects (id, name, description, created_at, doc_tag)
+            VALUES (?, ?, ?, ?, ?)
             """,
-            (project_id, name, description, _now_iso()),
+            (project_id, name, description, _now_iso(), doc_tag or None),
         )
     return project_id
 
 
 def list_projects() -> List[Dict[str, Any]]:
-    init_schema()
     with get_connection() as conn:
         rows = conn.execute(
             """
-            SELECT id, name, description, created_at
+            SELECT id, name, description, created_at, doc_tag
             FROM projects
             ORDER BY created_at DESC
             """
@@ -39,19 +43,42 @@ def list_projects() -> List[Dict[str, Any]]:
 
 
 def get_project(project_id: str) -> Optional[Dict[str, Any]]:
-    init_schema()
     with get_connection() as conn:
         row = conn.execute(
-            "SELECT id, name, description, created_at FROM projects WHERE id = ?",
+            "SELECT id, name, description, created_at, doc_tag FROM projects WHERE id = ?",
             (project_id,),
         ).fetchone()
     return dict(row) if row else None
 
 
+def set_project_doc_tag(project_id: str, doc_tag: Optional[str]) -> None:
+    with get_connection() as conn:
+        conn.execute(
+            "UPDATE projects SET doc_tag = ? WHERE id = ?",
+            (doc_tag or None, project_id),
+        )
+
+
+def get_conversation_doc_tag(conv_id: str) -> Optional[str]:
+    """
+    doc_tag of the conversation's project (None: unscoped retrieval).
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT p.doc_tag
+            FROM conversations c
+            JOIN projects p ON p.id = c.project_id
+            WHERE c.id = ?
+            """,
+            (conv_id,),
+        ).fetchone()
+    return row[0] if row else None
+
+
 # ---------- Conversations ----------
 
 def create_conversation(project_id: Optional[str] = None, title: str = "") -> str:
-    init_schema()
     conv_id = str(uuid.uuid4())
     created_at = _now_iso()
     with get_connection() as conn:
@@ -66,7 +93,6 @@ def create_conversation(project_id: Optional[str] = None, title: str = "") -> st
 
 
 def list_conversations(project_id: Optional[str] = None) -> List[Dict[str, Any]]:
-    init_schema()
     with get_connection() as conn:
         if project_id:
             rows = conn.execute(
@@ -89,8 +115,42 @@ def list_conversations(project_id: Optional[str] = None) -> List[Dict[str, Any]]
     return [dict(r) for r in rows]
 
 
+def list_conversations_page(
+    project_id: Optional[str] = None,
+    limit: int = 50,
+    before: Optional[Tuple[str, str]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[Tuple[str, str]]]:
+    """
+    One page of conversations, newest first.
+    before: cursor returned by the previous call (None for the first page).
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    clauses, params = [], []
+    if project_id:
+        clauses.append("project_id = ?")
+        params.append(project_id)
+    if before:
+        # Keyset on (created_at, id): stable under inserts, no OFFSET scan
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(before)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            SELECT id, project_id, title, created_at
+            FROM conversations
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+            """,
+            (*params, limit + 1),
+        ).fetchall()
+    page = [dict(r) for r in rows[:limit]]
+    next_cursor = (page[-1]["created_at"], page[-1]["id"]) if len(rows) > limit else None
+    return page, next_cursor
+
+
 def get_conversation(conv_id: str) -> Optional[Dict[str, Any]]:
-    init_schema()
     with get_connection() as conn:
         row = conn.execute(
             """
@@ -104,7 +164,6 @@ def get_conversation(conv_id: str) -> Optional[Dict[str, Any]]:
 
 
 def update_conversation_title(conv_id: str, new_title: str) -> None:
-    init_schema()
     with get_connection() as conn:
         conn.execute(
             "UPDATE conversations SET title = ? WHERE id = ?",
@@ -115,12 +174,15 @@ def delete_conversation(conv_id: str) -> None:
     """
     Delete a conversation and all its messages.
     """
-    init_schema()
     with get_connection() as conn:
         conn.execute(
             "DELETE FROM messages WHERE conversation_id = ?",
             (conv_id,),
         )
+        conn.execute(
+            "DELETE FROM conversation_summaries WHERE conversation_id = ?",
+            (conv_id,),
+        )
         conn.execute(
             "DELETE FROM conversations WHERE id = ?",
             (conv_id,),
@@ -128,30 +190,30 @@ def delete_conversation(conv_id: str) -> None:
 
 # ---------- Messages ----------
 
-def append_message(conv_id: str, role: str, content: str) -> None:
+def append_message(conv_id: str, role: str, content: str) -> int:
     """
-    Append a message to a conversation.
+    Append a message to a conversation and return its order_index.
     role: 'user' or 'assistant'
     """
-    init_schema()
     with get_connection() as conn:
-        row = conn.execute(
-            "SELECT COALESCE(MAX(order_index), 0) AS max_idx FROM messages WHERE conversation_id = ?",
-            (conv_id,),
-        ).fetchone()
-        next_idx = (row["max_idx"] or 0) + 1
-
-        conn.execute(
+        # Single statement, so concurrent appends can't pick the same index;
+        # MAX(order_index) is a backwards seek on idx_messages_conversation_order
+        cur = conn.execute(
             """
             INSERT INTO messages (conversation_id, role, content, created_at, order_index)
-            VALUES (?, ?, ?, ?, ?)
+            SELECT ?, ?, ?, ?, COALESCE(MAX(order_index), 0) + 1
+            FROM messages
+            WHERE conversation_id = ?
             """,
-            (conv_id, role, content, _now_iso(), next_idx),
+            (conv_id, role, content, _now_iso(), conv_id),
         )
+        row = conn.execute(
+            "SELECT order_index FROM messages WHERE id = ?", (cur.lastrowid,)
+        ).fetchone()
+    return row["order_index"]
 
 
 def load_conversation_messages(conv_id: str) -> List[Dict[str, str]]:
-    init_schema()
     with get_connection() as conn:
         rows = conn.execute(
             """
@@ -163,3 +225,222 @@ def load_conversation_messages(conv_id: str) -> List[Dict[str, str]]:
             (conv_id,),
         ).fetchall()
     return [{"role": r["role"], "content": r["content"]} for r in rows]
+
+
+def load_messages_page(
+    conv_id: str,
+    limit: int = 50,
+    before_index: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Up to `limit` messages older than `before_index` (the latest ones when
+    None), returned oldest first with their order_index. The page starting
+    at order_index 1 is the beginning of the conversation.
+    """
+    with get_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT role, content, order_index
+            FROM messages
+            WHERE conversation_id = ? AND order_index < ?
+            ORDER BY order_index DESC
+            LIMIT ?
+            """,
+            (conv_id, before_index if before_index is not None else 2**63 - 1, limit),
+        ).fetchall()
+    return [dict(r) for r in reversed(rows)]
+
+
+def load_messages_range(conv_id: str, after_index: int, up_to_index: int) -> List[Dict[str, Any]]:
+    """
+    Messages with after_index < order_index <= up_to_index, oldest first.
+    """
+    with get_connection() as conn:
+        rows = conn.execute(
+            """
+            SELECT role, content, order_index
+            FROM messages
+            WHERE conversation_id = ? AND order_index > ? AND order_index <= ?
+            ORDER BY order_index ASC
+            """,
+            (conv_id, after_index, up_to_index),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def count_messages(conv_id: str) -> int:
+    with get_connection() as conn:
+        row = conn.execute(
+            "SELECT COALESCE(MAX(order_index), 0) AS n FROM messages WHERE conversation_id = ?",
+            (conv_id,),
+        ).fetchone()
+    return row["n"]
+
+
+# ---------- Search ----------
+
+_SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Title hits count this much more than a hit in a message body
+_TITLE_WEIGHT = 2.0
+# Newest matching messages ranked per search (bounds latency for common terms)
+SEARCH_MAX_CANDIDATES = int(os.getenv("CONVERSATION_SEARCH_MAX_CANDIDATES", "5000"))
+
+
+def to_search_query(text: str) -> str:
+    """
+    Free text -> FTS5 MATCH expression: every word must appear (quoted, so
+    user input is never parsed as FTS syntax); the last word also matches
+    as a prefix, so results show up while the user is still typing.
+    """
+    tokens = list(dict.fromkeys(_SEARCH_TOKEN_RE.findall(text)))
+    if not tokens:
+        return ""
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_conversations(
+    query_text: str,
+    project_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Ranked full-text search over conversation titles and message bodies.
+    Returns (hits, has_more); each hit has conversation_id, project_id,
+    title, order_index (None for a title hit), role, snippet (matches
+    wrapped in **) and score (higher is better).
+
+    Only the newest SEARCH_MAX_CANDIDATES matching messages (across all
+    projects) are ranked, so very common terms stay fast on large histories.
+    """
+    match = to_search_query(query_text)
+    if not match:
+        return [], False
+
+    project_clause = "AND c.project_id = ?" if project_id else ""
+    project_params = [project_id] if project_id else []
+    # Joined inside the capped match list, so the cap counts the project's matches only
+    message_project_join = (
+        "JOIN messages m ON m.id = messages_fts.rowid "
+        "JOIN conversations c ON c.id = m.conversation_id"
+    ) if project_id else ""
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"""
+            WITH title_hits AS (
+                SELECT c.id AS conversation_id, NULL AS order_index,
+                       'title' AS role, NULL AS message_id,
+                       bm25(conversations_fts) * ? AS rank
+                FROM conversations_fts
+                JOIN conversations c ON c.rowid = conversations_fts.rowid
+                WHERE conversations_fts MATCH ? {project_clause}
+                ORDER BY conversations_fts.rowid DESC
+                LIMIT ?
+            ),
+            message_matches AS (
+                -- Walks the match list newest-first and stops at the cap
+                SELECT messages_fts.rowid AS id, bm25(messages_fts) AS rank
+                FROM messages_fts
+                {message_project_join}
+                WHERE messages_fts MATCH ? {project_clause}
+                ORDER BY messages_fts.rowid DESC
+                LIMIT ?
+            ),
+            message_hits AS (
+                SELECT m.conversation_id, m.order_index, m.role,
+                       m.id AS message_id, mm.rank
+                FROM message_matches mm
+                JOIN messages m ON m.id = mm.id
+            ),
+            page AS (
+                SELECT * FROM title_hits
+                UNION ALL
+                SELECT * FROM message_hits
+                ORDER BY rank
+                LIMIT ? OFFSET ?
+            )
+            SELECT p.conversation_id, c.project_id, c.title, p.order_index,
+                   p.role, p.rank, COALESCE(m.content, c.title) AS text
+            FROM page p
+            JOIN conversations c ON c.id = p.conversation_id
+            LEFT JOIN messages m ON m.id = p.message_id
+            ORDER BY p.rank
+            """,
+            (
+                _TITLE_WEIGHT, match, *project_params, SEARCH_MAX_CANDIDATES,
+                match, *project_params, SEARCH_MAX_CANDIDATES,
+                limit + 1, offset,
+            ),
+        ).fetchall()
+
+    terms = _SEARCH_TOKEN_RE.findall(query_text)
+    hits = []
+    for r in rows[:limit]:
+        hit = dict(r)
+        hit["snippet"] = make_snippet(hit.pop("text") or "", terms)
+        hit["score"] = -hit.pop("rank")  # bm25() is lower-is-better
+        hits.append(hit)
+    return hits, len(rows) > limit
+
+
+def make_snippet(text: str, terms: List[str], window: int = 16) -> str:
+    """
+    About `window` words of `text` around the first query term, with the
+    matching words wrapped in **. The last term matches as a prefix, as in
+    to_search_query. FTS5's snippet() would re-read the full match list per
+    row, which is far slower on common terms.
+    """
+    words = text.split()
+    if not words:
+        return ""
+    folded = [t.casefold() for t in terms]
+
+    def is_match(word: str) -> bool:
+        for token in _SEARCH_TOKEN_RE.findall(word.casefold()):
+            if token in folded[:-1] or (folded and token.startswith(folded[-1])):
+                return True
+        return False
+
+    flags = [is_match(w) for w in words]
+    first = flags.index(True) if True in flags else 0
+    start = max(0, min(first - window // 4, len(words) - window))
+    end = min(len(words), start + window)
+    shown = [f"**{w}**" if f else w for w, f in zip(words[start:end], flags[start:end])]
+    return ("…" if start > 0 else "") + " ".join(shown) + ("…" if end < len(words) else "")
+
+
+# ---------- Summaries ----------
+
+def get_conversation_summary(conv_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Rolling summary of a conversation's older messages, or None.
+    covered_count: messages 1..covered_count (by order_index) are folded in.
+    """
+    with get_connection() as conn:
+        row = conn.execute(
+            """
+            SELECT summary, covered_count, updated_at
+            FROM conversation_summaries
+            WHERE conversation_id = ?
+            """,
+            (conv_id,),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def save_conversation_summary(conv_id: str, summary: str, covered_count: int) -> None:
+    with get_connection() as conn:
+        conn.execute(
+            """
+            INSERT INTO conversation_summaries (conversation_id, summary, covered_count, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (conversation_id) DO UPDATE SET
+                summary = excluded.summary,
+                covered_count = excluded.covered_count,
+                updated_at = excluded.updated_at
+            """,
+            (conv_id, summary, covered_count, _now_iso()),
+        )
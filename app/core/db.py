@@ -1,78 +1,243 @@
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
-from typing import Iterator
+from typing import Iterator, List, Tuple
 
 # Resolve DB path from env
 PRODUCT_ATLAS_DB = os.getenv("PRODUCT_ATLAS_DB", "data/product_atlas.db")
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH_ABS = os.path.join(BASE_DIR, PRODUCT_ATLAS_DB)
-os.makedirs(os.path.dirname(DB_PATH_ABS), exist_ok=True)
-
-
-def init_schema() -> None:
-    """
-    Create tables if they don't exist.
-    """
-    with get_connection() as conn:
-        cur = conn.cursor()
 
+# Versioned migrations, applied in order; the applied version is stored in
+# PRAGMA user_version. Never edit a released step, append a new one.
+MIGRATIONS: List[Tuple[int, List[str]]] = [
+    (1, [
         # Projects
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS projects (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                created_at TEXT NOT NULL
-            )
-            """
+        """
+        CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            created_at TEXT NOT NULL
         )
-
+        """,
         # Conversations
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS conversations (
-                id TEXT PRIMARY KEY,
-                project_id TEXT NULL,
-                title TEXT,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (project_id) REFERENCES projects(id)
-            )
-            """
+        """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NULL,
+            title TEXT,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (project_id) REFERENCES projects(id)
         )
-
+        """,
         # Messages
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT NOT NULL,
-                role TEXT NOT NULL,             -- 'user' or 'assistant'
-                content TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                order_index INTEGER NOT NULL,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
-            )
-            """
+        """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            conversation_id TEXT NOT NULL,
+            role TEXT NOT NULL,             -- 'user' or 'assistant'
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            order_index INTEGER NOT NULL,
+            FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+        )
+        """,
+    ]),
+    (2, [
+        # Rolling summary of the older part of each conversation (see app/core/memory.py)
+        """
+        CREATE TABLE IF NOT EXISTS conversation_summaries (
+            conversation_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            covered_count INTEGER NOT NULL,  -- messages (by order_index) folded into summary
+            updated_at TEXT NOT NULL,
+            FOREIGN KEY (conversation_id) REFERENCES conversations(id)
         )
+        """,
+    ]),
+    (3, [
+        # Serves MAX(order_index) in append_message and ordered message loads
+        """
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation_order
+            ON messages (conversation_id, order_index)
+        """,
+        # Serves list_conversations(project_id) ORDER BY created_at
+        """
+        CREATE INDEX IF NOT EXISTS idx_conversations_project_created
+            ON conversations (project_id, created_at)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_projects_created
+            ON projects (created_at)
+        """,
+    ]),
+    (4, [
+        # Keyset pagination of conversation lists orders by (created_at, id)
+        "DROP INDEX IF EXISTS idx_conversations_project_created",
+        """
+        CREATE INDEX IF NOT EXISTS idx_conversations_project_created_id
+            ON conversations (project_id, created_at, id)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_conversations_created_id
+            ON conversations (created_at, id)
+        """,
+    ]),
+    (5, [
+        # Full-text search over message bodies and conversation titles.
+        # External-content FTS5 tables: text is stored once, in the base
+        # tables, and the triggers below keep the indexes in sync.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content,
+            content='messages',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+        END
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+            title,
+            content='conversations',
+            content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations BEGIN
+            INSERT INTO conversations_fts (rowid, title) VALUES (new.rowid, COALESCE(new.title, ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+            INSERT INTO conversations_fts (conversations_fts, rowid, title)
+            VALUES ('delete', old.rowid, COALESCE(old.title, ''));
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS conversations_fts_au AFTER UPDATE OF title ON conversations BEGIN
+            INSERT INTO conversations_fts (conversations_fts, rowid, title)
+            VALUES ('delete', old.rowid, COALESCE(old.title, ''));
+            INSERT INTO conversations_fts (rowid, title) VALUES (new.rowid, COALESCE(new.title, ''));
+        END
+        """,
+        # Index rows that existed before this migration
+        "INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')",
+        "INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')",
+    ]),
+    (6, [
+        # Scopes a project's retrieval to chunks tagged with this value (the
+        # top-level folder under the ingest dir, see app/ingestion/ingest.py).
+        # NULL searches every document.
+        "ALTER TABLE projects ADD COLUMN doc_tag TEXT",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    # WAL lets the UI read while ingestion / other sessions write
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-16000")  # ~16 MB page cache
+    conn.execute("PRAGMA mmap_size=134217728")  # 128 MB
+    return conn
 
-        conn.commit()
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        with conn:
+            for sql in statements:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {version}")
+
+
+def init_schema() -> None:
+    """
+    Apply pending migrations. Runs once per process (per database file);
+    later calls are free.
+    """
+    if DB_PATH_ABS in _schema_ready:
+        return
+    with _schema_lock:
+        if DB_PATH_ABS in _schema_ready:
+            return
+        os.makedirs(os.path.dirname(DB_PATH_ABS), exist_ok=True)
+        conn = _connect(DB_PATH_ABS)
+        try:
+            _migrate(conn)
+        finally:
+            conn.close()
+        _schema_ready.add(DB_PATH_ABS)
+
+
+def _thread_connection() -> sqlite3.Connection:
+    """
+    One long-lived connection per thread (sqlite3 connections must not be
+    shared across threads), opened on first use.
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(DB_PATH_ABS)
+    if conn is None:
+        init_schema()
+        conn = conns[DB_PATH_ABS] = _connect(DB_PATH_ABS)
+    return conn
 
 
 @contextmanager
 def get_connection() -> Iterator[sqlite3.Connection]:
     """
     Context-managed connection with row_factory set to sqlite3.Row.
+    The connection is reused by the thread; the block is one transaction
+    that is committed on success and rolled back on error.
     """
-    conn = sqlite3.connect(DB_PATH_ABS)
-    conn.row_factory = sqlite3.Row
+    conn = _thread_connection()
     try:
         yield conn
         conn.commit()
     except Exception:
         conn.rollback()
         raise
-    finally:
+
+
+def close_connection() -> None:
+    """
+    Close this thread's connection (it is reopened on next use).
+    """
+    conns = getattr(_local, "conns", {})
+    conn = conns.pop(DB_PATH_ABS, None)
+    if conn is not None:
         conn.close()
@@ -0,0 +1,222 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Resolve project root (one level above app/)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Relative paths are resolved against the project root
+EMBEDDING_CACHE_PATH = str(
+    PROJECT_ROOT / os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.db")
+)
+# LRU bound; ~4 KB per entry for a 1024-dim model
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# Hits refresh last_used in memory; the refreshes are written in one batch
+# every this many entries or seconds (and with the next put), so lookups
+# don't each run a write transaction
+_TOUCH_FLUSH_ROWS = 1000
+_TOUCH_FLUSH_SECONDS = 60.0
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed embedding cache keyed by
+    (model key, sha256 of the normalized text), with LRU eviction.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used INTEGER NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+            )
+        row = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(last_used), 0) FROM embeddings"
+        ).fetchone()
+        self._count, self._clock = row[0], row[1]
+        # (model, text_hash) -> last_used not yet written
+        self._touched: Dict[Tuple[str, str], int] = {}
+        self._flushed_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def _tick(self) -> int:
+        # Caller holds _lock. Logical clock for LRU ordering.
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Return {text_hash: vector} for the hashes found in the cache.
+        """
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"""
+                    SELECT text_hash, vector FROM embeddings
+                    WHERE model = ? AND text_hash IN ({placeholders})
+                    """,
+                    (model, *part),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                tick = self._tick()
+                for h in found:
+                    self._touched[(model, h)] = tick
+                if (len(self._touched) >= _TOUCH_FLUSH_ROWS
+                        or time.monotonic() - self._flushed_at >= _TOUCH_FLUSH_SECONDS):
+                    with self._conn:
+                        self._flush_touches()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model: str, hashes: Sequence[str], vectors: np.ndarray) -> None:
+        if not len(hashes):
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            tick = self._tick()
+            with self._conn:
+                self._flush_touches()
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    """
+                    INSERT OR IGNORE INTO embeddings (model, text_hash, dim, vector, last_used)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (model, h, int(v.shape[0]), v.tobytes(), tick)
+                        for h, v in zip(hashes, vectors)
+                    ],
+                )
+                self._count += self._conn.total_changes - before
+                if self._count > self.max_entries:
+                    self._evict()
+
+    def _flush_touches(self) -> None:
+        # Caller holds _lock inside a transaction
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(tick, model, h) for (model, h), tick in self._touched.items()],
+            )
+            self._touched.clear()
+        self._flushed_at = time.monotonic()
+
+    def _evict(self) -> None:
+        # Caller holds _lock inside a transaction. Trim to 90% to amortize.
+        target = int(self.max_entries * 0.9)
+        excess = self._count - target
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE (model, text_hash) IN (
+                SELECT model, text_hash FROM embeddings ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (excess,),
+        )
+        self._count = target
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            with self._conn:
+                self._flush_touches()
+            self._conn.close()
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Process-wide cache, or None when EMBEDDING_CACHE_ENABLED is off.
+    """
+    global _cache
+    if not EMBEDDING_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+def cached_encode(model: str, texts: List[str], encode_fn) -> np.ndarray:
+    """
+    Encode `texts`, serving repeats from the cache and computing only
+    the distinct misses with `encode_fn(list_of_texts) -> np.ndarray`.
+    """
+    cache = get_embedding_cache()
+    if cache is None or not texts:
+        return encode_fn(texts)
+
+    hashes = [text_key(t) for t in texts]
+    found = cache.get_many(model, hashes)
+
+    missing: Dict[str, str] = {}
+    for h, t in zip(hashes, texts):
+        if h not in found and h not in missing:
+            missing[h] = t
+    if missing:
+        computed = encode_fn(list(missing.values()))
+        cache.put_many(model, list(missing), computed)
+        for h, v in zip(missing, computed):
+            found[h] = v
+
+    return np.stack([found[h] for h in hashes]).astype(np.float32, copy=False)
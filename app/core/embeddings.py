@@ -1,12 +1,88 @@
 import os
-from sentence_transformers import SentenceTransformer
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from app.core.embedding_cache import cached_encode, get_embedding_cache
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-m3")
+# Empty -> let sentence-transformers pick (cuda / mps / cpu)
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "") or None
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_NORMALIZE = os.getenv("EMBEDDING_NORMALIZE", "true").lower() in ("1", "true", "yes")
+# fp32 | bf16 | fp16
+EMBEDDING_PRECISION = os.getenv("EMBEDDING_PRECISION", "fp32").lower()
+
+# Model registry: one instance per (model, device, precision) per process,
+# shared by embed_texts and the Chroma embedding function.
+_models: Dict[Tuple[str, Optional[str], str], "SentenceTransformer"] = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(
+    model_name: str = EMBEDDING_MODEL_NAME,
+    device: Optional[str] = EMBEDDING_DEVICE,
+    precision: str = EMBEDDING_PRECISION,
+):
+    """
+    Return the shared SentenceTransformer, loading it on first use.
+    """
+    key = (model_name, device, precision)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name, device=device)
+            if precision == "bf16":
+                import torch
+
+                model = model.to(torch.bfloat16)
+            elif precision == "fp16":
+                model = model.half()
+            elif precision != "fp32":
+                raise ValueError(f"Unsupported EMBEDDING_PRECISION: {precision}")
+            _models[key] = model
+    return model
+
+
+def _cache_model_key(normalize: bool) -> str:
+    # Vectors differ by model, precision and normalization
+    return f"{EMBEDDING_MODEL_NAME}|{EMBEDDING_PRECISION}|norm={int(normalize)}"
+
+
+def encode(texts, batch_size: Optional[int] = None, normalize: bool = EMBEDDING_NORMALIZE):
+    """
+    Encode texts with the shared model; returns a float32 numpy array.
+    Texts already seen (by normalized content) come from the embedding cache.
+    """
+    def _model_encode(batch):
+        model = get_embedding_model()
+        return model.encode(
+            batch,
+            batch_size=batch_size or EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        ).astype("float32", copy=False)
+
+    return cached_encode(_cache_model_key(normalize), list(texts), _model_encode)
+
+
+def embedding_cache_stats() -> Dict[str, float]:
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {}
+
 
-_embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+def embed_texts(texts, batch_size: Optional[int] = None) -> List[List[float]]:
+    return encode(texts, batch_size=batch_size).tolist()
 
-def embed_texts(texts):
-    return _embedding_model.encode(texts, show_progress_bar=False).tolist()
 
 def embed_text(text):
     return embed_texts([text])[0]
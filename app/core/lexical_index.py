@@ -0,0 +1,218 @@
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+# Resolve project root (one level above app/)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+# Relative paths are resolved against the project root
+LEXICAL_INDEX_PATH = str(PROJECT_ROOT / os.getenv("LEXICAL_INDEX_PATH", "data/lexical_index.db"))
+
+# Keep ticket keys (PROJ-123) and snake_case names as single tokens
+_QUERY_TOKEN_RE = re.compile(r"[\w\-]+", re.UNICODE)
+
+
+class LexicalIndex:
+    """
+    BM25 side index (SQLite FTS5) over the same chunks stored in Chroma.
+    Rows live in `lexical_chunks`; `lexical_fts` is an external-content
+    FTS5 table kept in sync by triggers.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS lexical_chunks (
+                    id INTEGER PRIMARY KEY,
+                    collection TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    source TEXT,
+                    chunk_index INTEGER,
+                    filename TEXT,
+                    text TEXT NOT NULL,
+                    UNIQUE (collection, chunk_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_lexical_chunks_source
+                    ON lexical_chunks (collection, source);
+
+                CREATE VIRTUAL TABLE IF NOT EXISTS lexical_fts USING fts5(
+                    text,
+                    content='lexical_chunks',
+                    content_rowid='id',
+                    tokenize="unicode61 tokenchars '-_'"
+                );
+
+                CREATE TRIGGER IF NOT EXISTS lexical_chunks_ai AFTER INSERT ON lexical_chunks BEGIN
+                    INSERT INTO lexical_fts (rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS lexical_chunks_ad AFTER DELETE ON lexical_chunks BEGIN
+                    INSERT INTO lexical_fts (lexical_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS lexical_chunks_au AFTER UPDATE ON lexical_chunks BEGIN
+                    INSERT INTO lexical_fts (lexical_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO lexical_fts (rowid, text) VALUES (new.id, new.text);
+                END;
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(lexical_chunks)")}
+            if "project" not in columns:
+                # Rows from before the column existed get theirs from tag_projects() / a rebuild
+                self._conn.execute("ALTER TABLE lexical_chunks ADD COLUMN project TEXT")
+
+    def upsert(self, collection: str, ids: Sequence[str], texts: Sequence[str],
+               metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        metadatas = metadatas or [{}] * len(ids)
+        rows = [
+            (collection, cid, (m or {}).get("source"), (m or {}).get("chunk_index"),
+             (m or {}).get("filename"), (m or {}).get("project"), text)
+            for cid, text, m in zip(ids, texts, metadatas)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO lexical_chunks (collection, chunk_id, source, chunk_index, filename, project, text)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (collection, chunk_id) DO UPDATE SET
+                    source = excluded.source,
+                    chunk_index = excluded.chunk_index,
+                    filename = excluded.filename,
+                    project = excluded.project,
+                    text = excluded.text
+                """,
+                rows,
+            )
+
+    def set_projects(self, collection: str, ids: Sequence[str], projects: Sequence[Optional[str]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE lexical_chunks SET project = ? WHERE collection = ? AND chunk_id = ?",
+                [(project, collection, cid) for cid, project in zip(ids, projects)],
+            )
+
+    def delete(self, collection: str, ids: Sequence[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM lexical_chunks WHERE collection = ? AND chunk_id = ?",
+                [(collection, cid) for cid in ids],
+            )
+
+    def clear(self, collection: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM lexical_chunks WHERE collection = ?", (collection,))
+
+    def search(self, collection: str, query_text: str, k: int = 20,
+               project: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Top-k chunks by BM25. Query terms are OR-ed so partial matches still
+        rank; returns [{"id", "document", "metadata", "score"}], best first.
+        project: only chunks tagged with this project.
+        """
+        match = to_match_query(query_text)
+        if not match:
+            return []
+        project_clause = "AND c.project = ?" if project else ""
+        project_params = [project] if project else []
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT c.chunk_id, c.source, c.chunk_index, c.filename, c.project, c.text,
+                       bm25(lexical_fts) AS score
+                FROM lexical_fts
+                JOIN lexical_chunks c ON c.id = lexical_fts.rowid
+                WHERE lexical_fts MATCH ? AND c.collection = ? {project_clause}
+                ORDER BY score
+                LIMIT ?
+                """,
+                (match, collection, *project_params, k),
+            ).fetchall()
+        hits = []
+        for chunk_id, source, chunk_index, filename, chunk_project, text, score in rows:
+            metadata = {"source": source, "chunk_index": chunk_index, "filename": filename}
+            if chunk_project:
+                metadata["project"] = chunk_project
+            hits.append({
+                "id": chunk_id,
+                "document": text,
+                "metadata": metadata,
+                "score": -score,  # bm25() is lower-is-better
+            })
+        return hits
+
+    def count(self, collection: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM lexical_chunks WHERE collection = ?", (collection,)
+            ).fetchone()[0]
+
+
+def to_match_query(query_text: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression: every token quoted
+    (so '-', ':' or 'AND' are never parsed as operators) and OR-ed.
+    """
+    tokens = [t.strip("-") for t in _QUERY_TOKEN_RE.findall(query_text)]
+    tokens = [t for t in dict.fromkeys(tokens) if t]
+    return " OR ".join(f'"{t}"' for t in tokens)
+
+
+_index: Optional[LexicalIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> Optional[LexicalIndex]:
+    """
+    Process-wide index, or None when LEXICAL_INDEX_ENABLED is off.
+    """
+    global _index
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LexicalIndex()
+    return _index
+
+
+def rebuild_from_collection(collection, page_size: int = 1000) -> int:
+    """
+    Re-create the lexical index of a Chroma collection from its stored
+    documents, e.g. for collections ingested before the index existed.
+    """
+    index = get_lexical_index()
+    if index is None:
+        return 0
+    index.clear(collection.name)
+    offset = 0
+    total = 0
+    while True:
+        results = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        ids = results.get("ids", [])
+        if not ids:
+            break
+        index.upsert(collection.name, ids, results["documents"], results["metadatas"])
+        total += len(ids)
+        offset += page_size
+    print(f"Lexical index rebuilt for '{collection.name}': {total} chunks")
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.vector_store import get_collection
+
+    parser = argparse.ArgumentParser(description="Rebuild the FTS5 lexical index from Chroma")
+    parser.add_argument("--collection", default=os.getenv("INGEST_COLLECTION_NAME", "pm_docs"))
+    args = parser.parse_args()
+    rebuild_from_collection(get_collection(args.collection))
@@ -1,39 +1,126 @@
 import os
-import requests
+import json
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+from app.core import ollama_http
+from app.core.tracing import Span, span
 
 # Values come from config/settings.env via app/__init__.py
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_URL = ollama_http.OLLAMA_URL
 MODEL_NAME = os.getenv("LLM_MODEL_NAME", "llama3:8b")
 LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.2"))
 LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "1024"))
+# How long Ollama keeps the model loaded after a request ("30m", "2h", "-1" = forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
-def chat(messages, temperature=None):
+def keep_alive():
+    """
+    OLLAMA_KEEP_ALIVE as Ollama expects it: a number of seconds or a duration string.
+    """
+    try:
+        return int(OLLAMA_KEEP_ALIVE)
+    except ValueError:
+        return OLLAMA_KEEP_ALIVE
+
+def _chat_payload(messages, temperature, stream):
     if temperature is None:
         temperature = LLM_TEMPERATURE
 
-    payload = {
+    return {
         "model": MODEL_NAME,
         "messages": messages,
-        "stream": False,
+        "stream": stream,
+        "keep_alive": keep_alive(),
         "options": {
             "temperature": temperature,
             "num_predict": LLM_MAX_TOKENS,
         },
     }
-    resp = requests.post(f"{OLLAMA_URL}/api/chat", json=payload)
-    resp.raise_for_status()
-    data = resp.json()
+
+def _parse_stream_line(line) -> tuple[Optional[str], bool, dict]:
+    """
+    Ollama streams NDJSON: one {"message": {"content": ...}, "done": bool} per line;
+    the final line also carries timing stats.
+    Returns (token, done, data).
+    """
+    if not line:
+        return None, False, {}
+    data = json.loads(line)
+    if data.get("error"):
+        raise RuntimeError(f"Ollama error: {data['error']}")
+    token = data.get("message", {}).get("content", "")
+    return token or None, bool(data.get("done")), data
+
+def _record_stats(s: Span, data: dict) -> None:
+    """
+    Attach Ollama's own timings (nanoseconds) from a final response to a span.
+    """
+    s.set("prompt_tokens", data.get("prompt_eval_count"))
+    s.set("completion_tokens", data.get("eval_count"))
+    if data.get("prompt_eval_duration"):
+        s.metric("prefill_ms", data["prompt_eval_duration"] / 1e6)
+    if data.get("load_duration"):
+        s.set("load_ms", data["load_duration"] / 1e6)
+    if data.get("eval_count") and data.get("eval_duration"):
+        s.metric("tokens_per_s", data["eval_count"] / (data["eval_duration"] / 1e9))
+
+def chat(messages, temperature=None):
+    payload = _chat_payload(messages, temperature, stream=False)
+    with span("llm.chat", model=MODEL_NAME, messages=len(messages)) as s:
+        resp = ollama_http.post("/api/chat", payload)
+        resp.raise_for_status()
+        data = resp.json()
+        _record_stats(s, data)
     return data["message"]["content"]
 
+def chat_stream(messages, temperature=None) -> Iterator[str]:
+    """
+    Like chat(), but yields content tokens as Ollama produces them.
+    """
+    payload = _chat_payload(messages, temperature, stream=True)
+    with span("llm.chat_stream", model=MODEL_NAME, messages=len(messages)) as s:
+        started = time.perf_counter()
+        first = True
+        with ollama_http.post("/api/chat", payload, stream=True) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                token, done, data = _parse_stream_line(line)
+                if token:
+                    if first:
+                        s.metric("ttft_ms", (time.perf_counter() - started) * 1000)
+                        first = False
+                    yield token
+                if done:
+                    _record_stats(s, data)
+                    break
+
 def ask_system(user_message, system_prompt):
     """
     Convenience helper: set system + user message, get answer text.
     """
-    msgs = [
+    return chat(_system_messages(user_message, system_prompt))
+
+def ask_system_stream(user_message, system_prompt) -> Iterator[str]:
+    """
+    Streaming counterpart of ask_system().
+    """
+    return chat_stream(_system_messages(user_message, system_prompt))
+
+def _system_messages(user_message, system_prompt):
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_message},
     ]
-    return chat(msgs)
+
+def _history_messages(history, user_message, system_prompt):
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+
+    messages.extend(history)
+    messages.append({"role": "user", "content": user_message})
+    return messages
 
 def chat_with_history(history, user_message, system_prompt=None, temperature=None):
     """
@@ -41,11 +128,50 @@ def chat_with_history(history, user_message, system_prompt=None, temperature=Non
     user_message: latest user message (str)
     system_prompt: optional system-level instruction (str)
     """
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
+    messages = _history_messages(history, user_message, system_prompt)
+    return chat(messages, temperature=temperature)
 
-    messages.extend(history)
-    messages.append({"role": "user", "content": user_message})
+def chat_with_history_stream(history, user_message, system_prompt=None, temperature=None) -> Iterator[str]:
+    """
+    Streaming counterpart of chat_with_history(): yields content tokens.
+    """
+    messages = _history_messages(history, user_message, system_prompt)
+    return chat_stream(messages, temperature=temperature)
+
+# ---------- Async API ----------
+# Same calls over a pooled httpx.AsyncClient, so many generations can be
+# in flight at once, e.g. asyncio.gather(*(aask_system(q, p) for q in qs)).
+
+async def achat(messages, temperature=None) -> str:
+    payload = _chat_payload(messages, temperature, stream=False)
+    with span("llm.chat", model=MODEL_NAME, messages=len(messages)) as s:
+        resp = await ollama_http.apost("/api/chat", payload)
+        resp.raise_for_status()
+        data = resp.json()
+        _record_stats(s, data)
+    return data["message"]["content"]
+
+async def achat_stream(messages, temperature=None) -> AsyncIterator[str]:
+    payload = _chat_payload(messages, temperature, stream=True)
+    with span("llm.chat_stream", model=MODEL_NAME, messages=len(messages)) as s:
+        started = time.perf_counter()
+        first = True
+        async with ollama_http.astream("/api/chat", payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                token, done, data = _parse_stream_line(line)
+                if token:
+                    if first:
+                        s.metric("ttft_ms", (time.perf_counter() - started) * 1000)
+                        first = False
+                    yield token
+                if done:
+                    _record_stats(s, data)
+                    break
+
+async def aask_system(user_message, system_prompt) -> str:
+    return await achat(_system_messages(user_message, system_prompt))
 
-    return chat(messages, temperature=temperature)
\ No newline at end of file
+async def achat_with_history(history, user_message, system_prompt=None, temperature=None) -> str:
+    messages = _history_messages(history, user_message, system_prompt)
+    return await achat(messages, temperature=temperature)
@@ -0,0 +1,158 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
+from app.core.conversations_sqlite import (
+    count_messages,
+    get_conversation_summary,
+    load_messages_range,
+    save_conversation_summary,
+)
+from app.core.llm_client import chat
+from app.core.tokens import count_tokens
+
+# Turns (user + assistant message pairs) always sent verbatim
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+# Token budget for summary + verbatim history sent with each turn
+MEMORY_MAX_TOKENS = int(os.getenv("MEMORY_MAX_TOKENS", "1500"))
+# Target length of the rolling summary
+MEMORY_SUMMARY_MAX_WORDS = int(os.getenv("MEMORY_SUMMARY_MAX_WORDS", "250"))
+# Max transcript tokens folded into the summary per LLM call
+MEMORY_SUMMARY_INPUT_TOKENS = int(os.getenv("MEMORY_SUMMARY_INPUT_TOKENS", "3000"))
+
+SUMMARY_SYSTEM_PROMPT = """
+You maintain a running summary of a conversation between a Product Manager and their copilot.
+Merge the new messages into the existing summary. Keep decisions, open questions, names,
+numbers, dates and commitments; drop pleasantries and repetition.
+Reply with the updated summary only, at most {max_words} words.
+"""
+
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def build_history(
+    conv_id: Optional[str],
+    messages: List[Dict[str, str]],
+    max_tokens: int = MEMORY_MAX_TOKENS,
+) -> List[Dict[str, str]]:
+    """
+    Bounded history for the LLM: the stored rolling summary of older turns
+    (as a system message) plus as many of the remaining recent messages,
+    newest first, as fit in `max_tokens`.
+
+    messages: the loaded tail of the conversation, oldest first, excluding
+    the message being answered. Items carry "order_index" (without it, list
+    position i is taken as order_index i + 1). Messages between the summary
+    and the first loaded one are read from the store if the budget allows.
+    """
+    summary = get_conversation_summary(conv_id) if conv_id else None
+    covered = summary["covered_count"] if summary else 0
+    indexed = [(m.get("order_index", i + 1), m) for i, m in enumerate(messages)]
+
+    head: List[Dict[str, str]] = []
+    if summary and summary["summary"].strip():
+        head.append(
+            {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary['summary']}",
+            }
+        )
+
+    budget = max_tokens - sum(count_tokens(m["content"]) for m in head)
+    kept: List[Dict[str, str]] = []
+    used = 0
+    full = False
+    for idx, m in reversed(indexed):
+        if idx <= covered:
+            break
+        tokens = count_tokens(m["content"])
+        # Always keep the latest message; older ones only while they fit
+        if kept and used + tokens > budget:
+            full = True
+            break
+        kept.append({"role": m["role"], "content": m["content"]})
+        used += tokens
+
+    # Paginated callers may not have loaded everything after the summary
+    first = indexed[0][0] if indexed else None
+    if conv_id and not full and first is not None and first - 1 > covered:
+        for m in reversed(load_messages_range(conv_id, covered, first - 1)):
+            tokens = count_tokens(m["content"])
+            if kept and used + tokens > budget:
+                break
+            kept.append({"role": m["role"], "content": m["content"]})
+            used += tokens
+    kept.reverse()
+    return head + kept
+
+
+def _transcript(messages: List[Dict[str, str]]) -> str:
+    return "\n\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+
+
+def refresh_summary(conv_id: str, recent_turns: int = MEMORY_RECENT_TURNS) -> bool:
+    """
+    Fold every message older than the last `recent_turns` turns that is not
+    yet in the summary into it, and persist the result. Returns True if the
+    summary changed.
+    """
+    target = count_messages(conv_id) - recent_turns * 2
+    summary = get_conversation_summary(conv_id)
+    text = summary["summary"] if summary else ""
+    covered = summary["covered_count"] if summary else 0
+    if target <= covered:
+        return False
+
+    pending = load_messages_range(conv_id, covered, target)
+    while pending:
+        # Fold in slices so a long backlog never overflows the model context
+        batch, used = [], 0
+        for m in pending:
+            tokens = count_tokens(m["content"])
+            if batch and used + tokens > MEMORY_SUMMARY_INPUT_TOKENS:
+                break
+            batch.append(m)
+            used += tokens
+        pending = pending[len(batch):]
+
+        prompt = (
+            f"Current summary:\n{text or '(empty)'}\n\n"
+            f"New messages:\n{_transcript(batch)}\n\n"
+            "Updated summary:"
+        )
+        text = chat(
+            [
+                {
+                    "role": "system",
+                    "content": SUMMARY_SYSTEM_PROMPT.format(max_words=MEMORY_SUMMARY_MAX_WORDS),
+                },
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.0,
+        ).strip()
+        covered = batch[-1]["order_index"]
+        save_conversation_summary(conv_id, text, covered)
+    return True
+
+
+def refresh_summary_async(conv_id: str) -> None:
+    """
+    Refresh the summary on a background thread, so the next turn finds it
+    ready without the user waiting for it. At most one refresh per conversation.
+    """
+    with _in_flight_lock:
+        if conv_id in _in_flight:
+            return
+        _in_flight.add(conv_id)
+
+    def _run():
+        try:
+            refresh_summary(conv_id)
+        except Exception as e:
+            print(f"Summary refresh failed for conversation {conv_id}: {e}")
+        finally:
+            with _in_flight_lock:
+                _in_flight.discard(conv_id)
+
+    threading.Thread(target=_run, name=f"summary-{conv_id[:8]}", daemon=True).start()
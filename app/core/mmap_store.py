@@ -0,0 +1,560 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.embeddings import encode
+
+# Resolve project root (one level above app/)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Relative paths are resolved against the project root; one subfolder per collection
+MMAP_STORE_DIR = str(PROJECT_ROOT / os.getenv("MMAP_STORE_DIR", "data/vector_index"))
+# float16: half of float32 on disk, same ranking in practice
+# int8: a quarter, one float32 scale per vector. Fixed when a collection is created.
+MMAP_STORE_DTYPE = os.getenv("MMAP_STORE_DTYPE", "float16").lower()
+# Vectors scored per matrix product in a full scan (bounds the float32 working copy)
+MMAP_STORE_SCAN_BLOCK = int(os.getenv("MMAP_STORE_SCAN_BLOCK", "65536"))
+
+_DTYPES = {"float16": np.float16, "int8": np.int8}
+# Metadata keys the app filters on (ingestion diffs by source, scoped retrieval by project)
+_INDEXED_KEYS = ("source", "project")
+_KEY_RE = re.compile(r"^[A-Za-z_]\w*$")
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+# Ids / rows per SQL statement
+_SQL_BATCH = 500
+
+
+class MmapCollection:
+    """
+    Vector collection stored in plain files and searched in-process, with
+    the subset of Chroma's Collection API the app uses (see VectorCollection
+    in app/core/vector_store.py).
+
+    - vectors.bin: unit-length embeddings, one fixed-size row per chunk,
+      float16 or int8 (+ scales.bin), memory-mapped rather than loaded
+    - live.bin: one byte per row, 0 for free slots
+    - meta.db: SQLite sidecar mapping row -> (id, document, metadata JSON),
+      with indexes on the metadata keys used in `where` filters
+
+    Opening reads a few header values and maps the files, so it takes
+    milliseconds at any size. Queries are exact: a blocked matrix product
+    over all rows, or over the rows a `where` filter selects in SQLite.
+    Distances are cosine distances (1 - cosine similarity).
+
+    Several processes can share a collection (UI, watcher, batch jobs):
+    writes are serialized by SQLite, and readers remap when another
+    process has changed the files.
+    """
+
+    def __init__(self, name: str, root: str = MMAP_STORE_DIR, dtype: str = MMAP_STORE_DTYPE):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported MMAP_STORE_DTYPE: {dtype!r} (expected one of {tuple(_DTYPES)})")
+        self.name = name
+        self.path = os.path.join(root, name)
+        Path(self.path).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        # Autocommit mode: writes open their own BEGIN IMMEDIATE transactions
+        self._conn = sqlite3.connect(
+            os.path.join(self.path, "meta.db"), check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        with self._transaction():
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    row INTEGER PRIMARY KEY,  -- slot in vectors.bin
+                    id TEXT NOT NULL UNIQUE,
+                    document TEXT,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            for key in _INDEXED_KEYS:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_chunks_{key} ON chunks ({_field(key)})"
+                )
+            # Slots of deleted chunks, reused by the next writes
+            self._conn.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn.execute("INSERT OR IGNORE INTO info (key, value) VALUES ('dtype', ?)", (dtype,))
+        for filename in ("vectors.bin", "scales.bin", "live.bin"):
+            open(os.path.join(self.path, filename), "ab").close()
+
+        self._data_version: Optional[int] = None
+        self._dtype = dtype
+        self._dim = 0
+        self._rows = 0  # high-water mark: slots in use or freed
+        self._capacity = 0
+        self._vectors: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._live: Optional[np.memmap] = None
+        with self._lock:
+            self._refresh()
+
+    # ---------- Files ----------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _refresh(self) -> None:
+        # Caller holds _lock. data_version changes when another connection commits.
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+        info = dict(self._conn.execute("SELECT key, value FROM info").fetchall())
+        self._dtype = info.get("dtype", self._dtype)
+        self._dim = int(info.get("dim", 0))
+        self._rows = int(info.get("rows", 0))
+        self._map()
+
+    def _map(self) -> None:
+        # (Re)map the files at their current size; they only ever grow
+        if not self._dim:
+            return
+        itemsize = np.dtype(_DTYPES[self._dtype]).itemsize
+        capacity = os.path.getsize(self._file("vectors.bin")) // (self._dim * itemsize)
+        if capacity == self._capacity:
+            return
+        self._capacity = capacity
+        if not capacity:
+            return
+        self._vectors = np.memmap(self._file("vectors.bin"), dtype=_DTYPES[self._dtype], mode="r+",
+                                  shape=(capacity, self._dim))
+        self._live = np.memmap(self._file("live.bin"), dtype=np.uint8, mode="r+", shape=(capacity,))
+        if self._dtype == "int8":
+            self._scales = np.memmap(self._file("scales.bin"), dtype=np.float32, mode="r+", shape=(capacity,))
+
+    def _ensure_capacity(self, rows: int) -> None:
+        # Caller holds _lock inside a write transaction. Grow geometrically to amortize remaps.
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2, 1024)
+        itemsize = np.dtype(_DTYPES[self._dtype]).itemsize
+        sizes = {"vectors.bin": capacity * self._dim * itemsize, "live.bin": capacity}
+        if self._dtype == "int8":
+            sizes["scales.bin"] = capacity * 4
+        for filename, size in sizes.items():
+            with open(self._file(filename), "r+b") as f:
+                f.truncate(size)
+        self._map()
+
+    def _write_vectors(self, rows: Sequence[int], vectors: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._vectors[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+            self._scales.flush()
+        else:
+            self._vectors[rows] = vectors.astype(np.float16)
+        self._vectors.flush()
+
+    # ---------- Transactions ----------
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        # IMMEDIATE: take the write lock up front, so slot allocation can't race another process
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _set_info(self, key: str, value: Any) -> None:
+        self._conn.execute(
+            "INSERT INTO info (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    def _records_of(self, ids: Sequence[str]) -> List[Tuple]:
+        found: List[Tuple] = []
+        for start in range(0, len(ids), _SQL_BATCH):
+            part = list(ids[start:start + _SQL_BATCH])
+            found.extend(self._select([f"id IN ({','.join('?' * len(part))})"], part))
+        return found
+
+    def _rows_of(self, ids: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for start in range(0, len(ids), _SQL_BATCH):
+            part = list(ids[start:start + _SQL_BATCH])
+            placeholders = ",".join("?" * len(part))
+            found.update(self._conn.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({placeholders})", part
+            ).fetchall())
+        return found
+
+    # ---------- Writes ----------
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        # Like Chroma, ids that already exist are left unchanged
+        self._put(ids, documents, metadatas, embeddings, replace=False)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        self._put(ids, documents, metadatas, embeddings, replace=True)
+
+    def _put(self, ids, documents, metadatas, embeddings, replace: bool) -> None:
+        ids = list(ids)
+        if not ids:
+            return
+        documents = list(documents) if documents is not None else [None] * len(ids)
+        metadatas = [dict(m or {}) for m in metadatas] if metadatas is not None else [{}] * len(ids)
+        vectors = _as_vectors(embeddings if embeddings is not None else encode(documents), len(ids))
+        # A repeated id keeps its last entry
+        last = {cid: i for i, cid in enumerate(ids)}
+        order = sorted(last.values())
+
+        with self._lock, self._transaction():
+            self._refresh()
+            self._check_dim(vectors.shape[1])
+            existing = self._rows_of([ids[i] for i in order])
+            if not replace:
+                order = [i for i in order if ids[i] not in existing]
+            new = [i for i in order if ids[i] not in existing]
+            free = [row for (row,) in self._conn.execute(
+                "SELECT row FROM free_rows ORDER BY row LIMIT ?", (len(new),)
+            )]
+            self._conn.executemany("DELETE FROM free_rows WHERE row = ?", [(r,) for r in free])
+            rows = dict(existing)
+            high = self._rows
+            reuse = iter(free)
+            for i in new:
+                slot = next(reuse, None)
+                if slot is None:
+                    slot = high
+                    high += 1
+                rows[ids[i]] = slot
+            if not order:
+                return
+            self._ensure_capacity(high)
+            slots = [rows[ids[i]] for i in order]
+            self._write_vectors(slots, vectors[order])
+            # Marked live before the commit: a reader seeing the slot without its row skips it
+            self._live[slots] = 1
+            self._live.flush()
+            self._conn.executemany(
+                """
+                INSERT INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET document = excluded.document, metadata = excluded.metadata
+                """,
+                [(rows[ids[i]], ids[i], documents[i], json.dumps(metadatas[i])) for i in order],
+            )
+            self._set_info("rows", high)
+            self._rows = high
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        """
+        Change existing chunks; unknown ids are ignored. Metadata is merged
+        into the stored one, and a None value removes that key (as in Chroma).
+        New documents without `embeddings` are re-embedded.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        if embeddings is None and documents is not None:
+            embeddings = encode(list(documents))
+        vectors = _as_vectors(embeddings, len(ids)) if embeddings is not None else None
+
+        with self._lock, self._transaction():
+            self._refresh()
+            rows = self._rows_of(ids)
+            if vectors is not None:
+                self._check_dim(vectors.shape[1])
+                known = [i for i, cid in enumerate(ids) if cid in rows]
+                if known:
+                    self._write_vectors([rows[ids[i]] for i in known], vectors[known])
+            if documents is not None:
+                self._conn.executemany(
+                    "UPDATE chunks SET document = ? WHERE id = ?",
+                    [(doc, cid) for cid, doc in zip(ids, documents) if cid in rows],
+                )
+            if metadatas is not None:
+                current = {cid: metadata for _, cid, _, metadata in self._records_of(list(rows))}
+                updates = []
+                for cid, changes in zip(ids, metadatas):
+                    if cid not in current:
+                        continue
+                    merged = json.loads(current[cid])
+                    for key, value in (changes or {}).items():
+                        if value is None:
+                            merged.pop(key, None)
+                        else:
+                            merged[key] = value
+                    current[cid] = json.dumps(merged)
+                    updates.append((current[cid], cid))
+                self._conn.executemany("UPDATE chunks SET metadata = ? WHERE id = ?", updates)
+
+    def delete(self, ids=None, where=None) -> None:
+        with self._lock:
+            with self._transaction():
+                self._refresh()
+                if ids is not None:
+                    rows = list(self._rows_of(list(ids)).values())
+                    if where is not None:
+                        rows = sorted(set(rows) & set(self._filter_rows(where)))
+                elif where is not None:
+                    rows = self._filter_rows(where)
+                else:
+                    return
+                self._conn.executemany("DELETE FROM chunks WHERE row = ?", [(r,) for r in rows])
+                self._conn.executemany("INSERT OR IGNORE INTO free_rows (row) VALUES (?)", [(r,) for r in rows])
+            # Hidden from full scans only once the rows are gone
+            if rows and self._live is not None:
+                self._live[rows] = 0
+                self._live.flush()
+
+    # ---------- Reads ----------
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def get(self, ids=None, where=None, limit=None, offset=None,
+            include=("documents", "metadatas")) -> Dict[str, Any]:
+        """
+        Chunks by id and/or metadata filter, in storage order, paged by
+        limit / offset. Returns {"ids", "documents", "metadatas", "embeddings"};
+        fields not in `include` are None.
+        """
+        include = list(include or [])
+        clauses, params = [], []
+        if where:
+            sql, params = _where_sql(where)
+            clauses.append(sql)
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                found = self._records_of(list(ids))
+                if where:
+                    allowed = set(self._filter_rows(where))
+                    found = [r for r in found if r[0] in allowed]
+                found.sort(key=lambda r: r[0])
+                found = found[offset or 0:][:limit] if limit is not None else found[offset or 0:]
+            else:
+                found = self._select(clauses, params, limit, offset)
+            vectors = self._dequantize([r[0] for r in found]) if "embeddings" in include else None
+        return {
+            "ids": [r[1] for r in found],
+            "documents": [r[2] for r in found] if "documents" in include else None,
+            "metadatas": [json.loads(r[3]) for r in found] if "metadatas" in include else None,
+            "embeddings": vectors.tolist() if vectors is not None else None,
+        }
+
+    def _select(self, clauses: List[str], params: List[Any], limit: Optional[int] = None,
+                offset: Optional[int] = None) -> List[Tuple]:
+        sql = "SELECT row, id, document, metadata FROM chunks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [-1 if limit is None else limit, offset or 0]
+        return self._conn.execute(sql, params).fetchall()
+
+    def _filter_rows(self, where: Dict[str, Any]) -> List[int]:
+        sql, params = _where_sql(where)
+        return [row for (row,) in self._conn.execute(f"SELECT row FROM chunks WHERE {sql} ORDER BY row", params)]
+
+    def _dequantize(self, rows: Sequence[int]) -> np.ndarray:
+        if not rows:
+            return np.zeros((0, self._dim), dtype=np.float32)
+        vectors = self._vectors[np.asarray(rows)].astype(np.float32)
+        if self._dtype == "int8":
+            vectors *= self._scales[np.asarray(rows)][:, None]
+        return vectors
+
+    def query(self, query_embeddings, n_results: int = 10, where=None,
+              include=("documents", "metadatas", "distances")) -> Dict[str, Any]:
+        """
+        Nearest chunks for each query vector, shaped like Chroma's query()
+        output: {"ids": [[...] per query], "documents", "metadatas", "distances"}.
+        """
+        include = list(include or [])
+        queries = _as_vectors(query_embeddings, None)
+        with self._lock:
+            self._refresh()
+            candidates = self._filter_rows(where) if where else None
+            # Snapshot: the maps stay valid for these rows even if a writer grows the files
+            vectors, scales, live, rows, dim = self._vectors, self._scales, self._live, self._rows, self._dim
+        if not rows or vectors is None or n_results <= 0:
+            top = [([], []) for _ in range(len(queries))]
+        else:
+            if queries.shape[1] != dim:
+                raise ValueError(f"Query dimension {queries.shape[1]} does not match collection dimension {dim}")
+            top = _search(vectors, scales, live, rows, queries, n_results, candidates)
+
+        wanted = sorted({row for rows_, _ in top for row in rows_})
+        with self._lock:
+            records = {}
+            for start in range(0, len(wanted), _SQL_BATCH):
+                part = wanted[start:start + _SQL_BATCH]
+                for row, cid, document, metadata in self._select(
+                    [f"row IN ({','.join('?' * len(part))})"], part
+                ):
+                    records[row] = (cid, document, metadata)
+
+        out: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for rows_, scores in top:
+            # Slots written but not committed yet (or just deleted) have no record
+            hits = [(records[r], s) for r, s in zip(rows_, scores) if r in records][:n_results]
+            out["ids"].append([rec[0] for rec, _ in hits])
+            out["documents"].append([rec[1] for rec, _ in hits])
+            out["metadatas"].append([json.loads(rec[2]) for rec, _ in hits])
+            out["distances"].append([1.0 - s for _, s in hits])
+        for field in ("documents", "metadatas", "distances"):
+            if field not in include:
+                out[field] = None
+        out["embeddings"] = None
+        return out
+
+    def _check_dim(self, dim: int) -> None:
+        # Caller holds _lock inside a write transaction: the first write fixes the dimension
+        if not self._dim:
+            self._dim = dim
+            self._set_info("dim", dim)
+            self._map()
+        elif dim != self._dim:
+            raise ValueError(f"Embedding dimension {dim} does not match collection dimension {self._dim}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+            self._vectors = self._scales = self._live = None
+
+
+def _field(key: str) -> str:
+    # Must match the indexed expression exactly for SQLite to use the index
+    return f"json_extract(metadata, '$.{key}')"
+
+
+def _where_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """
+    Translate a Chroma metadata filter ({"key": value}, {"key": {"$in": [...]}},
+    {"$and": [...]}, ...) into a SQL condition over the metadata JSON.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(w) for w in cond]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+        if not _KEY_RE.match(key):
+            raise ValueError(f"Unsupported metadata key in where filter: {key!r}")
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, value in cond.items():
+            if op in _COMPARISONS:
+                clauses.append(f"{_field(key)} {_COMPARISONS[op]} ?")
+                params.append(value)
+            elif op in ("$in", "$nin"):
+                values = list(value)
+                negate = "NOT " if op == "$nin" else ""
+                clauses.append(f"{_field(key)} {negate}IN ({','.join('?' * len(values))})")
+                params.extend(values)
+            else:
+                raise ValueError(f"Unsupported where operator: {op!r}")
+    return " AND ".join(clauses) or "1", params
+
+
+def _as_vectors(embeddings, n: Optional[int]) -> np.ndarray:
+    # Unit rows: ranking by dot product is then ranking by cosine similarity
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors = vectors.reshape(n if n is not None else -1, vectors.shape[-1])
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _search(vectors: np.ndarray, scales: Optional[np.ndarray], live: np.ndarray, rows: int,
+            queries: np.ndarray, k: int, candidates: Optional[List[int]]) -> List[Tuple[List[int], List[float]]]:
+    """
+    Exact top-k (rows, cosine similarities) per query, best first. Scans
+    either all live rows or just `candidates`, MMAP_STORE_SCAN_BLOCK at a time.
+    """
+    best_rows: List[np.ndarray] = []
+    best_scores: List[np.ndarray] = []
+    block = max(1, MMAP_STORE_SCAN_BLOCK)
+    if candidates is None:
+        spans = [np.arange(start, min(start + block, rows)) for start in range(0, rows, block)]
+    else:
+        picked = np.asarray(candidates, dtype=np.int64)
+        picked = picked[picked < rows]
+        spans = [picked[start:start + block] for start in range(0, len(picked), block)]
+
+    for span_rows in spans:
+        if not len(span_rows):
+            continue
+        if candidates is None:
+            # Contiguous slice: a view of the map, converted block by block
+            part = vectors[span_rows[0]:span_rows[-1] + 1]
+            part_scales = scales[span_rows[0]:span_rows[-1] + 1] if scales is not None else None
+            alive = live[span_rows[0]:span_rows[-1] + 1] != 0
+        else:
+            part = vectors[span_rows]
+            part_scales = scales[span_rows] if scales is not None else None
+            alive = None
+        scores = part.astype(np.float32) @ queries.T  # (rows, queries)
+        if part_scales is not None:
+            scores *= part_scales[:, None]
+        if alive is not None:
+            scores[~alive] = -np.inf
+        take = min(k, len(span_rows))
+        idx = np.argpartition(-scores, take - 1, axis=0)[:take]
+        best_rows.append(span_rows[idx])
+        best_scores.append(np.take_along_axis(scores, idx, axis=0))
+
+    if not best_rows:
+        return [([], []) for _ in range(len(queries))]
+    all_rows = np.concatenate(best_rows)
+    all_scores = np.concatenate(best_scores)
+    out = []
+    for q in range(len(queries)):
+        order = np.argsort(-all_scores[:, q], kind="stable")[:k]
+        keep = [i for i in order if np.isfinite(all_scores[i, q])]
+        out.append(([int(all_rows[i, q]) for i in keep], [float(all_scores[i, q]) for i in keep]))
+    return out
+
+
+_collections: Dict[Tuple[str, str], MmapCollection] = {}
+_collections_lock = threading.Lock()
+
+
+def get_mmap_collection(name: str = "pm_docs", root: str = MMAP_STORE_DIR) -> MmapCollection:
+    """
+    Process-wide handle per collection (opened, or created, on first use).
+    """
+    key = (root, name)
+    coll = _collections.get(key)
+    if coll is None:
+        with _collections_lock:
+            coll = _collections.get(key)
+            if coll is None:
+                coll = _collections[key] = MmapCollection(name, root)
+    return coll
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.core.vector_store import copy_collection, get_collection
+
+    parser = argparse.ArgumentParser(description="Copy a Chroma collection into the memory-mapped store")
+    parser.add_argument("--collection", default=os.getenv("INGEST_COLLECTION_NAME", "pm_docs"))
+    args = parser.parse_args()
+    copied = copy_collection(get_collection(args.collection, backend="chroma"), get_mmap_collection(args.collection))
+    print(f"Copied {copied} chunks of '{args.collection}' into {os.path.join(MMAP_STORE_DIR, args.collection)}")
@@ -0,0 +1,160 @@
+import os
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+if TYPE_CHECKING:
+    # Imported on first async call: the sync path (CLI tools, batch runs) never needs it
+    import httpx
+
+# Values come from config/settings.env via app/__init__.py
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "3"))
+OLLAMA_RETRY_BACKOFF = float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.5"))
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "10"))
+
+# Ollama answers 503 while it is still loading a model
+RETRY_STATUSES = (502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+# One AsyncClient per event loop: httpx clients can't be shared across loops
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def timeout() -> tuple:
+    """
+    (connect, read) timeout in seconds, as accepted by requests.
+    """
+    return (OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT)
+
+
+# ---------- Sync (requests) ----------
+
+def get_session() -> requests.Session:
+    """
+    Process-wide keep-alive session over a shared connection pool, with
+    backoff retries on connection errors and 502/503/504.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=OLLAMA_MAX_RETRIES,
+                    connect=OLLAMA_MAX_RETRIES,
+                    read=0,  # a timed-out generation is not safe to blindly repeat
+                    status=OLLAMA_MAX_RETRIES,
+                    backoff_factor=OLLAMA_RETRY_BACKOFF,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset({"GET", "POST"}),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=OLLAMA_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def post(path: str, payload: Dict[str, Any], stream: bool = False) -> requests.Response:
+    return get_session().post(
+        f"{OLLAMA_URL}{path}",
+        json=payload,
+        stream=stream,
+        timeout=timeout(),
+    )
+
+
+def get(path: str) -> requests.Response:
+    return get_session().get(f"{OLLAMA_URL}{path}", timeout=timeout())
+
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# ---------- Async (httpx) ----------
+
+def get_async_client() -> "httpx.AsyncClient":
+    """
+    Pooled keep-alive AsyncClient for the running event loop.
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=OLLAMA_URL,
+            timeout=httpx.Timeout(
+                OLLAMA_READ_TIMEOUT,
+                connect=OLLAMA_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_POOL_SIZE,
+                max_keepalive_connections=OLLAMA_POOL_SIZE,
+            ),
+            # Transport-level retries cover failed connection attempts only
+            transport=httpx.AsyncHTTPTransport(retries=OLLAMA_MAX_RETRIES),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def apost(path: str, payload: Dict[str, Any]) -> "httpx.Response":
+    """
+    POST with exponential backoff on 502/503/504. The response body is read.
+    """
+    client = get_async_client()
+    for attempt in range(OLLAMA_MAX_RETRIES + 1):
+        resp = await client.post(path, json=payload)
+        if resp.status_code not in RETRY_STATUSES or attempt == OLLAMA_MAX_RETRIES:
+            return resp
+        await asyncio.sleep(OLLAMA_RETRY_BACKOFF * (2 ** attempt))
+    return resp
+
+
+@asynccontextmanager
+async def astream(path: str, payload: Dict[str, Any]) -> AsyncIterator["httpx.Response"]:
+    """
+    Streaming POST with the same backoff as apost(); yields the open response.
+    """
+    client = get_async_client()
+    for attempt in range(OLLAMA_MAX_RETRIES + 1):
+        request = client.build_request("POST", path, json=payload)
+        resp = await client.send(request, stream=True)
+        if resp.status_code not in RETRY_STATUSES or attempt == OLLAMA_MAX_RETRIES:
+            break
+        await resp.aclose()
+        await asyncio.sleep(OLLAMA_RETRY_BACKOFF * (2 ** attempt))
+    try:
+        yield resp
+    finally:
+        await resp.aclose()
+
+
+async def aclose_async_client() -> None:
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,8 +1,16 @@
 import os
-
-from app.core.vector_store import get_collection, query as vs_query
-from app.core.llm_client import ask_system
-from app.core.llm_client import chat_with_history
+import time
+import hashlib
+from typing import Any, Dict, Iterator, Optional, Union
+
+from app.core.answer_cache import get_answer_cache
+from app.core.context_packer import pack_context
+from app.core.embeddings import EMBEDDING_MODEL_NAME, EMBEDDING_PRECISION, encode
+from app.core.tracing import span
+from app.core.rerank import RERANK_ENABLED
+from app.core.retrieval import RAG_RETRIEVAL_MODE, retrieve
+from app.core.llm_client import MODEL_NAME, ask_system, ask_system_stream
+from app.core.llm_client import chat_with_history, chat_with_history_stream
 
 CONVERSATION_SYSTEM_PROMPT = """
 You are a senior Product Management copilot.
@@ -20,61 +28,163 @@ Be concise but structured, and prefer bullet points when helpful.
 """
 
 RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
-RAG_MAX_CONTEXT_CHARS = int(os.getenv("RAG_MAX_CONTEXT_CHARS", "8000"))
+# Prompt budget for retrieved context, in model tokens (see app/core/tokens.py)
+RAG_MAX_CONTEXT_TOKENS = int(os.getenv("RAG_MAX_CONTEXT_TOKENS", "2000"))
 
-def build_context(results):
+def build_context(results, max_tokens: Optional[int] = RAG_MAX_CONTEXT_TOKENS):
     """
-    Turn Chroma query results into a readable context string.
+    Turn Chroma query results into a readable context string that fits
+    `max_tokens`: adjacent chunks are merged without their overlap and
+    whole chunks are dropped, least relevant first, when over budget.
     """
-    docs = results.get("documents", [[]])[0]
-    metas = results.get("metadatas", [[]])[0]
-
-    parts = []
-    for d, m in zip(docs, metas):
-        source = m.get("source", "unknown")
-        idx = m.get("chunk_index", 0)
-        parts.append(f"[Source: {source} (chunk {idx})]\n{d}")
-
-    return "\n\n---\n\n".join(parts)
-
-def rag_answer(user_question: str, k: int = 5) -> str:
-    if k is None:
-        k = RAG_TOP_K
+    with span("rag.build_context", max_tokens=max_tokens) as s:
+        context = pack_context(results, max_tokens=max_tokens)
+        s.set("context_chars", len(context))
+    return context
+
+NO_CONTEXT_ANSWER = "I couldn't find any relevant context in your documents for that question."
+
+def _retrieve(query_text: str, k: int, mode: Optional[str], rerank: Optional[bool],
+              project: Optional[str] = None):
+    with span("rag.retrieve", k=k, mode=mode, rerank=rerank, project=project) as s:
+        results = retrieve(query_text, k=k, mode=mode, rerank=rerank, project=project)
+        s.set("chunks", len((results.get("documents") or [[]])[0]))
+    return results
+
+def _stream_with_ttft(s, started: float, tokens: Iterator[str]) -> Iterator[str]:
+    # Time to first token as the user sees it: retrieval + prompt prefill
+    first = True
+    for token in tokens:
+        if first:
+            s.metric("ttft_ms", (time.perf_counter() - started) * 1000)
+            first = False
+        yield token
+
+def rag_prompt_from_results(user_question: str, results) -> Optional[str]:
     """
-    Retrieve relevant chunks from pm_docs and ask the LLM to answer.
+    Single-turn prompt for already retrieved results (None if there are none).
     """
-    coll = get_collection("pm_docs")
-    results = vs_query(coll, user_question, k=k)
-
     # If nothing came back, fail gracefully
     if not results.get("documents") or not results["documents"][0]:
-        return "I couldn't find any relevant context in your documents for that question."
+        return None
 
     context = build_context(results)
-    # optional: truncate context to avoid huge prompts
-    context = context[:RAG_MAX_CONTEXT_CHARS]
 
-    prompt = (
+    return (
         f"Context:\n{context}\n\n"
         f"User question: {user_question}\n\n"
         f"Answer:"
     )
 
-    return ask_system(prompt, SYSTEM_PROMPT)
+def _answer_cache_params(k: int, mode: Optional[str], rerank: Optional[bool],
+                         project: Optional[str] = None) -> str:
+    # Everything that shapes a single-turn answer; cached answers are only reused under the same key
+    mode = (mode or RAG_RETRIEVAL_MODE).lower()
+    rerank = RERANK_ENABLED if rerank is None else rerank
+    prompt = hashlib.sha256(SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+    return (
+        f"{MODEL_NAME}|{EMBEDDING_MODEL_NAME}|{EMBEDDING_PRECISION}|k={k}|{mode}|"
+        f"rerank={int(rerank)}|ctx={RAG_MAX_CONTEXT_TOKENS}|prompt={prompt}|project={project or ''}"
+    )
 
-def conversational_rag_answer(
-    user_message: str,
-    history: list[dict],
-    k: int | None = None,
-) -> str:
+def _cache_lookup(s, user_question: str, k: int, mode: Optional[str], rerank: Optional[bool],
+                  use_cache: Optional[bool], project: Optional[str] = None):
     """
-    history: list of {"role": "user"|"assistant", "content": str} from previous turns.
+    Returns (cache, params, question vector, hit); cache is None when caching is off.
+    """
+    cache = get_answer_cache() if use_cache is not False else None
+    if cache is None:
+        return None, None, None, None
+    params = _answer_cache_params(k, mode, rerank, project)
+    # Same text retrieval embeds next, so the embedding cache absorbs the second encode
+    vector = encode([user_question], normalize=True)[0]
+    hit = cache.lookup(params, user_question, vector)
+    s.set("cached", hit is not None)
+    return cache, params, vector, hit
+
+def _cache_store(cache, params, vector, user_question: str, answer: str, results) -> None:
+    if cache is not None and answer.strip():
+        cache.put(params, user_question, vector, answer, (results.get("ids") or [[]])[0])
+
+def _with_meta(answer: str, hit: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        "answer": answer,
+        "cached": hit is not None,
+        "similarity": hit["similarity"] if hit else None,
+        "cached_question": hit["question"] if hit else None,
+    }
+
+def rag_answer(user_question: str, k: int = 5, mode: Optional[str] = None,
+               rerank: Optional[bool] = None, use_cache: Optional[bool] = None,
+               with_meta: bool = False, project: Optional[str] = None) -> Union[str, Dict[str, Any]]:
+    """
+    Retrieve relevant chunks from pm_docs and ask the LLM to answer.
+    mode: retrieval mode ("dense", "lexical", "hybrid"); defaults to RAG_RETRIEVAL_MODE.
+    rerank: cross-encoder rerank of over-fetched candidates; defaults to RERANK_ENABLED.
+    use_cache: serve near-duplicate questions from the answer cache (see
+    app/core/answer_cache.py); False bypasses it, None follows ANSWER_CACHE_ENABLED.
+    with_meta: return {"answer", "cached", "similarity", "cached_question"}
+    instead of the answer text.
+    project: retrieve only from documents tagged with this project.
     """
     if k is None:
         k = RAG_TOP_K
 
-    coll = get_collection("pm_docs")
-    results = vs_query(coll, user_message, k=k)
+    with span("rag.answer", k=k) as s:
+        cache, params, vector, hit = _cache_lookup(s, user_question, k, mode, rerank, use_cache, project)
+        if hit is not None:
+            return _with_meta(hit["answer"], hit) if with_meta else hit["answer"]
+
+        results = _retrieve(user_question, k, mode, rerank, project)
+        prompt = rag_prompt_from_results(user_question, results)
+        if prompt is None:
+            answer = NO_CONTEXT_ANSWER
+        else:
+            answer = ask_system(prompt, SYSTEM_PROMPT)
+            _cache_store(cache, params, vector, user_question, answer, results)
+
+        return _with_meta(answer) if with_meta else answer
+
+def rag_answer_stream(user_question: str, k: int = 5, mode: Optional[str] = None,
+                      rerank: Optional[bool] = None,
+                      use_cache: Optional[bool] = None,
+                      project: Optional[str] = None) -> Iterator[str]:
+    """
+    Streaming counterpart of rag_answer(): yields answer tokens as they arrive.
+    A cached answer is yielded in one piece; a streamed one is cached only
+    if the stream ran to completion.
+    """
+    if k is None:
+        k = RAG_TOP_K
+
+    with span("rag.answer_stream", k=k) as s:
+        started = time.perf_counter()
+        cache, params, vector, hit = _cache_lookup(s, user_question, k, mode, rerank, use_cache, project)
+        if hit is not None:
+            yield hit["answer"]
+            return
+
+        results = _retrieve(user_question, k, mode, rerank, project)
+        prompt = rag_prompt_from_results(user_question, results)
+        if prompt is None:
+            yield NO_CONTEXT_ANSWER
+            return
+
+        parts = []
+        for token in _stream_with_ttft(s, started, ask_system_stream(prompt, SYSTEM_PROMPT)):
+            parts.append(token)
+            yield token
+        _cache_store(cache, params, vector, user_question, "".join(parts), results)
+
+def _conversation_history(user_message: str, history: list[dict], k: int,
+                          mode: Optional[str] = None,
+                          rerank: Optional[bool] = None,
+                          project: Optional[str] = None) -> list[dict]:
+    """
+    Retrieve context for this turn and append it to the history
+    as a pseudo-assistant message.
+    """
+    results = _retrieve(user_message, k, mode, rerank, project)
     context = build_context(results)
 
     # Build a special message that injects the retrieved context for this turn.
@@ -87,12 +197,57 @@ def conversational_rag_answer(
     )
 
     # Extend history with a pseudo-assistant message containing the context
-    extended_history = history + [
+    return history + [
         {"role": "assistant", "content": context_block}
     ]
 
-    return chat_with_history(
-        history=extended_history,
-        user_message=user_message,
-        system_prompt=CONVERSATION_SYSTEM_PROMPT,
-    )
\ No newline at end of file
+def conversational_rag_answer(
+    user_message: str,
+    history: list[dict],
+    k: int | None = None,
+    mode: str | None = None,
+    rerank: bool | None = None,
+    project: str | None = None,
+) -> str:
+    """
+    history: list of {"role": "user"|"assistant", "content": str} from previous turns.
+    mode: retrieval mode ("dense", "lexical", "hybrid"); defaults to RAG_RETRIEVAL_MODE.
+    rerank: cross-encoder rerank of over-fetched candidates; defaults to RERANK_ENABLED.
+    project: retrieve only from documents tagged with this project, i.e. the
+    conversation's project doc_tag (see get_conversation_doc_tag).
+    """
+    if k is None:
+        k = RAG_TOP_K
+
+    with span("rag.conversation_answer", k=k, history_messages=len(history)):
+        extended_history = _conversation_history(user_message, history, k, mode, rerank, project)
+
+        return chat_with_history(
+            history=extended_history,
+            user_message=user_message,
+            system_prompt=CONVERSATION_SYSTEM_PROMPT,
+        )
+
+def conversational_rag_answer_stream(
+    user_message: str,
+    history: list[dict],
+    k: int | None = None,
+    mode: str | None = None,
+    rerank: bool | None = None,
+    project: str | None = None,
+) -> Iterator[str]:
+    """
+    Streaming counterpart of conversational_rag_answer(): yields answer tokens.
+    """
+    if k is None:
+        k = RAG_TOP_K
+
+    with span("rag.conversation_answer_stream", k=k, history_messages=len(history)) as s:
+        started = time.perf_counter()
+        extended_history = _conversation_history(user_message, history, k, mode, rerank, project)
+
+        yield from _stream_with_ttft(s, started, chat_with_history_stream(
+            history=extended_history,
+            user_message=user_message,
+            system_prompt=CONVERSATION_SYSTEM_PROMPT,
+        ))
@@ -0,0 +1,175 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes")
+RERANK_MODEL_NAME = os.getenv("RERANK_MODEL_NAME", "BAAI/bge-reranker-v2-m3")
+# Empty -> let sentence-transformers pick (cuda / mps / cpu)
+RERANK_DEVICE = os.getenv("RERANK_DEVICE", "") or None
+# Candidates over-fetched from retrieval and scored by the cross-encoder
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+# Skip reranking when the estimated scoring time would exceed this
+RERANK_LATENCY_BUDGET_MS = float(os.getenv("RERANK_LATENCY_BUDGET_MS", "800"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+# While over budget, every Nth query scores this many uncached pairs to re-measure the cost
+RERANK_PROBE_EVERY = int(os.getenv("RERANK_PROBE_EVERY", "20"))
+RERANK_PROBE_PAIRS = int(os.getenv("RERANK_PROBE_PAIRS", "2"))
+
+_model = None
+_model_lock = threading.Lock()
+
+# (query hash, chunk key) -> score, LRU-bounded
+_score_cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Exponential moving average of scoring cost per (query, chunk) pair
+_ms_per_pair: Optional[float] = None
+# The first forward pass after loading is kept out of the average: it pays
+# one-off costs (allocation, kernel selection) that later queries don't
+_cold = True
+# Queries skipped since the last probe
+_skipped = 0
+
+
+def get_reranker():
+    """
+    Shared CrossEncoder, loaded on first use.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import CrossEncoder
+
+                _model = CrossEncoder(RERANK_MODEL_NAME, device=RERANK_DEVICE)
+    return _model
+
+
+def _key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def estimated_ms(n_pairs: int) -> Optional[float]:
+    """
+    Expected cost of scoring `n_pairs` uncached pairs, or None before the
+    first measurement.
+    """
+    if _ms_per_pair is None:
+        return None
+    return _ms_per_pair * n_pairs
+
+
+def score_pairs(query_text: str, chunks: List[Tuple[str, str]]) -> List[float]:
+    """
+    Cross-encoder scores for [(chunk key, text)], using cached scores where
+    available and one batched forward pass for the rest.
+    """
+    global _ms_per_pair, _cold
+    qkey = _key(query_text)
+    scores: Dict[str, float] = {}
+    with _cache_lock:
+        for ckey, _ in chunks:
+            cached = _score_cache.get((qkey, ckey))
+            if cached is not None:
+                _score_cache.move_to_end((qkey, ckey))
+                scores[ckey] = cached
+
+    todo = [(ckey, text) for ckey, text in chunks if ckey not in scores]
+    if todo:
+        model = get_reranker()  # loading time is not part of the per-pair estimate
+        started = time.perf_counter()
+        raw = model.predict(
+            [(query_text, text) for _, text in todo],
+            batch_size=len(todo),
+            show_progress_bar=False,
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        per_pair = elapsed_ms / len(todo)
+        if _cold:
+            _cold = False
+        else:
+            _ms_per_pair = per_pair if _ms_per_pair is None else 0.7 * _ms_per_pair + 0.3 * per_pair
+
+        with _cache_lock:
+            for (ckey, _), s in zip(todo, raw):
+                scores[ckey] = float(s)
+                _score_cache[(qkey, ckey)] = float(s)
+            while len(_score_cache) > RERANK_CACHE_SIZE:
+                _score_cache.popitem(last=False)
+
+    return [scores[ckey] for ckey, _ in chunks]
+
+
+def warm_reranker() -> None:
+    """
+    Load the cross-encoder and run one pair through it. The cost estimate
+    starts over, measured on the warm model from the next query on.
+    """
+    global _ms_per_pair, _cold, _skipped
+    get_reranker().predict([("warm-up", "warm-up")], show_progress_bar=False)
+    with _cache_lock:
+        _ms_per_pair = None
+        _cold = False
+        _skipped = 0
+
+
+def _probe(query_text: str, qkey: str, keys: List[str], docs: List[str]) -> None:
+    # Every RERANK_PROBE_EVERY skips, score a few pairs so the estimate can
+    # come back down: one slow pass must not disable reranking for good
+    global _skipped
+    with _cache_lock:
+        _skipped += 1
+        if _skipped < RERANK_PROBE_EVERY:
+            return
+        _skipped = 0
+        probe = [(ck, d) for ck, d in zip(keys, docs) if (qkey, ck) not in _score_cache][:RERANK_PROBE_PAIRS]
+    if probe:
+        score_pairs(query_text, probe)
+
+
+def rerank(
+    query_text: str,
+    results: Dict[str, Any],
+    k: int,
+    latency_budget_ms: float = RERANK_LATENCY_BUDGET_MS,
+) -> Dict[str, Any]:
+    """
+    Reorder query results (collection.query() shape) by cross-encoder score
+    and keep the best k. If scoring the uncached candidates is expected to
+    exceed `latency_budget_ms`, the retrieval order is kept instead and the
+    result carries "rerank_skipped": {"estimate_ms", "pairs"}.
+    """
+    docs = (results.get("documents") or [[]])[0]
+    ids = (results.get("ids") or [[]])[0] or [None] * len(docs)
+    if not docs:
+        return results
+
+    keys = [cid or _key(d) for cid, d in zip(ids, docs)]
+    qkey = _key(query_text)
+    with _cache_lock:
+        uncached = sum(1 for ck in keys if (qkey, ck) not in _score_cache)
+    estimate = estimated_ms(uncached)
+    if estimate is not None and estimate > latency_budget_ms:
+        _probe(query_text, qkey, keys, docs)
+        # Reported to the caller's span (see app/core/retrieval.py), not printed per query
+        out = _select(results, list(range(min(k, len(docs)))))
+        out["rerank_skipped"] = {"estimate_ms": round(estimate), "pairs": uncached}
+        return out
+
+    scores = score_pairs(query_text, list(zip(keys, docs)))
+    order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)[:k]
+    out = _select(results, order)
+    out["rerank_scores"] = [[scores[i] for i in order]]
+    return out
+
+
+def _select(results: Dict[str, Any], order: List[int]) -> Dict[str, Any]:
+    out = {}
+    for field in ("ids", "documents", "metadatas", "distances", "scores"):
+        values = results.get(field)
+        if values and values[0] is not None:
+            out[field] = [[values[0][i] for i in order]]
+    return out
@@ -0,0 +1,195 @@
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.lexical_index import get_lexical_index
+from app.core.rerank import RERANK_CANDIDATES, RERANK_ENABLED, rerank as rerank_results
+from app.core.tracing import span
+from app.core.vector_store import get_collection, query as vs_query, query_many as vs_query_many
+
+# dense | lexical | hybrid
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "dense").lower()
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+# Candidates fetched from each retriever before fusion
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+# Reciprocal-rank-fusion damping constant (60 in the original RRF paper)
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# Ticket keys (PM-123), snake_case / camelCase names, metric names with digits
+_IDENTIFIER_RE = re.compile(
+    r"\b(?:[A-Z][A-Z0-9]+-\d+|\w+_\w+|[a-z]+[A-Z]\w*|[A-Za-z]+\d+\w*)\b"
+)
+
+
+def default_weights(query_text: str) -> Tuple[float, float]:
+    """
+    (dense, lexical) fusion weights for a query: queries that mention exact
+    identifiers lean on the lexical index, plain questions on embeddings.
+    """
+    if _IDENTIFIER_RE.search(query_text):
+        return 1.0, 1.5
+    return 1.0, 0.7
+
+
+def project_filter(project: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Chroma `where` filter for the chunks of one project (None: no filter).
+    """
+    return {"project": project} if project else None
+
+
+def _dense_hits(collection, query_text: str, k: int,
+                results: Optional[Dict[str, Any]] = None,
+                project: Optional[str] = None) -> List[Dict[str, Any]]:
+    if results is None:
+        results = vs_query(collection, query_text, k=k, where=project_filter(project))
+    ids = (results.get("ids") or [[]])[0]
+    docs = (results.get("documents") or [[]])[0]
+    metas = (results.get("metadatas") or [[]])[0]
+    return [
+        {"id": cid, "document": d, "metadata": m or {}}
+        for cid, d, m in zip(ids, docs, metas)
+    ]
+
+
+def _lexical_hits(collection, query_text: str, k: int,
+                  project: Optional[str] = None) -> List[Dict[str, Any]]:
+    index = get_lexical_index()
+    if index is None:
+        return []
+    with span("retrieval.lexical", k=k):
+        return index.search(collection.name, query_text, k=k, project=project)
+
+
+def _as_results(hits: List[Dict[str, Any]], scores: Optional[List[float]] = None) -> Dict[str, Any]:
+    # Same shape as collection.query() output, so build_context etc. work unchanged
+    return {
+        "ids": [[h["id"] for h in hits]],
+        "documents": [[h["document"] for h in hits]],
+        "metadatas": [[h["metadata"] for h in hits]],
+        "scores": [scores if scores is not None else [h.get("score") for h in hits]],
+    }
+
+
+def rrf_fuse(
+    ranked_lists: List[List[Dict[str, Any]]],
+    weights: List[float],
+    k: int,
+    rrf_k: int = RAG_RRF_K,
+) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """
+    Weighted reciprocal-rank fusion: score(d) = sum_i w_i / (rrf_k + rank_i(d)).
+    """
+    scores: Dict[str, float] = {}
+    hits: Dict[str, Dict[str, Any]] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        for rank, hit in enumerate(ranked, start=1):
+            scores[hit["id"]] = scores.get(hit["id"], 0.0) + weight / (rrf_k + rank)
+            hits.setdefault(hit["id"], hit)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [hits[cid] for cid in best], [scores[cid] for cid in best]
+
+
+def retrieve(
+    query_text: str,
+    k: int,
+    mode: Optional[str] = None,
+    weights: Optional[Tuple[float, float]] = None,
+    collection_name: str = "pm_docs",
+    rerank: Optional[bool] = None,
+    project: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Retrieve the top-k chunks for a query.
+
+    mode: "dense" (Chroma only), "lexical" (FTS5/BM25 only) or "hybrid"
+    (both, fused with reciprocal-rank fusion). weights: (dense, lexical)
+    for hybrid; defaults to default_weights(query_text).
+    rerank: over-fetch RERANK_CANDIDATES and keep the k best by cross-encoder
+    score; defaults to RERANK_ENABLED.
+    project: search only chunks tagged with this project (see
+    app/ingestion/ingest.py); None searches the whole collection.
+    """
+    mode = (mode or RAG_RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode!r} (expected one of {RETRIEVAL_MODES})")
+    if rerank is None:
+        rerank = RERANK_ENABLED
+
+    coll = get_collection(collection_name)
+    n = max(k, RERANK_CANDIDATES) if rerank else k
+    results = _retrieve(coll, query_text, n, mode, weights, project=project)
+    if rerank:
+        results = _rerank(query_text, results, k)
+    return results
+
+
+def retrieve_many(
+    query_texts: List[str],
+    k: int,
+    mode: Optional[str] = None,
+    collection_name: str = "pm_docs",
+    rerank: Optional[bool] = None,
+    project: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    retrieve() for a batch of queries: the dense side embeds all queries in
+    one pass and searches them in one Chroma call. Returns one result per query.
+    """
+    mode = (mode or RAG_RETRIEVAL_MODE).lower()
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode!r} (expected one of {RETRIEVAL_MODES})")
+    if rerank is None:
+        rerank = RERANK_ENABLED
+
+    coll = get_collection(collection_name)
+    n = max(k, RERANK_CANDIDATES) if rerank else k
+    dense = [None] * len(query_texts)
+    if mode != "lexical":
+        dense = vs_query_many(coll, query_texts, k=_dense_candidates(n, mode), where=project_filter(project))
+
+    out = []
+    for query_text, dense_results in zip(query_texts, dense):
+        results = _retrieve(coll, query_text, n, mode, None, dense=dense_results, project=project)
+        if rerank:
+            results = _rerank(query_text, results, k)
+        out.append(results)
+    return out
+
+
+def _rerank(query_text: str, results: Dict[str, Any], k: int) -> Dict[str, Any]:
+    with span("retrieval.rerank", candidates=len((results.get("documents") or [[]])[0]), k=k) as s:
+        results = rerank_results(query_text, results, k)
+        skipped = results.pop("rerank_skipped", None)
+        if skipped:
+            # Over the latency budget: the retrieval order was kept
+            s.set("rerank_skipped", True)
+            s.set("rerank_estimate_ms", skipped["estimate_ms"])
+            s.set("rerank_pairs", skipped["pairs"])
+    return results
+
+
+def _dense_candidates(n: int, mode: str) -> int:
+    return n if mode == "dense" else max(n, RAG_HYBRID_CANDIDATES)
+
+
+def _retrieve(coll, query_text: str, n: int, mode: str,
+              weights: Optional[Tuple[float, float]],
+              dense: Optional[Dict[str, Any]] = None,
+              project: Optional[str] = None) -> Dict[str, Any]:
+    # dense: precomputed vector results for this query (see retrieve_many)
+    if mode == "dense":
+        return dense if dense is not None else vs_query(coll, query_text, k=n, where=project_filter(project))
+    if mode == "lexical":
+        return _as_results(_lexical_hits(coll, query_text, n, project))
+
+    candidates = _dense_candidates(n, mode)
+    if weights is None:
+        weights = default_weights(query_text)
+    fused, scores = rrf_fuse(
+        [_dense_hits(coll, query_text, candidates, dense, project),
+         _lexical_hits(coll, query_text, candidates, project)],
+        list(weights),
+        n,
+    )
+    return _as_results(fused, scores)
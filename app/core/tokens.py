@@ -0,0 +1,41 @@
+import os
+import threading
+from typing import Optional
+
+# Hugging Face tokenizer matching the Ollama model (e.g. "NousResearch/Meta-Llama-3-8B").
+# Empty -> estimate from characters, which is close enough for budgeting.
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "")
+CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "4"))
+
+_tokenizer = None
+_tokenizer_failed = False
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer() -> Optional[object]:
+    global _tokenizer, _tokenizer_failed
+    if not LLM_TOKENIZER or _tokenizer_failed:
+        return None
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None and not _tokenizer_failed:
+                try:
+                    from tokenizers import Tokenizer
+
+                    _tokenizer = Tokenizer.from_pretrained(LLM_TOKENIZER)
+                except Exception as e:
+                    print(f"Could not load tokenizer {LLM_TOKENIZER!r} ({e}); estimating tokens")
+                    _tokenizer_failed = True
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """
+    Number of model tokens in `text` (estimated if no tokenizer is configured).
+    """
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return max(1, int(len(text) / CHARS_PER_TOKEN + 0.5))
@@ -0,0 +1,287 @@
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# Resolve project root (one level above app/)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+# otlp | console | file | none (none still keeps the in-process histograms)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+# JSON-lines span log for the "file" exporter (relative to the project root)
+TRACING_FILE_PATH = str(PROJECT_ROOT / os.getenv("TRACING_FILE_PATH", "data/traces.jsonl"))
+# Past this size the log is moved to <path>.1 (replacing the previous one); 0 = no cap
+TRACING_FILE_MAX_BYTES = int(os.getenv("TRACING_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "product-atlas")
+
+# Histogram bucket upper bounds; fits both milliseconds and tokens/s
+_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, 300000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; quantiles are interpolated within a bucket.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= target:
+                lower = _BUCKETS[i - 1] if i > 0 else 0.0
+                upper = _BUCKETS[i] if i < len(_BUCKETS) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (target - seen) / n
+            seen += n
+        return self.max
+
+
+_histograms: Dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def observe(name: str, value: float) -> None:
+    """
+    Add a sample to the named in-process histogram.
+    """
+    with _histograms_lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.observe(value)
+
+
+def latency_summary() -> List[Dict[str, Any]]:
+    """
+    One row per histogram (span durations in ms, plus recorded metrics such
+    as llm.chat_stream.ttft_ms), sorted by name.
+    """
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+        return [
+            {
+                "name": name,
+                "count": h.count,
+                "mean": round(h.total / h.count, 1),
+                "p50": round(h.quantile(0.5), 1),
+                "p95": round(h.quantile(0.95), 1),
+                "max": round(h.max, 1),
+            }
+            for name, h in items
+            if h.count
+        ]
+
+
+def reset_stats() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+# ---------- Exporters ----------
+
+_tracer = None
+_tracer_ready = False
+_tracer_lock = threading.Lock()
+_file_lock = threading.Lock()
+_file = None
+
+
+def _write_json_line(record: Dict[str, Any]) -> None:
+    global _file
+    line = json.dumps(record, default=str)
+    if TRACING_EXPORTER == "console":
+        print(line)
+        return
+    with _file_lock:
+        if _file is None:
+            Path(TRACING_FILE_PATH).parent.mkdir(parents=True, exist_ok=True)
+            _file = open(TRACING_FILE_PATH, "a", encoding="utf-8")
+        if TRACING_FILE_MAX_BYTES and _file.tell() and _file.tell() + len(line) >= TRACING_FILE_MAX_BYTES:
+            # One rollover: the log never takes more than about twice the cap
+            _file.close()
+            os.replace(TRACING_FILE_PATH, TRACING_FILE_PATH + ".1")
+            _file = open(TRACING_FILE_PATH, "a", encoding="utf-8")
+        _file.write(line + "\n")
+        _file.flush()
+
+
+def _build_otel_exporter():
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter, SpanExporter, SpanExportResult
+
+    if TRACING_EXPORTER == "otlp":
+        try:
+            # Endpoint / headers come from the standard OTEL_EXPORTER_OTLP_* variables
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+            return OTLPSpanExporter()
+        except ImportError as e:
+            print(f"OTLP exporter unavailable ({e}); writing spans to {TRACING_FILE_PATH}")
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+
+    class JsonLinesSpanExporter(SpanExporter):
+        def export(self, spans):
+            for s in spans:
+                _write_json_line(json.loads(s.to_json(indent=None)))
+            return SpanExportResult.SUCCESS
+
+    return JsonLinesSpanExporter()
+
+
+def _get_tracer():
+    """
+    OpenTelemetry tracer, or None when the SDK is not installed (spans then
+    go through the built-in JSON-lines / console fallback).
+    """
+    global _tracer, _tracer_ready
+    if _tracer_ready:
+        return _tracer
+    with _tracer_lock:
+        if _tracer_ready:
+            return _tracer
+        try:
+            from opentelemetry import trace
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            _tracer = None
+        else:
+            provider = trace.get_tracer_provider()
+            if not isinstance(provider, TracerProvider):
+                # Nobody configured OpenTelemetry in this process: set it up
+                provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+                if TRACING_EXPORTER != "none":
+                    provider.add_span_processor(BatchSpanProcessor(_build_otel_exporter()))
+                trace.set_tracer_provider(provider)
+            _tracer = trace.get_tracer("product_atlas")
+        _tracer_ready = True
+    return _tracer
+
+
+# ---------- Spans ----------
+
+# (trace_id, span_id) of the active fallback span
+_current: contextvars.ContextVar = contextvars.ContextVar("product_atlas_span", default=None)
+
+
+class Span:
+    """
+    Handle yielded by span(): set attributes and record metrics.
+    """
+
+    def __init__(self, name: str, otel_span=None):
+        self.name = name
+        self.attributes: Dict[str, Any] = {}
+        self._otel_span = otel_span
+
+    def set(self, key: str, value: Any) -> None:
+        if value is None:
+            return
+        self.attributes[key] = value
+        if self._otel_span is not None:
+            self._otel_span.set_attribute(key, value)
+
+    def metric(self, key: str, value: Optional[float]) -> None:
+        """
+        Set an attribute and also feed the "<span name>.<key>" histogram.
+        """
+        if value is None:
+            return
+        self.set(key, value)
+        observe(f"{self.name}.{key}", value)
+
+
+class _NoopSpan(Span):
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def metric(self, key: str, value: Optional[float]) -> None:
+        pass
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time a stage: exported as a trace span (nested under the active one) and
+    recorded in the "<name>" duration histogram, in ms.
+
+        with span("rag.retrieve", k=k) as s:
+            ...
+            s.set("chunks", n)
+    """
+    if not TRACING_ENABLED:
+        yield _NoopSpan(name)
+        return
+
+    tracer = _get_tracer()
+    started = time.perf_counter()
+    if tracer is not None:
+        with tracer.start_as_current_span(name) as otel_span:
+            s = Span(name, otel_span)
+            for key, value in attributes.items():
+                s.set(key, value)
+            try:
+                yield s
+            finally:
+                observe(name, (time.perf_counter() - started) * 1000)
+        return
+
+    s = Span(name)
+    for key, value in attributes.items():
+        s.set(key, value)
+    parent = _current.get()
+    trace_id = parent[0] if parent else uuid.uuid4().hex
+    span_id = uuid.uuid4().hex[:16]
+    token = _current.set((trace_id, span_id))
+    start_wall = time.time()
+    status = "OK"
+    try:
+        yield s
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            status = f"ERROR: {type(e).__name__}: {e}"
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A streaming generator finished in a different context
+            pass
+        duration_ms = (time.perf_counter() - started) * 1000
+        observe(name, duration_ms)
+        if TRACING_EXPORTER != "none":
+            _write_json_line({
+                "name": name,
+                "trace_id": trace_id,
+                "span_id": span_id,
+                "parent_id": parent[1] if parent else None,
+                "start_time": start_wall,
+                "duration_ms": round(duration_ms, 3),
+                "status": status,
+                "service": TRACING_SERVICE_NAME,
+                "attributes": s.attributes,
+            })
@@ -1,37 +1,173 @@
 import os
-import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from typing import Any, Dict, Optional, Protocol, Sequence
+
+from app.core.answer_cache import invalidate_chunks
+from app.core.embeddings import encode
+from app.core.lexical_index import get_lexical_index
+from app.core.tracing import span
+
+# chroma: Chroma PersistentClient (app/core/chroma_store.py)
+# mmap: in-process memory-mapped index, no server or client (app/core/mmap_store.py)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma").lower()
+VECTOR_STORE_BACKENDS = ("chroma", "mmap")
 
 CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "data/chroma")
-EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-m3")
 
 # Absolute path to ensure consistency across processes
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 PERSIST_DIR_ABS = os.path.join(BASE_DIR, CHROMA_PERSIST_DIR)
-os.makedirs(PERSIST_DIR_ABS, exist_ok=True)
 
-print("Chroma persist dir:", PERSIST_DIR_ABS)
 
-# ✅ Use PersistentClient so data survives across runs
-client = chromadb.PersistentClient(path=PERSIST_DIR_ABS)
+class VectorCollection(Protocol):
+    """
+    The part of Chroma's Collection API the app relies on. Every backend's
+    collections implement it with Chroma's argument names and result shapes,
+    so callers (ingestion, retrieval, lexical rebuilds) never see the backend.
+    """
+
+    name: str
+
+    def count(self) -> int: ...
+
+    def add(self, ids: Sequence[str], documents=None, metadatas=None, embeddings=None) -> None: ...
+
+    def upsert(self, ids: Sequence[str], documents=None, metadatas=None, embeddings=None) -> None: ...
+
+    def update(self, ids: Sequence[str], documents=None, metadatas=None, embeddings=None) -> None: ...
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None: ...
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> Dict[str, Any]: ...
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, include=None) -> Dict[str, Any]: ...
 
-_chroma_embedding_fn = SentenceTransformerEmbeddingFunction(
-    model_name=EMBEDDING_MODEL_NAME
-)
+def get_collection(name="pm_docs", backend: Optional[str] = None) -> VectorCollection:
+    """
+    Open (or create) a collection in VECTOR_STORE_BACKEND. Backends are
+    imported on first use, so the mmap backend never loads chromadb.
+    """
+    backend = (backend or VECTOR_STORE_BACKEND).lower()
+    if backend == "chroma":
+        from app.core.chroma_store import get_chroma_collection
 
-def get_collection(name="pm_docs"):
-    return client.get_collection(name=name, embedding_function=_chroma_embedding_fn) \
-        if name in [c.name for c in client.list_collections()] \
-        else client.create_collection(name=name, embedding_function=_chroma_embedding_fn)
+        return get_chroma_collection(name)
+    if backend == "mmap":
+        from app.core.mmap_store import get_mmap_collection
 
-def add_docs(collection, ids, texts, metadatas=None):
+        return get_mmap_collection(name)
+    raise ValueError(f"Unknown vector store backend: {backend!r} (expected one of {VECTOR_STORE_BACKENDS})")
+
+def add_docs(collection, ids, texts, metadatas=None, embeddings=None):
+    """
+    Bulk add. Pass precomputed `embeddings` to skip embedding `texts` again.
+    """
     if metadatas is None:
         metadatas = [{}] * len(texts)
-    collection.add(ids=ids, documents=texts, metadatas=metadatas)
+    collection.add(ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings)
+    _sync_lexical(collection, ids, texts, metadatas)
+
+def upsert_docs(collection, ids, texts, metadatas=None, embeddings=None):
+    """
+    Like add_docs, but replaces chunks whose id already exists.
+    """
+    if metadatas is None:
+        metadatas = [{}] * len(texts)
+    collection.upsert(ids=ids, documents=texts, metadatas=metadatas, embeddings=embeddings)
+    _sync_lexical(collection, ids, texts, metadatas)
+
+def delete_docs(collection, ids):
+    if ids:
+        collection.delete(ids=ids)
+        lexical = get_lexical_index()
+        if lexical is not None:
+            lexical.delete(collection.name, ids)
+        invalidate_chunks(ids)
 
-def query(collection, query_text, k=5):
-    results = collection.query(
-        query_texts=[query_text],
-        n_results=k,
-    )
+def _sync_lexical(collection, ids, texts, metadatas):
+    # Keep the FTS5 side index in step with every Chroma write
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.upsert(collection.name, ids, texts, metadatas)
+    # Cached answers built on a rewritten chunk are stale
+    invalidate_chunks(ids)
+
+def set_projects(collection, ids, projects):
+    """
+    Re-tag existing chunks with a project (None removes the tag) without
+    re-embedding them. Content is unchanged, so cached answers stay valid.
+    """
+    if not ids:
+        return
+    metadatas = [{"project": p} for p in projects]
+    collection.update(ids=ids, metadatas=metadatas)
+    lexical = get_lexical_index()
+    if lexical is not None:
+        lexical.set_projects(collection.name, ids, projects)
+
+def get_doc_ids(collection, where=None):
+    """
+    Ids of the chunks matching a metadata filter, without loading documents.
+    """
+    return collection.get(where=where, include=[])["ids"]
+
+def query(collection, query_text, k=5, where=None):
+    """
+    Top-k chunks for a query. `where` is a Chroma metadata filter, e.g.
+    {"project": "payments"}; only matching chunks are searched.
+    """
+    # Embedded here rather than by Chroma, so the two costs are traced separately
+    with span("vector.embed_query"):
+        query_embeddings = encode([query_text]).tolist()
+    with span("vector.search", k=k, collection=collection.name, filtered=where is not None):
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=where,
+        )
     return results
+
+def query_many(collection, query_texts, k=5, where=None):
+    """
+    Query several texts at once: one embedding pass and one Chroma call.
+    Returns one result per query, each shaped like query()'s output.
+    """
+    if not query_texts:
+        return []
+    with span("vector.embed_query", queries=len(query_texts)):
+        query_embeddings = encode(list(query_texts)).tolist()
+    with span("vector.search", k=k, collection=collection.name, queries=len(query_texts),
+              filtered=where is not None):
+        results = collection.query(
+            query_embeddings=query_embeddings,
+            n_results=k,
+            where=where,
+        )
+    # Chroma returns one list per query for each included field
+    return [
+        {
+            field: [values[i]]
+            for field, values in results.items()
+            if isinstance(values, list) and len(values) == len(query_texts)
+        }
+        for i in range(len(query_texts))
+    ]
+
+def copy_collection(source, target, page_size=1000):
+    """
+    Copy every chunk (ids, documents, metadata and stored embeddings) from
+    one collection to another, e.g. from Chroma to the mmap backend, without
+    re-embedding. The lexical index and answer cache are keyed by chunk id
+    and stay valid. Returns the number of chunks copied.
+    """
+    offset = 0
+    total = 0
+    while True:
+        results = source.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+        ids = results.get("ids", [])
+        if not len(ids):
+            break
+        target.upsert(ids=ids, documents=results["documents"], metadatas=results["metadatas"],
+                      embeddings=results["embeddings"])
+        total += len(ids)
+        offset += page_size
+    return total
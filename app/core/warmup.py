@@ -0,0 +1,234 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.core import ollama_http
+from app.core.llm_client import MODEL_NAME, keep_alive
+from app.core.rerank import RERANK_ENABLED
+from app.core.tracing import span
+
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "true").lower() in ("1", "true", "yes")
+# Seconds between keep-warm pings; keep well below OLLAMA_KEEP_ALIVE
+WARMUP_HEARTBEAT_INTERVAL = float(os.getenv("WARMUP_HEARTBEAT_INTERVAL", "240"))
+# The heartbeat stops once no UI session has been seen for this long (seconds)
+WARMUP_SESSION_IDLE_TIMEOUT = float(os.getenv("WARMUP_SESSION_IDLE_TIMEOUT", "900"))
+
+# Component states: cold -> loading -> ready | error
+COLD, LOADING, READY, ERROR = "cold", "loading", "ready", "error"
+
+_state: Dict[str, Dict[str, Any]] = {
+    "llm": {"status": COLD, "error": None, "updated_at": None, "load_s": None},
+    "embedder": {"status": COLD, "error": None, "updated_at": None, "load_s": None},
+    "reranker": {"status": COLD, "error": None, "updated_at": None, "load_s": None},
+}
+_state_lock = threading.Lock()
+_state_changed = threading.Condition(_state_lock)
+_inflight: Dict[str, threading.Thread] = {}
+
+_sessions: Dict[str, float] = {}
+_heartbeat: Optional[threading.Thread] = None
+
+
+def _set(component: str, status: str, error: Optional[str] = None, load_s: Optional[float] = None) -> None:
+    with _state_changed:
+        entry = _state[component]
+        entry["status"] = status
+        entry["error"] = error
+        entry["updated_at"] = time.time()
+        if load_s is not None:
+            entry["load_s"] = round(load_s, 2)
+        _state_changed.notify_all()
+
+
+def warmup_status() -> Dict[str, Dict[str, Any]]:
+    """
+    Snapshot of {"llm": {...}, "embedder": {...}}; each has status
+    ("cold" | "loading" | "ready" | "error"), error, updated_at and load_s.
+    """
+    with _state_lock:
+        return {k: dict(v) for k, v in _state.items()}
+
+
+def is_ready(component: str = "llm") -> bool:
+    with _state_lock:
+        return _state[component]["status"] == READY
+
+
+def wait_until_ready(component: str = "llm", timeout: Optional[float] = None) -> bool:
+    """
+    Block while `component` is loading. Returns True if it ended up ready.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    with _state_changed:
+        while _state[component]["status"] == LOADING:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            _state_changed.wait(remaining)
+        return _state[component]["status"] == READY
+
+
+def llm_loaded() -> Optional[bool]:
+    """
+    Whether Ollama currently has MODEL_NAME in memory (None if unknown).
+    """
+    try:
+        resp = ollama_http.get("/api/ps")
+        resp.raise_for_status()
+    except Exception:
+        return None
+    names = set()
+    for m in resp.json().get("models", []):
+        names.update((m.get("name"), m.get("model")))
+    return MODEL_NAME in names or f"{MODEL_NAME}:latest" in names
+
+
+def warm_llm() -> bool:
+    """
+    Load the chat model into Ollama (an empty /api/generate does only that)
+    and refresh its keep_alive.
+    """
+    if llm_loaded() is not True:
+        _set("llm", LOADING)
+    started = time.perf_counter()
+    try:
+        with span("warmup.llm", model=MODEL_NAME):
+            resp = ollama_http.post(
+                "/api/generate",
+                {"model": MODEL_NAME, "prompt": "", "keep_alive": keep_alive(), "stream": False},
+            )
+            resp.raise_for_status()
+    except Exception as e:
+        _set("llm", ERROR, error=str(e))
+        print(f"LLM warm-up failed: {e}")
+        return False
+    _set("llm", READY, load_s=time.perf_counter() - started)
+    return True
+
+
+def warm_embedder() -> bool:
+    """
+    Load the embedding model and run one dummy batch through it (this goes
+    straight to the model: the embedding cache would answer it otherwise).
+    """
+    from app.core.embeddings import get_embedding_model
+
+    if is_ready("embedder"):
+        return True
+    _set("embedder", LOADING)
+    started = time.perf_counter()
+    try:
+        with span("warmup.embedder"):
+            get_embedding_model().encode(["warm-up"], show_progress_bar=False)
+    except Exception as e:
+        _set("embedder", ERROR, error=str(e))
+        print(f"Embedding model warm-up failed: {e}")
+        return False
+    _set("embedder", READY, load_s=time.perf_counter() - started)
+    return True
+
+
+def warm_reranker() -> bool:
+    """
+    Load the cross-encoder and score one pair; its cost estimate then
+    starts over on the warm model (see app/core/rerank.py).
+    """
+    from app.core import rerank
+
+    if is_ready("reranker"):
+        return True
+    _set("reranker", LOADING)
+    started = time.perf_counter()
+    try:
+        with span("warmup.reranker"):
+            rerank.warm_reranker()
+    except Exception as e:
+        _set("reranker", ERROR, error=str(e))
+        print(f"Reranker warm-up failed: {e}")
+        return False
+    _set("reranker", READY, load_s=time.perf_counter() - started)
+    return True
+
+
+_WARMERS = {"llm": warm_llm, "embedder": warm_embedder, "reranker": warm_reranker}
+
+
+def start_warm_up(llm: bool = True, embedder: bool = True, reranker: bool = RERANK_ENABLED) -> None:
+    """
+    Warm the requested components on background threads. Idempotent: a
+    component that is ready or already warming is left alone.
+    """
+    for component, wanted in (("llm", llm), ("embedder", embedder), ("reranker", reranker)):
+        if not wanted:
+            continue
+        with _state_lock:
+            if _state[component]["status"] == READY:
+                continue
+            thread = _inflight.get(component)
+            if thread is not None and thread.is_alive():
+                continue
+            if _state[component]["status"] != LOADING:
+                _state[component]["status"] = LOADING
+            thread = threading.Thread(target=_WARMERS[component], name=f"warmup-{component}", daemon=True)
+            _inflight[component] = thread
+        thread.start()
+
+
+def warm_up(llm: bool = True, embedder: bool = True,
+            reranker: bool = RERANK_ENABLED) -> Dict[str, Dict[str, Any]]:
+    """
+    Warm the requested components concurrently and wait for them.
+    """
+    start_warm_up(llm=llm, embedder=embedder, reranker=reranker)
+    for component in _WARMERS:
+        thread = _inflight.get(component)
+        if thread is not None:
+            thread.join()
+    return warmup_status()
+
+
+# ---------- Keep-warm heartbeat ----------
+
+def touch_session(session_id: str) -> None:
+    """
+    Record UI activity; starts the keep-warm heartbeat if it isn't running.
+    """
+    global _heartbeat
+    with _state_lock:
+        _sessions[session_id] = time.monotonic()
+        if _heartbeat is not None:
+            return
+        _heartbeat = threading.Thread(target=_heartbeat_loop, name="warmup-heartbeat", daemon=True)
+        thread = _heartbeat
+    thread.start()
+
+
+def _prune_sessions() -> int:
+    # Caller holds _state_lock
+    cutoff = time.monotonic() - WARMUP_SESSION_IDLE_TIMEOUT
+    for sid in [s for s, seen in _sessions.items() if seen < cutoff]:
+        del _sessions[sid]
+    return len(_sessions)
+
+
+def active_sessions() -> int:
+    with _state_lock:
+        return _prune_sessions()
+
+
+def _heartbeat_loop() -> None:
+    # Re-ping the LLM so Ollama doesn't evict it while someone is using the UI
+    global _heartbeat
+    while True:
+        time.sleep(WARMUP_HEARTBEAT_INTERVAL)
+        with _state_lock:
+            if not _prune_sessions():
+                # Decided under the lock, so a concurrent touch_session starts a new one
+                _heartbeat = None
+                print("No active sessions; stopping model keep-warm heartbeat")
+                return
+        try:
+            warm_llm()
+        except Exception as e:  # never let the heartbeat die on a bad ping
+            print(f"Keep-warm ping failed: {e}")
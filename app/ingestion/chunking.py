@@ -0,0 +1,265 @@
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.core.tokens import count_tokens
+
+# structured: split on document structure and sentences to a token target
+# fixed: the original CHUNK_SIZE-character windows with CHUNK_OVERLAP overlap
+CHUNKER = os.getenv("CHUNKER", "structured").lower()
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", "300"))
+# Trailing sentences repeated at the start of the next chunk of the same section
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+
+# Basic chunking params for the fixed chunker
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+
+# Recorded per file in the ingest manifest: files chunked with other settings get re-chunked.
+# Bump the version when the structured algorithm changes its output.
+CHUNKER_FINGERPRINT = (
+    f"fixed/{CHUNK_SIZE}/{CHUNK_OVERLAP}" if CHUNKER == "fixed"
+    else f"structured-v1/{CHUNK_TARGET_TOKENS}/{CHUNK_OVERLAP_TOKENS}"
+)
+
+
+class Chunk(NamedTuple):
+    text: str
+    # Section info stored with the chunk: heading_path, page, speakers (only those that apply)
+    metadata: Dict[str, Any]
+
+
+class _Block(NamedTuple):
+    # A structural unit (paragraph, heading, code block, speaker turn). Chunks
+    # never span two sections, i.e. blocks with different `section`.
+    text: str
+    section: Tuple[Tuple[str, Any], ...] = ()
+    speaker: Optional[str] = None
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_size, length)
+        chunk = text[start:end]
+        chunks.append(chunk)
+        if end == length:
+            break
+        start = end - overlap  # step with overlap
+    return chunks
+
+
+# ---------- Structure ----------
+
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+_FENCE_RE = re.compile(r"^ {0,3}(```|~~~)")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+# "Alice: ...", "[00:01:02] Bob Smith: ...", "SPEAKER 2 (00:13): ..."
+_SPEAKER_RE = re.compile(
+    r"^\s*(?:[\[(]?\d{1,2}:\d{2}(?::\d{2})?[\])]?\s*[-–]?\s*)?"
+    r"([A-Z][\w.'-]*(?: [\w.'-]+){0,3})\s*(?:\(\d{1,2}:\d{2}(?::\d{2})?\))?:\s+\S"
+)
+
+
+def _paragraphs(text: str) -> List[str]:
+    return [p.strip() for p in _PARAGRAPH_BREAK_RE.split(text) if p.strip()]
+
+
+def markdown_blocks(text: str) -> List[_Block]:
+    """
+    Paragraphs, lists and fenced code blocks, each tagged with the path of
+    headings above it ("Roadmap > Q3 > Risks"). A heading starts a new section.
+    """
+    blocks: List[_Block] = []
+    headings: List[Tuple[int, str]] = []
+    lines: List[str] = []
+    in_fence = False
+    bare_heading = False  # the last block is a heading with nothing under it yet
+
+    def section() -> Tuple[Tuple[str, Any], ...]:
+        return (("heading_path", " > ".join(t for _, t in headings)),) if headings else ()
+
+    def flush() -> None:
+        nonlocal bare_heading
+        if lines:
+            body = "\n".join(lines).strip()
+            if body:
+                blocks.append(_Block(body, section()))
+                bare_heading = False
+            lines.clear()
+
+    for line in text.splitlines():
+        if _FENCE_RE.match(line):
+            if not in_fence:
+                flush()
+            lines.append(line)
+            in_fence = not in_fence
+            if not in_fence:
+                flush()
+            continue
+        if in_fence:
+            lines.append(line)
+            continue
+        m = _HEADING_RE.match(line)
+        if m:
+            flush()
+            level = len(m.group(1))
+            if bare_heading and level > headings[-1][0]:
+                # No body of its own: the heading lives on in the subsection's heading_path
+                blocks.pop()
+            headings = [(lvl, t) for lvl, t in headings if lvl < level] + [(level, m.group(2).strip())]
+            blocks.append(_Block(line.strip(), section()))
+            bare_heading = True
+        elif not line.strip():
+            flush()
+        else:
+            lines.append(line)
+    flush()
+    return blocks
+
+
+def page_blocks(pages: Iterable[str]) -> Iterator[_Block]:
+    """
+    Paragraphs of each page (1-based "page"); a page break starts a new section.
+    Lazy, so pages can stream in from the extractor.
+    """
+    for number, page in enumerate(pages, start=1):
+        for paragraph in _paragraphs(page):
+            yield _Block(paragraph, (("page", number),))
+
+
+def transcript_blocks(text: str) -> Optional[List[_Block]]:
+    """
+    One block per speaker turn, or None if `text` doesn't look like a
+    transcript (fewer than 3 turns, or under 30% of lines start one).
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    starts = [_SPEAKER_RE.match(line) for line in lines]
+    turns = sum(1 for m in starts if m)
+    if turns < 3 or turns < 0.3 * len(lines):
+        return None
+
+    blocks: List[_Block] = []
+    current: List[str] = []
+    speaker = None
+    for line, m in zip(lines, starts):
+        if m and current:
+            blocks.append(_Block("\n".join(current), speaker=speaker))
+            current = []
+        if m:
+            speaker = m.group(1)
+        current.append(line.strip())
+    if current:
+        blocks.append(_Block("\n".join(current), speaker=speaker))
+    return blocks
+
+
+def text_blocks(text: str) -> List[_Block]:
+    """
+    Speaker turns for transcripts, paragraphs otherwise.
+    """
+    turns = transcript_blocks(text)
+    if turns is not None:
+        return turns
+    return [_Block(p) for p in _paragraphs(text)]
+
+
+# ---------- Packing ----------
+
+# Sentence ends followed by what looks like the start of the next one; line breaks
+_SPLIT_RE = re.compile(r"((?<=[.!?])[ \t]+(?=[\"'(\[]?[A-Z0-9])|\n+)")
+
+
+def _units(text: str, target: int) -> List[Tuple[str, str, int]]:
+    """
+    Split an oversized block into (separator before, text, tokens) units of at
+    most `target` tokens: sentences / lines, then word windows as a last resort.
+    """
+    parts = _SPLIT_RE.split(text)
+    units: List[Tuple[str, str, int]] = []
+    sep = ""
+    for i, part in enumerate(parts):
+        if i % 2:
+            sep = part
+            continue
+        if not part.strip():
+            continue
+        n = count_tokens(part)
+        if n <= target:
+            units.append((sep, part, n))
+        else:
+            words = part.split()
+            per_window = max(1, int(len(words) * target / n))
+            for start in range(0, len(words), per_window):
+                window = " ".join(words[start:start + per_window])
+                units.append((sep if start == 0 else " ", window, count_tokens(window)))
+        sep = ""
+    return units
+
+
+def pack_blocks(blocks: Iterable[_Block], target: int = CHUNK_TARGET_TOKENS,
+                overlap: int = CHUNK_OVERLAP_TOKENS) -> List[Chunk]:
+    """
+    Greedily fill chunks up to `target` tokens with whole blocks, splitting
+    blocks that don't fit on sentence boundaries. A chunk never crosses a
+    section boundary; with `overlap`, the last sentences of a chunk (up to
+    that many tokens) are repeated at the start of the next one in the section.
+    """
+    target = max(1, target)
+    chunks: List[Chunk] = []
+    parts: List[Tuple[str, str, int]] = []  # (separator before, text, tokens)
+    tokens = 0
+    section: Optional[Tuple[Tuple[str, Any], ...]] = None
+    speakers: List[str] = []
+
+    def emit() -> None:
+        text = "".join(sep + t for sep, t, _ in parts).strip()
+        if text:
+            metadata: Dict[str, Any] = dict(section or ())
+            if speakers:
+                metadata["speakers"] = ", ".join(dict.fromkeys(speakers))
+            chunks.append(Chunk(text, metadata))
+
+    def carry() -> List[Tuple[str, str, int]]:
+        kept: List[Tuple[str, str, int]] = []
+        total = 0
+        for part in reversed(parts):
+            if total + part[2] > overlap:
+                break
+            kept.insert(0, part)
+            total += part[2]
+        return kept
+
+    for block in blocks:
+        n = count_tokens(block.text)
+        units = [("\n\n", block.text, n)] if n <= target else \
+            [("\n\n" if i == 0 else sep, t, k) for i, (sep, t, k) in enumerate(_units(block.text, target))]
+        for unit in units:
+            if parts and (block.section != section or tokens + unit[2] > target):
+                emit()
+                same_section = block.section == section
+                parts = carry() if overlap and same_section else []
+                tokens = sum(p[2] for p in parts)
+                speakers = speakers[-1:] if parts and speakers else []
+            section = block.section
+            parts.append(unit)
+            tokens += unit[2]
+            if block.speaker and (not speakers or speakers[-1] != block.speaker):
+                speakers.append(block.speaker)
+    if parts:
+        emit()
+    return chunks
+
+
+def chunk_markdown(text: str) -> List[Chunk]:
+    return pack_blocks(markdown_blocks(text))
+
+
+def chunk_pages(pages: Iterable[str]) -> List[Chunk]:
+    return pack_blocks(page_blocks(pages))
+
+
+def chunk_plain_text(text: str) -> List[Chunk]:
+    return pack_blocks(text_blocks(text))
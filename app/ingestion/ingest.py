@@ -1,16 +1,40 @@
 import os
-import uuid
-import json
+import time
+import queue
 import hashlib
-from typing import List, Dict, Any
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, List, Dict, Any, Iterator, Optional, Tuple
 from pathlib import Path
 
-from pypdf import PdfReader
-from app.core.vector_store import get_collection, add_docs
+from app.ingestion.chunking import (
+    CHUNKER,
+    CHUNKER_FINGERPRINT,
+    Chunk,
+    chunk_markdown,
+    chunk_pages,
+    chunk_plain_text,
+    chunk_text,
+)
+from app.ingestion.ingestion_index import IngestManifest, compute_doc_id
+from app.ingestion.pdf_text import (
+    PDF_PAGES_PER_TASK,
+    complete_split,
+    extract_page_range,
+    iter_pdf_pages,
+    parse_pdf_or_split,
+)
 
-# Basic chunking params (you can tune later)
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+# Pipeline params: parser processes, chunks per embedding batch / Chroma write,
+# max batches waiting between stages, seconds between progress lines
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 1)))
+INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "256"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+INGEST_PROGRESS_EVERY = float(os.getenv("INGEST_PROGRESS_EVERY", "5"))
+# ingest_paths() batches up to this size are parsed in-process: each spawned
+# parser re-imports the app, which costs more than parsing a few files
+INGEST_INLINE_MAX_FILES = int(os.getenv("INGEST_INLINE_MAX_FILES", "4"))
 
 # Resolve project root (one level above app/)
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -22,75 +46,7 @@ INGEST_DATA_DIR = os.getenv(
 )
 INGEST_COLLECTION_NAME = os.getenv("INGEST_COLLECTION_NAME", "pm_docs")
 
-# Where we track what has been ingested
-INGEST_INDEX_PATH = Path(str(PROJECT_ROOT / "data" / ".product_atlas_ingested.json"))
-
-
-# ---------- Ingestion index helpers ----------
-
-def _load_index() -> Dict[str, Any]:
-    if not INGEST_INDEX_PATH.exists():
-        return {}
-    try:
-        with open(INGEST_INDEX_PATH, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:
-                return {}
-            return json.loads(content)
-    except json.JSONDecodeError:
-        # If the file is corrupted, start fresh
-        return {}
-
-
-def _save_index(index: Dict[str, Any]) -> None:
-    INGEST_INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(INGEST_INDEX_PATH, "w", encoding="utf-8") as f:
-        json.dump(index, f, indent=2)
-
-
-def _compute_doc_id(path: str) -> str:
-    # Absolute path as stable id
-    return str(Path(path).resolve())
-
-
-def _compute_doc_version(path: str) -> str:
-    # Content hash; if file is missing or unreadable, return empty string
-    h = hashlib.sha256()
-    try:
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                h.update(chunk)
-    except OSError:
-        return ""
-    return h.hexdigest()
-
-
-def should_ingest(path: str) -> bool:
-    index = _load_index()
-    doc_id = _compute_doc_id(path)
-    new_version = _compute_doc_version(path)
-    if not new_version:
-        # If we couldn't compute a version, better to try ingesting (and fail loudly)
-        return True
-
-    record = index.get(doc_id)
-    if record and record.get("version") == new_version:
-        # Already ingested and unchanged
-        return False
-
-    # Either new file or changed content
-    return True
-
-
-def mark_ingested(path: str) -> None:
-    index = _load_index()
-    doc_id = _compute_doc_id(path)
-    version = _compute_doc_version(path)
-    index[doc_id] = {
-        "version": version,
-        "path": path,
-    }
-    _save_index(index)
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".md")
 
 
 # ---------- File readers & chunking ----------
@@ -100,12 +56,12 @@ def read_txt(path: str) -> str:
         return f.read()
 
 
-def read_pdf(path: str) -> str:
-    reader = PdfReader(path)
-    pages = []
-    for page in reader.pages:
-        pages.append(page.extract_text() or "")
-    return "\n".join(pages)
+def read_pdf_pages(path: str, file_hash: Optional[str] = None) -> List[str]:
+    return list(iter_pdf_pages(path, file_hash))
+
+
+def read_pdf(path: str, file_hash: Optional[str] = None) -> str:
+    return "\n".join(iter_pdf_pages(path, file_hash))
 
 
 def read_md(path: str) -> str:
@@ -113,78 +69,628 @@ def read_md(path: str) -> str:
     return read_txt(path)
 
 
-def load_file(path: str) -> str:
+def load_file(path: str, file_hash: Optional[str] = None) -> str:
     lower = path.lower()
     if lower.endswith(".pdf"):
-        return read_pdf(path)
+        return read_pdf(path, file_hash)
     if lower.endswith(".txt") or lower.endswith(".md"):
         return read_txt(path)
     # Unknown extension -> skip
     return ""
 
 
-def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
-    chunks = []
-    start = 0
-    length = len(text)
-    while start < length:
-        end = min(start + chunk_size, length)
-        chunk = text[start:end]
-        chunks.append(chunk)
-        if end == length:
-            break
-        start = end - overlap  # step with overlap
-    return chunks
+# Structure-aware chunker per file type (see app/ingestion/chunking.py),
+# called with (path, content hash if already known)
+CHUNKERS: Dict[str, Callable[[str, Optional[str]], List[Chunk]]] = {
+    ".md": lambda path, _: chunk_markdown(read_md(path)),
+    ".pdf": lambda path, file_hash: chunk_pages(iter_pdf_pages(path, file_hash)),
+    ".txt": lambda path, _: chunk_plain_text(read_txt(path)),
+}
+
+
+def chunk_file(path: str, file_hash: Optional[str] = None) -> List[Chunk]:
+    """
+    Read and chunk one file with the chunker for its type, or with fixed
+    character windows when CHUNKER=fixed. `file_hash` is the content hash
+    taken by the manifest, if any; the PDF text cache is keyed by it.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    chunker = CHUNKERS.get(ext)
+    if CHUNKER == "fixed" or chunker is None:
+        content = load_file(path, file_hash)
+        return [Chunk(c, {}) for c in chunk_text(content)] if content.strip() else []
+    return chunker(path, file_hash)
+
+
+# ---------- Projects ----------
+
+def doc_project(path: str, data_dir: str = INGEST_DATA_DIR) -> Optional[str]:
+    """
+    Project tag of a document: the top-level folder it sits in under
+    `data_dir` (data/raw/payments/prd.md -> "payments"). Files directly in
+    `data_dir`, or outside it, are untagged and only found by unscoped searches.
+    """
+    rel = os.path.relpath(os.path.abspath(path), os.path.abspath(data_dir))
+    parts = Path(rel).parts
+    if len(parts) < 2 or parts[0] == os.pardir:
+        return None
+    return parts[0]
 
 
 # ---------- Main ingestion ----------
 
+def _parse_file(path: str, file_hash: Optional[str] = None) -> Tuple[str, List[Chunk], str]:
+    """
+    Parse + chunk one file. Runs inside the parser process pool, so it must
+    stay importable without pulling in Chroma or the embedding model.
+    Returns (path, chunks, error).
+    """
+    try:
+        return path, chunk_file(path, file_hash), ""
+    except Exception as e:  # bad PDF, encoding error, ...
+        return path, [], f"{type(e).__name__}: {e}"
+
+
+def _parse_or_split(path: str, file_hash: Optional[str] = None) -> Tuple[str, List[Chunk], str, Optional[Tuple[Optional[str], int]]]:
+    """
+    Pool task: _parse_file(), except that a large, uncached PDF comes back
+    as (file hash, page count) so its pages can be extracted on several workers.
+    The PDF is opened once for both the page count and the extraction.
+    """
+    if CHUNKER != "fixed" and path.lower().endswith(".pdf"):
+        try:
+            chunks, split = parse_pdf_or_split(path, chunk_pages, file_hash)
+        except Exception as e:
+            return path, [], f"{type(e).__name__}: {e}", None
+        return path, chunks or [], "", split
+    return (*_parse_file(path, file_hash), None)
+
+
+def _finish_split(path: str, file_hash: Optional[str], pages: int,
+                  ranges: Dict[int, List[str]]) -> Tuple[str, List[Chunk], str]:
+    """
+    Chunk a PDF whose page ranges have all been extracted. The workers put
+    the pages in the PDF text cache, so they are streamed from there; only
+    with the cache off were their texts sent back in `ranges`.
+    """
+    try:
+        cached = complete_split(file_hash, pages)
+        if cached is not None:
+            return path, chunk_pages(cached), ""
+        if file_hash is not None:
+            # Pages went missing from the cache (cleared meanwhile): extract serially
+            return _parse_file(path)
+        return path, chunk_pages(text for start in sorted(ranges) for text in ranges[start]), ""
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+
+class _Progress:
+    """
+    Thread-safe counters for the ingestion pipeline, printed as throughput.
+    """
+
+    def __init__(self, total_files: int):
+        self.total_files = total_files
+        self.files_parsed = 0
+        self.files_written = 0
+        self.chunks_embedded = 0
+        self.chunks_written = 0
+        self.chunks_deleted = 0
+        self._start = time.monotonic()
+        self._last_report = self._start
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+            now = time.monotonic()
+            if now - self._last_report >= INGEST_PROGRESS_EVERY:
+                self._last_report = now
+                print(self.summary())
+
+    def summary(self) -> str:
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        return (
+            f"[ingest] files parsed {self.files_parsed}/{self.total_files}, "
+            f"written {self.files_written} ({self.files_written / elapsed:.1f} files/s), "
+            f"chunks embedded {self.chunks_embedded}, written {self.chunks_written} "
+            f"({self.chunks_written / elapsed:.1f} chunks/s), deleted {self.chunks_deleted}, "
+            f"elapsed {elapsed:.1f}s"
+        )
+
+
+class _Batch:
+    """
+    A group of chunks travelling through the embed and write stages together.
+    `delete_ids` are stale chunks removed before the batch is upserted.
+    `completed_paths` are files whose last chunk is in this batch; they are
+    marked as ingested once the batch has been written.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.embeddings: Optional[List[List[float]]] = None
+        self.delete_ids: List[str] = []
+        self.completed_paths: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+_STOP = object()
+
+
+def _put(q: "queue.Queue", item: Any, failed: threading.Event) -> None:
+    # Bounded put that gives up if a downstream stage has died
+    while not failed.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+    raise RuntimeError("Ingestion pipeline stage failed")
+
+
+def _get(q: "queue.Queue", failed: threading.Event) -> Any:
+    # Blocking get that returns _STOP if another stage has died
+    while not failed.is_set():
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+    return _STOP
+
+
+def _run_stage(fn, errors: List[BaseException], failed: threading.Event, *args) -> None:
+    try:
+        fn(*args)
+    except BaseException as e:
+        errors.append(e)
+        failed.set()
+
+
+def _embed_stage(in_q: "queue.Queue", out_q: "queue.Queue", progress: _Progress,
+                 failed: threading.Event) -> None:
+    from app.core.embeddings import embed_texts
+
+    while True:
+        batch = _get(in_q, failed)
+        if batch is _STOP:
+            _put(out_q, _STOP, failed)
+            return
+        if len(batch):
+            batch.embeddings = embed_texts(batch.texts)
+            progress.add(chunks_embedded=len(batch))
+        _put(out_q, batch, failed)
+
+
+def _write_stage(collection, manifest: IngestManifest, in_q: "queue.Queue",
+                 progress: _Progress, failed: threading.Event) -> None:
+    from app.core.vector_store import delete_docs, upsert_docs
+
+    while True:
+        batch = _get(in_q, failed)
+        if batch is _STOP:
+            return
+        if batch.delete_ids:
+            delete_docs(collection, batch.delete_ids)
+        if len(batch):
+            upsert_docs(collection, batch.ids, batch.texts, batch.metadatas,
+                        embeddings=batch.embeddings)
+        # Writes are FIFO, so every earlier chunk of these files is stored too
+        for path in batch.completed_paths:
+            manifest.mark_ingested(path)
+        manifest.commit()
+        progress.add(
+            chunks_written=len(batch),
+            chunks_deleted=len(batch.delete_ids),
+            files_written=len(batch.completed_paths),
+        )
+
+
+def _iter_parsed(paths: List[str], workers: int,
+                 versions: Optional[Dict[str, Optional[str]]] = None) -> Iterator[Tuple[str, List[Chunk], str]]:
+    """
+    Yield parse results as they complete, keeping at most 2 * workers files
+    in flight so a slow PDF never blocks the rest of the tree. Large PDFs
+    are extracted in page ranges spread over the same workers. `versions`:
+    content hashes already taken by the manifest, so files aren't hashed twice.
+    """
+    versions = versions or {}
+    if workers <= 1:
+        for path in paths:
+            yield _parse_file(path, versions.get(path))
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        # future -> (path, first page of its range or None for a whole-file task)
+        pending: Dict[Any, Tuple[str, Optional[int]]] = {}
+        # path -> page-range extraction state of a large PDF
+        splits: Dict[str, Dict[str, Any]] = {}
+        remaining = iter(paths)
+
+        def submit_next() -> None:
+            nxt = next(remaining, None)
+            if nxt is not None:
+                pending[pool.submit(_parse_or_split, nxt, versions.get(nxt))] = (nxt, None)
+
+        for _ in range(workers * 2):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                path, start = pending.pop(fut)
+                if start is None:
+                    path, chunks, error, split = fut.result()
+                    if split is None:
+                        yield path, chunks, error
+                        submit_next()
+                        continue
+                    file_hash, pages = split
+                    starts = range(0, pages, PDF_PAGES_PER_TASK)
+                    splits[path] = {"hash": file_hash, "pages": pages, "ranges": {}, "left": len(starts), "error": ""}
+                    for first in starts:
+                        last = min(first + PDF_PAGES_PER_TASK, pages)
+                        pending[pool.submit(extract_page_range, path, file_hash, first, last)] = (path, first)
+                    continue
+
+                state = splits[path]
+                try:
+                    texts = fut.result()
+                    if texts:
+                        state["ranges"][start] = texts
+                except Exception as e:
+                    state["error"] = state["error"] or f"{type(e).__name__}: {e}"
+                state["left"] -= 1
+                if state["left"]:
+                    continue
+                del splits[path]
+                if state["error"]:
+                    yield path, [], state["error"]
+                else:
+                    yield _finish_split(path, state["hash"], state["pages"], state["ranges"])
+                submit_next()
+
+
+def chunk_id(source_id: str, index: int, text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Deterministic chunk id from (source id, chunk index, content hash), so
+    re-ingesting unchanged content produces the same ids. Section metadata
+    (heading path, page) is part of the content: a renamed heading re-writes its chunks.
+    """
+    if metadata:
+        text = text + "\0" + repr(sorted(metadata.items()))
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{source_id}\0{index}\0{content_hash}".encode("utf-8")).hexdigest()[:32]
+
+
+def _plan_file(coll, path: str, chunks: List[Chunk]) -> Tuple[List[Tuple[str, int, Chunk]], List[str]]:
+    """
+    Diff a file's new chunks against what the collection holds for it.
+    Returns ([(id, chunk_index, text)] to upsert, [stale ids] to delete);
+    chunks whose id already exists are left alone and never re-embedded.
+    """
+    from app.core.vector_store import get_doc_ids
+
+    source_id = compute_doc_id(path)
+    existing = set(get_doc_ids(coll, where={"source": path}))
+    new_ids = [chunk_id(source_id, i, chunk.text, chunk.metadata) for i, chunk in enumerate(chunks)]
+    to_write = [
+        (cid, i, chunk)
+        for i, (cid, chunk) in enumerate(zip(new_ids, chunks))
+        if cid not in existing
+    ]
+    stale = sorted(existing - set(new_ids))
+    return to_write, stale
+
+
 def ingest_folder(
     data_dir: str = INGEST_DATA_DIR,
     collection_name: str = INGEST_COLLECTION_NAME,
+    workers: int = INGEST_WORKERS,
+    embed_batch_size: int = INGEST_EMBED_BATCH_SIZE,
+    prune: bool = False,
 ):
+    """
+    Staged pipeline: parse (process pool) -> embed (batched) -> write (bulk),
+    connected by bounded queues. With `prune`, chunks whose source file no
+    longer exists are removed afterwards.
+    """
+    # Imported here so parser worker processes don't load Chroma / the model
+    from app.core.vector_store import get_collection
+    from app.core.answer_cache import answer_cache_stats
+    from app.core.embeddings import embedding_cache_stats
+    from app.core.warmup import start_warm_up
+
+    # Load the embedding model while files are scanned and parsed
+    start_warm_up(llm=False, embedder=True, reranker=False)
     coll = get_collection(collection_name)
 
     print(f"Ingesting from {data_dir} into collection '{collection_name}'")
 
-    file_count = 0
-    chunk_count = 0
+    with IngestManifest() as manifest:
+        paths = _scan_folder(data_dir, manifest)
+        _run_pipeline(coll, manifest, paths, workers, embed_batch_size, data_dir)
+        if prune:
+            prune_missing_sources(coll, manifest)
+    stats = embedding_cache_stats()
+    if stats:
+        print(
+            f"Embedding cache: {stats['hits']} hits / {stats['misses']} misses "
+            f"(hit rate {stats['hit_rate']:.1%}), {stats['entries']} entries"
+        )
+    invalidated = answer_cache_stats().get("invalidated")
+    if invalidated:
+        print(f"Answer cache: dropped {invalidated} answers built on changed or removed chunks")
+    print("Collection count from inside ingest:", coll.count())
+    # With persistent Chroma, no explicit persist() call is needed.
+
 
-    for root, _, files in os.walk(data_dir):
+def _app_state_paths() -> Tuple[set, set]:
+    """
+    (files, directories) the app itself writes: caches, indexes and traces,
+    which live under data/ by default. Not documents, so scans skip them.
+    """
+    from app.core.answer_cache import ANSWER_CACHE_PATH
+    from app.core.db import DB_PATH_ABS
+    from app.core.embedding_cache import EMBEDDING_CACHE_PATH
+    from app.core.lexical_index import LEXICAL_INDEX_PATH
+    from app.core.mmap_store import MMAP_STORE_DIR
+    from app.core.tracing import TRACING_FILE_PATH
+    from app.core.vector_store import PERSIST_DIR_ABS
+    from app.ingestion.ingestion_index import INGEST_MANIFEST_PATH
+    from app.ingestion.pdf_text import PDF_TEXT_CACHE_PATH
+
+    databases = (ANSWER_CACHE_PATH, DB_PATH_ABS, EMBEDDING_CACHE_PATH, LEXICAL_INDEX_PATH,
+                 INGEST_MANIFEST_PATH, PDF_TEXT_CACHE_PATH)
+    files = {os.path.abspath(str(p)) + suffix for p in databases for suffix in ("", "-wal", "-shm", "-journal")}
+    files.add(os.path.abspath(TRACING_FILE_PATH))
+    return files, {os.path.abspath(MMAP_STORE_DIR), os.path.abspath(PERSIST_DIR_ABS)}
+
+
+def _scan_folder(data_dir: str, manifest: IngestManifest) -> List[str]:
+    paths = []
+    state_files, state_dirs = _app_state_paths()
+    for root, dirs, files in os.walk(data_dir):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) not in state_dirs]
         for filename in files:
             path = os.path.join(root, filename)
+            if os.path.abspath(path) in state_files:
+                continue
+            if not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                print(f"Skipping empty or unsupported file: {path}")
+                continue
 
             # Skip if already ingested with same content
-            if not should_ingest(path):
+            if not manifest.should_ingest(path):
                 print(f"Skipping (already ingested, unchanged): {path}")
                 continue
+            paths.append(path)
+    return paths
+
+
+def _run_pipeline(coll, manifest: IngestManifest, paths: List[str], workers: int,
+                  embed_batch_size: int, data_dir: str = INGEST_DATA_DIR) -> None:
+    progress = _Progress(total_files=len(paths))
+    embed_q: "queue.Queue" = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    write_q: "queue.Queue" = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    failed = threading.Event()
+    errors: List[BaseException] = []
+
+    stages = [
+        threading.Thread(
+            target=_run_stage,
+            args=(_embed_stage, errors, failed, embed_q, write_q, progress, failed),
+            name="ingest-embed",
+            daemon=True,
+        ),
+        threading.Thread(
+            target=_run_stage,
+            args=(_write_stage, errors, failed, coll, manifest, write_q, progress, failed),
+            name="ingest-write",
+            daemon=True,
+        ),
+    ]
+    for t in stages:
+        t.start()
 
-            content = load_file(path)
-            if not content.strip():
+    file_count = 0
+    chunk_count = 0
+    batch = _Batch()
+    try:
+        # PDFs only: the PDF text cache is the one parse step that needs the hash
+        versions = {p: manifest.checked_version(p) for p in paths if p.lower().endswith(".pdf")}
+        for path, chunks, error in _iter_parsed(paths, workers, versions):
+            progress.add(files_parsed=1)
+            if error:
+                print(f"Failed to parse {path}: {error}")
+                continue
+
+            to_write, stale = _plan_file(coll, path, chunks)
+            batch.delete_ids.extend(stale)
+            if not chunks:
                 print(f"Skipping empty or unsupported file: {path}")
+                if stale:
+                    # File was emptied: drop its old chunks and forget it
+                    manifest.remove(path)
                 continue
 
             file_count += 1
-            chunks = chunk_text(content)
-            ids = [str(uuid.uuid4()) for _ in chunks]
-            metadatas = [
-                {
-                    "source": path,
-                    "chunk_index": i,
-                    "filename": filename,
-                }
-                for i in range(len(chunks))
-            ]
-
-            add_docs(coll, ids, chunks, metadatas)
-            mark_ingested(path)
-
-            chunk_count += len(chunks)
-            print(f"Ingested {len(chunks)} chunks from {path}")
-
-    print(f"Done. Files ingested: {file_count}, total chunks: {chunk_count}")
-    print("Collection count from inside ingest:", coll.count())
-    # With persistent Chroma, no explicit persist() call is needed.
+            chunk_count += len(to_write)
+            filename = os.path.basename(path)
+            # Chroma metadata can't hold None: untagged chunks have no "project" key
+            project = doc_project(path, data_dir)
+            tag = {"project": project} if project else {}
+            for n, (cid, i, chunk) in enumerate(to_write):
+                batch.ids.append(cid)
+                batch.texts.append(chunk.text)
+                batch.metadatas.append(
+                    {
+                        **chunk.metadata,
+                        **tag,
+                        "source": path,
+                        "chunk_index": i,
+                        "filename": filename,
+                        "chunker": CHUNKER_FINGERPRINT,
+                    }
+                )
+                if len(batch) >= embed_batch_size and n < len(to_write) - 1:
+                    _put(embed_q, batch, failed)
+                    batch = _Batch()
+            batch.completed_paths.append(path)
+            if len(batch) >= embed_batch_size:
+                _put(embed_q, batch, failed)
+                batch = _Batch()
+            print(
+                f"Parsed {len(chunks)} chunks from {path}: "
+                f"{len(to_write)} new/changed, {len(chunks) - len(to_write)} unchanged, "
+                f"{len(stale)} stale"
+            )
+
+        if len(batch) or batch.delete_ids or batch.completed_paths:
+            _put(embed_q, batch, failed)
+        _put(embed_q, _STOP, failed)
+    except BaseException:
+        failed.set()
+        if not errors:
+            raise
+    finally:
+        for t in stages:
+            t.join()
+
+    if errors:
+        raise errors[0]
+
+    print(progress.summary())
+    print(f"Done. Files ingested: {file_count}, chunks written: {chunk_count}")
+
+
+def ingest_paths(coll, manifest: IngestManifest, paths: List[str],
+                 workers: int = INGEST_WORKERS,
+                 embed_batch_size: int = INGEST_EMBED_BATCH_SIZE,
+                 data_dir: str = INGEST_DATA_DIR) -> int:
+    """
+    Ingest an explicit list of new / modified files through the same
+    pipeline as ingest_folder, without walking the tree. Returns the
+    number of files that actually needed ingesting.
+    """
+    todo = [
+        p for p in dict.fromkeys(paths)
+        if p.lower().endswith(SUPPORTED_EXTENSIONS)
+        and os.path.isfile(p)
+        and manifest.should_ingest(p)
+    ]
+    if todo:
+        # Small event batches are parsed inline instead of spawning a pool
+        workers = 1 if len(todo) <= INGEST_INLINE_MAX_FILES else min(workers, len(todo))
+        _run_pipeline(coll, manifest, todo, workers, embed_batch_size, data_dir)
+    return len(todo)
+
+
+def remove_sources(coll, manifest: IngestManifest, paths: List[str]) -> int:
+    """
+    Delete all chunks of the given source files and forget them in the
+    manifest. Returns the number of chunks removed.
+    """
+    from app.core.vector_store import delete_docs, get_doc_ids
+
+    removed = 0
+    for path in paths:
+        ids = get_doc_ids(coll, where={"source": path})
+        delete_docs(coll, ids)
+        manifest.remove(path)
+        removed += len(ids)
+        print(f"Removed {len(ids)} chunks of deleted file {path}")
+    manifest.commit()
+    return removed
+
+
+def prune_missing_sources(coll, manifest: IngestManifest, page_size: int = 1000) -> int:
+    """
+    Delete chunks whose source file no longer exists, and drop those files
+    from the manifest. Returns the number of chunks removed.
+    """
+    from app.core.vector_store import delete_docs
+
+    stale_ids: List[str] = []
+    missing_sources = set()
+    offset = 0
+    while True:
+        results = coll.get(include=["metadatas"], limit=page_size, offset=offset)
+        ids = results.get("ids", [])
+        if not ids:
+            break
+        for cid, md in zip(ids, results.get("metadatas") or []):
+            source = (md or {}).get("source")
+            if source and not os.path.exists(source):
+                stale_ids.append(cid)
+                missing_sources.add(source)
+        offset += page_size
+
+    for start in range(0, len(stale_ids), page_size):
+        delete_docs(coll, stale_ids[start:start + page_size])
+    for source in missing_sources:
+        manifest.remove(source)
+    manifest.commit()
+
+    print(f"Pruned {len(stale_ids)} chunks from {len(missing_sources)} missing files")
+    return len(stale_ids)
+
+
+def tag_projects(coll, data_dir: str = INGEST_DATA_DIR, page_size: int = 1000) -> int:
+    """
+    Set the project tag of every stored chunk from its source path, without
+    re-embedding, e.g. for chunks ingested before tags existed. Returns the
+    number of chunks re-tagged.
+    """
+    from app.core.vector_store import set_projects
+
+    ids: List[str] = []
+    projects: List[Optional[str]] = []
+    offset = 0
+    while True:
+        results = coll.get(include=["metadatas"], limit=page_size, offset=offset)
+        batch_ids = results.get("ids", [])
+        if not batch_ids:
+            break
+        for cid, md in zip(batch_ids, results.get("metadatas") or []):
+            source = (md or {}).get("source")
+            project = doc_project(source, data_dir) if source else None
+            if (md or {}).get("project") != project:
+                ids.append(cid)
+                projects.append(project)
+        offset += page_size
+
+    for start in range(0, len(ids), page_size):
+        set_projects(coll, ids[start:start + page_size], projects[start:start + page_size])
+    print(f"Re-tagged {len(ids)} chunks with their project")
+    return len(ids)
 
 if __name__ == "__main__":
-    ingest_folder()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest documents into Chroma")
+    parser.add_argument("--data-dir", default=INGEST_DATA_DIR)
+    parser.add_argument("--collection", default=INGEST_COLLECTION_NAME)
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="also remove chunks whose source files no longer exist",
+    )
+    parser.add_argument(
+        "--tag-projects",
+        action="store_true",
+        help="only (re)set the project tag of stored chunks from their folders",
+    )
+    args = parser.parse_args()
+    if args.tag_projects:
+        from app.core.vector_store import get_collection
+
+        tag_projects(get_collection(args.collection), args.data_dir)
+    else:
+        ingest_folder(args.data_dir, args.collection, prune=args.prune)
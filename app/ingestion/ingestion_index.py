@@ -1,60 +1,257 @@
 # ingestion_index.py
-import json
-from pathlib import Path
 import os
+import json
+import sqlite3
 import hashlib
-from typing import Dict, Any
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
 
-INDEX_PATH = Path(".product_atlas_ingested.json")
+from app.ingestion.chunking import CHUNKER_FINGERPRINT
 
+# Resolve project root (one level above app/)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
-def _load_index() -> Dict[str, Any]:
-    if not INDEX_PATH.exists():
-        return {}
-    with open(INDEX_PATH, "r") as f:
-        return json.load(f)
+# SQLite manifest of what has been ingested (relative to the project root)
+INGEST_MANIFEST_PATH = PROJECT_ROOT / os.getenv(
+    "INGEST_MANIFEST_PATH", "data/.product_atlas_ingested.db"
+)
 
+# Old JSON manifest, imported once into the SQLite one if present
+LEGACY_INDEX_PATH = PROJECT_ROOT / "data" / ".product_atlas_ingested.json"
 
-def _save_index(index: Dict[str, Any]) -> None:
-    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(INDEX_PATH, "w") as f:
-        json.dump(index, f, indent=2)
+# (size, mtime_ns, inode) as returned by _stat_key
+StatKey = Tuple[int, int, int]
 
 
-def compute_doc_id(path: Path) -> str:
+def compute_doc_id(path: str) -> str:
     # Stable id: absolute path string
-    return str(path.resolve())
+    return str(Path(path).resolve())
 
 
-def compute_doc_version(path: Path) -> str:
-    # Simple version: content hash; you can use mtime instead
+def compute_doc_version(path: str) -> str:
+    # Content hash; if file is missing or unreadable, return empty string
     h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return ""
     return h.hexdigest()
 
 
-def should_ingest(path: Path) -> bool:
-    index = _load_index()
-    doc_id = compute_doc_id(path)
-    new_version = compute_doc_version(path)
-    record = index.get(doc_id)
+def _stat_key(path: str) -> Optional[StatKey]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class IngestManifest:
+    """
+    Indexed record of ingested files, backed by SQLite.
+
+    All rows are loaded once when the manifest is opened. `should_ingest`
+    compares (size, mtime_ns, inode) first and only hashes the file when
+    those changed. `mark_ingested` buffers rows that are written in a single
+    transaction by `commit`, so a crash leaves the previous state intact.
+    Files recorded with different chunker settings are ingested again.
+    """
+
+    def __init__(self, path: Path = INGEST_MANIFEST_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Used from the ingest writer thread as well; access is serialized by _lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ingested_files (
+                doc_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                version TEXT NOT NULL,
+                size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                ingested_at TEXT NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(ingested_files)")}
+        if "chunker" not in columns:
+            # Rows from before the column existed were chunked by the fixed chunker
+            self._conn.execute("ALTER TABLE ingested_files ADD COLUMN chunker TEXT")
+        self._conn.commit()
+
+        self._records: Dict[str, Dict[str, Any]] = {}
+        # doc_id -> (stat, version) seen by should_ingest, reused by mark_ingested
+        self._checked: Dict[str, Tuple[Optional[StatKey], str]] = {}
+        self._pending: Dict[str, Tuple[Any, ...]] = {}
+        self._load()
+
+    # ---------- Loading ----------
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT doc_id, path, version, size, mtime_ns, inode, chunker FROM ingested_files"
+        ).fetchall()
+        if not rows:
+            self._import_legacy_json()
+            return
+        for doc_id, path, version, size, mtime_ns, inode, chunker in rows:
+            stat = (size, mtime_ns, inode) if size is not None else None
+            self._records[doc_id] = {"path": path, "version": version, "stat": stat, "chunker": chunker}
+
+    def _import_legacy_json(self) -> None:
+        if not LEGACY_INDEX_PATH.exists():
+            return
+        try:
+            with open(LEGACY_INDEX_PATH, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            legacy = json.loads(content) if content else {}
+        except (OSError, json.JSONDecodeError):
+            return
+        for doc_id, record in legacy.items():
+            version = record.get("version")
+            if not version:
+                continue
+            # No stat info yet: the first run hashes once, then takes the fast path
+            self._records[doc_id] = {
+                "path": record.get("path", doc_id),
+                "version": version,
+                "stat": None,
+                "chunker": None,
+            }
+            self._pending[doc_id] = (
+                doc_id, record.get("path", doc_id), version, None, None, None, _now_iso(), None
+            )
+        self.commit()
+        print(f"Imported {len(legacy)} entries from {LEGACY_INDEX_PATH}")
+
+    # ---------- Queries ----------
+
+    def should_ingest(self, path: str) -> bool:
+        doc_id = compute_doc_id(path)
+        stat = _stat_key(path)
+        with self._lock:
+            record = self._records.get(doc_id)
+        if record and record["chunker"] != CHUNKER_FINGERPRINT:
+            # Chunked with other settings: re-chunk (chunks that come out the same keep their ids)
+            return True
+        if record and stat is not None and record["stat"] == stat:
+            # Fast path: same size, mtime and inode -> unchanged, no hashing
+            return False
+
+        new_version = compute_doc_version(path)
+        if not new_version:
+            # If we couldn't compute a version, better to try ingesting (and fail loudly)
+            return True
+
+        with self._lock:
+            self._checked[doc_id] = (stat, new_version)
+            if record and record["version"] == new_version:
+                # Content unchanged (touched / copied): refresh the stat info only
+                self._set(doc_id, path, new_version, stat, CHUNKER_FINGERPRINT)
+                return False
+
+        # Either new file or changed content
+        return True
+
+    def checked_version(self, path: str) -> Optional[str]:
+        """
+        Content hash should_ingest took for `path`, if it hashed the file.
+        """
+        with self._lock:
+            checked = self._checked.get(compute_doc_id(path))
+        return checked[1] if checked else None
+
+    def doc_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._records)
+
+    def paths_under(self, directory: str) -> List[str]:
+        """
+        Recorded paths of all files below `directory` (e.g. a removed folder).
+        """
+        prefix = compute_doc_id(directory) + os.sep
+        with self._lock:
+            return [r["path"] for doc_id, r in self._records.items() if doc_id.startswith(prefix)]
+
+    def __contains__(self, path: str) -> bool:
+        with self._lock:
+            return compute_doc_id(path) in self._records
+
+    # ---------- Updates ----------
+
+    def mark_ingested(self, path: str, chunker: Optional[str] = CHUNKER_FINGERPRINT) -> None:
+        """
+        Record `path` as ingested, reusing the stat/hash taken by should_ingest
+        (i.e. the state *before* the file was read). Buffered until commit().
+        `chunker` is the CHUNKER_FINGERPRINT the file's chunks were made with.
+        """
+        doc_id = compute_doc_id(path)
+        with self._lock:
+            checked = self._checked.pop(doc_id, None)
+        if checked is None:
+            checked = (_stat_key(path), compute_doc_version(path))
+        stat, version = checked
+        with self._lock:
+            self._set(doc_id, path, version, stat, chunker)
+
+    def remove(self, path: str) -> None:
+        doc_id = compute_doc_id(path)
+        with self._lock:
+            self._records.pop(doc_id, None)
+            self._checked.pop(doc_id, None)
+            self._pending[doc_id] = None
+
+    def _set(self, doc_id: str, path: str, version: str, stat: Optional[StatKey],
+             chunker: Optional[str]) -> None:
+        # Caller holds _lock
+        size, mtime_ns, inode = stat if stat is not None else (None, None, None)
+        self._records[doc_id] = {"path": path, "version": version, "stat": stat, "chunker": chunker}
+        self._pending[doc_id] = (doc_id, path, version, size, mtime_ns, inode, _now_iso(), chunker)
+
+    def commit(self) -> None:
+        """
+        Write all buffered changes in one transaction.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            upserts = [row for row in pending.values() if row is not None]
+            deletes = [(doc_id,) for doc_id, row in pending.items() if row is None]
+            with self._conn:
+                if deletes:
+                    self._conn.executemany(
+                        "DELETE FROM ingested_files WHERE doc_id = ?", deletes
+                    )
+                if upserts:
+                    self._conn.executemany(
+                        """
+                        INSERT OR REPLACE INTO ingested_files
+                            (doc_id, path, version, size, mtime_ns, inode, ingested_at, chunker)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        upserts,
+                    )
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
 
-    if record and record.get("version") == new_version:
-        # Already ingested and unchanged
-        return False
+    def __enter__(self) -> "IngestManifest":
+        return self
 
-    # Either new file or changed content
-    return True
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
 
 
-def mark_ingested(path: Path) -> None:
-    index = _load_index()
-    doc_id = compute_doc_id(path)
-    version = compute_doc_version(path)
-    index[doc_id] = {
-        "version": version,
-        "path": str(path),
-    }
-    _save_index(index)
+def _now_iso() -> str:
+    return datetime.utcnow().isoformat()
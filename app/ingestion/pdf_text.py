@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from app.ingestion.ingestion_index import compute_doc_version
+
+# Resolve project root (one level above app/)
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+PDF_TEXT_CACHE_ENABLED = os.getenv("PDF_TEXT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Relative paths are resolved against the project root
+PDF_TEXT_CACHE_PATH = str(PROJECT_ROOT / os.getenv("PDF_TEXT_CACHE_PATH", "data/pdf_text_cache.db"))
+# LRU bound, in files
+PDF_TEXT_CACHE_MAX_FILES = int(os.getenv("PDF_TEXT_CACHE_MAX_FILES", "5000"))
+# PDFs with at least this many (uncached) pages are extracted in page ranges on several processes
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))
+
+# Pages read from / written to the cache per statement
+_PAGE_BATCH = 50
+
+
+class PdfTextCache:
+    """
+    On-disk cache of extracted PDF text keyed by (file content hash, page
+    number), so an unchanged PDF is never handed to pypdf again. A file's
+    pages can be written by several processes; it counts as cached once
+    mark_complete() recorded its page count.
+    """
+
+    def __init__(self, path: str = PDF_TEXT_CACHE_PATH, max_files: int = PDF_TEXT_CACHE_MAX_FILES):
+        self.path = path
+        self.max_files = max_files
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Parser processes write concurrently
+        self._conn.execute("PRAGMA busy_timeout=10000")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pdf_pages (
+                    file_hash TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (file_hash, page)
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pdf_files (
+                    file_hash TEXT PRIMARY KEY,
+                    pages INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pdf_files_last_used ON pdf_files (last_used)")
+
+    def page_count(self, file_hash: str) -> Optional[int]:
+        """
+        Number of pages if the whole file is cached, else None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pages FROM pdf_files WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE pdf_files SET last_used = ? WHERE file_hash = ?", (time.time(), file_hash)
+                )
+        return row[0]
+
+    def cached_pages(self, file_hash: str) -> Set[int]:
+        with self._lock:
+            return {
+                page for (page,) in self._conn.execute(
+                    "SELECT page FROM pdf_pages WHERE file_hash = ?", (file_hash,)
+                )
+            }
+
+    def get_pages(self, file_hash: str, start: int, end: int) -> List[str]:
+        """
+        Text of pages [start, end), "" for pages that aren't cached.
+        """
+        with self._lock:
+            found = dict(self._conn.execute(
+                "SELECT page, text FROM pdf_pages WHERE file_hash = ? AND page >= ? AND page < ?",
+                (file_hash, start, end),
+            ).fetchall())
+        return [found.get(page, "") for page in range(start, end)]
+
+    def iter_pages(self, file_hash: str, pages: int) -> Iterator[str]:
+        # Batched so neither the whole text nor the lock is held while the caller consumes it
+        for start in range(0, pages, _PAGE_BATCH):
+            yield from self.get_pages(file_hash, start, min(start + _PAGE_BATCH, pages))
+
+    def put_pages(self, file_hash: str, pages: Sequence[Tuple[int, str]]) -> None:
+        if not pages:
+            return
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO pdf_pages (file_hash, page, text) VALUES (?, ?, ?)",
+                    [(file_hash, page, text) for page, text in pages],
+                )
+
+    def mark_complete(self, file_hash: str, pages: int) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pdf_files (file_hash, pages, last_used) VALUES (?, ?, ?)",
+                    (file_hash, pages, time.time()),
+                )
+                self._evict()
+
+    def _evict(self) -> None:
+        # Caller holds _lock inside a transaction. Trim to 90% to amortize.
+        count = self._conn.execute("SELECT COUNT(*) FROM pdf_files").fetchone()[0]
+        if count <= self.max_files:
+            return
+        stale = [
+            (h,) for (h,) in self._conn.execute(
+                "SELECT file_hash FROM pdf_files ORDER BY last_used ASC LIMIT ?",
+                (count - int(self.max_files * 0.9),),
+            ).fetchall()
+        ]
+        self._conn.executemany("DELETE FROM pdf_pages WHERE file_hash = ?", stale)
+        self._conn.executemany("DELETE FROM pdf_files WHERE file_hash = ?", stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM pdf_pages")
+                self._conn.execute("DELETE FROM pdf_files")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[PdfTextCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_pdf_text_cache() -> Optional[PdfTextCache]:
+    """
+    Per-process cache (each parser process opens its own connection), or
+    None when PDF_TEXT_CACHE_ENABLED is off.
+    """
+    global _cache
+    if not PDF_TEXT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PdfTextCache()
+    return _cache
+
+
+def _open_reader(f):
+    # pypdf is imported on first use: it is a noticeable share of importing the ingest pipeline
+    from pypdf import PdfReader
+    return PdfReader(f)
+
+
+def _file_hash(path: str, known: Optional[str] = None) -> Optional[str]:
+    # None when there is no cache to look the file up in. `known` is the
+    # content hash the ingest manifest already took; hash only without it.
+    if get_pdf_text_cache() is None:
+        return None
+    return known or compute_doc_version(path) or None
+
+
+def _extract_pages(reader, cache: Optional[PdfTextCache], file_hash: Optional[str]) -> Iterator[str]:
+    # Pages of an open reader in order; pages cached by an interrupted run are reused
+    cached = cache.cached_pages(file_hash) if file_hash is not None else set()
+    fresh: List[Tuple[int, str]] = []
+    for number, page in enumerate(reader.pages):
+        if number in cached:
+            text = cache.get_pages(file_hash, number, number + 1)[0]
+        else:
+            text = page.extract_text() or ""
+            fresh.append((number, text))
+        if file_hash is not None and len(fresh) >= _PAGE_BATCH:
+            cache.put_pages(file_hash, fresh)
+            fresh = []
+        yield text
+    if file_hash is not None:
+        cache.put_pages(file_hash, fresh)
+        cache.mark_complete(file_hash, len(reader.pages))
+
+
+def iter_pdf_pages(path: str, file_hash: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the text of each page in order, as it is extracted (or read from
+    the cache), so callers can chunk a large PDF without holding all of it.
+    `file_hash`: the file's content hash (compute_doc_version) if known.
+    """
+    cache = get_pdf_text_cache()
+    file_hash = _file_hash(path, file_hash)
+    if file_hash is not None:
+        pages = cache.page_count(file_hash)
+        if pages is not None:
+            yield from cache.iter_pages(file_hash, pages)
+            return
+
+    # A file object, not a path: pypdf would read the whole file into memory
+    with open(path, "rb") as f:
+        yield from _extract_pages(_open_reader(f), cache, file_hash)
+
+
+def parse_pdf_or_split(path: str, parse: Callable[[Iterator[str]], Any], file_hash: Optional[str] = None,
+                       min_pages: int = PDF_PARALLEL_MIN_PAGES) -> Tuple[Any, Optional[Tuple[Optional[str], int]]]:
+    """
+    Open `path` once and either stream its pages into `parse` ->
+    (result, None), or, when it has at least `min_pages` pages and isn't
+    cached yet, leave it for extract_page_range tasks -> (None, (file hash, page count)).
+    `file_hash` as in iter_pdf_pages().
+    """
+    cache = get_pdf_text_cache()
+    file_hash = _file_hash(path, file_hash)
+    if file_hash is not None:
+        pages = cache.page_count(file_hash)
+        if pages is not None:
+            return parse(cache.iter_pages(file_hash, pages)), None
+
+    with open(path, "rb") as f:
+        reader = _open_reader(f)
+        pages = len(reader.pages)
+        if pages >= min_pages:
+            return None, (file_hash, pages)
+        return parse(_extract_pages(reader, cache, file_hash)), None
+
+
+def extract_page_range(path: str, file_hash: Optional[str], start: int, end: int) -> List[str]:
+    """
+    Extract pages [start, end); a parallel extraction task. With the cache
+    the pages are stored there and [] is returned, so the text doesn't travel
+    back to (and pile up in) the parent; without it, their text is returned.
+    Pages already cached (from an interrupted run) are not extracted again.
+    """
+    cache = get_pdf_text_cache() if file_hash is not None else None
+    have = cache.cached_pages(file_hash) if cache is not None else set()
+    texts: List[str] = []
+    fresh: List[Tuple[int, str]] = []
+    with open(path, "rb") as f:
+        reader = _open_reader(f)
+        for number in range(start, end):
+            if number in have:
+                continue
+            text = reader.pages[number].extract_text() or ""
+            if cache is None:
+                texts.append(text)
+            else:
+                fresh.append((number, text))
+                if len(fresh) >= _PAGE_BATCH:
+                    cache.put_pages(file_hash, fresh)
+                    fresh = []
+    if cache is not None:
+        cache.put_pages(file_hash, fresh)
+    return texts
+
+
+def complete_split(file_hash: Optional[str], pages: int) -> Optional[Iterator[str]]:
+    """
+    Record a file extracted by extract_page_range tasks as fully cached and
+    return its pages streamed from the cache, or None if they aren't all there.
+    """
+    cache = get_pdf_text_cache()
+    if cache is None or file_hash is None or len(cache.cached_pages(file_hash)) != pages:
+        return None
+    cache.mark_complete(file_hash, pages)
+    return cache.iter_pages(file_hash, pages)
@@ -0,0 +1,111 @@
+import os
+import time
+from typing import List
+
+from watchfiles import Change, watch
+
+from app.ingestion.ingest import (
+    INGEST_COLLECTION_NAME,
+    INGEST_DATA_DIR,
+    SUPPORTED_EXTENSIONS,
+    ingest_folder,
+    ingest_paths,
+    remove_sources,
+)
+from app.ingestion.ingestion_index import IngestManifest
+
+# Quiet period (ms) that closes a burst of filesystem events
+INGEST_WATCH_DEBOUNCE_MS = int(os.getenv("INGEST_WATCH_DEBOUNCE_MS", "1000"))
+
+
+def _as_source_path(data_dir: str, abs_path: str) -> str:
+    # Keep sources spelled like os.walk(data_dir) does, so the chunk
+    # metadata written by ingest_folder and by the watcher match.
+    return os.path.join(data_dir, os.path.relpath(abs_path, os.path.abspath(data_dir)))
+
+
+def _is_relevant(change: Change, path: str) -> bool:
+    if os.path.basename(path).startswith("."):
+        return False
+    # Directories matter too: a folder moved in or deleted carries its files with it
+    return (
+        path.lower().endswith(SUPPORTED_EXTENSIONS)
+        or change == Change.deleted
+        or os.path.isdir(path)
+    )
+
+
+def _expand_dir(path: str) -> List[str]:
+    return [
+        os.path.join(root, f)
+        for root, _, files in os.walk(path)
+        for f in files
+        if f.lower().endswith(SUPPORTED_EXTENSIONS)
+    ]
+
+
+def watch_folder(
+    data_dir: str = INGEST_DATA_DIR,
+    collection_name: str = INGEST_COLLECTION_NAME,
+    debounce_ms: int = INGEST_WATCH_DEBOUNCE_MS,
+    initial_scan: bool = True,
+    stop_event=None,
+) -> None:
+    """
+    Long-running ingestion: re-ingest only the files that were created,
+    modified or deleted, as reported by filesystem events.
+    """
+    from app.core.vector_store import get_collection
+
+    if initial_scan:
+        # Catch up on anything that changed while the watcher was down
+        ingest_folder(data_dir, collection_name)
+
+    coll = get_collection(collection_name)
+    print(f"Watching {data_dir} for changes (collection '{collection_name}')")
+
+    with IngestManifest() as manifest:
+        for changes in watch(
+            data_dir,
+            watch_filter=_is_relevant,
+            debounce=debounce_ms,
+            stop_event=stop_event,
+        ):
+            started = time.monotonic()
+            # A burst may hold several events per path (e.g. an atomic save is
+            # delete + create), so act on the path's current state instead.
+            upserts: List[str] = []
+            deleted_files: List[str] = []
+            for path in sorted({_as_source_path(data_dir, p) for _, p in changes}):
+                if os.path.isfile(path):
+                    upserts.append(path)
+                elif os.path.isdir(path):
+                    upserts.extend(_expand_dir(path))
+                elif path.lower().endswith(SUPPORTED_EXTENSIONS):
+                    deleted_files.append(path)
+                else:
+                    deleted_files.extend(manifest.paths_under(path))
+
+            deleted_files = list(dict.fromkeys(deleted_files))
+            removed = remove_sources(coll, manifest, deleted_files) if deleted_files else 0
+            ingested = ingest_paths(coll, manifest, upserts, data_dir=data_dir)
+            if ingested or removed:
+                print(
+                    f"[watch] {ingested} files re-ingested, {removed} chunks removed "
+                    f"in {time.monotonic() - started:.2f}s"
+                )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Continuously ingest a folder")
+    parser.add_argument("--data-dir", default=INGEST_DATA_DIR)
+    parser.add_argument("--collection", default=INGEST_COLLECTION_NAME)
+    parser.add_argument(
+        "--no-initial-scan",
+        action="store_true",
+        help="skip the catch-up ingest of changes made while not watching",
+    )
+    args = parser.parse_args()
+    watch_folder(args.data_dir, args.collection, initial_scan=not args.no_initial_scan)
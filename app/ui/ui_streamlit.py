@@ -1,14 +1,32 @@
 import os
+import uuid
 
 import streamlit as st
-from app.core.rag import conversational_rag_answer
+from app.core.rag import conversational_rag_answer_stream
+from app.core.retrieval import RAG_RETRIEVAL_MODE, RETRIEVAL_MODES
+from app.core.rerank import RERANK_ENABLED
+from app.core.memory import build_history, refresh_summary_async
+from app.core.tracing import latency_summary
+from app.core.ollama_http import OLLAMA_READ_TIMEOUT
+from app.core.warmup import (
+    WARMUP_ON_START,
+    is_ready,
+    start_warm_up,
+    touch_session,
+    wait_until_ready,
+    warmup_status,
+)
 from app.core.db import init_schema
 from app.core.conversations_sqlite import (
     list_projects,
     create_project,
-    list_conversations,
+    set_project_doc_tag,
+    get_conversation_doc_tag,
+    list_conversations_page,
     create_conversation,
-    load_conversation_messages,
+    load_messages_page,
+    count_messages,
+    search_conversations,
     append_message,
     get_conversation,
     update_conversation_title,
@@ -17,10 +35,20 @@ from app.core.conversations_sqlite import (
 
 APP_TITLE = os.getenv("APP_TITLE", "Product Atlas")
 DEFAULT_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+# Messages rendered when a conversation is opened / per "Load earlier" click
+MESSAGES_PAGE_SIZE = int(os.getenv("UI_MESSAGES_PAGE_SIZE", "30"))
+# Conversations listed in the sidebar per "Show more" click
+CONVERSATIONS_PAGE_SIZE = int(os.getenv("UI_CONVERSATIONS_PAGE_SIZE", "30"))
+# Search hits shown per "More results" click
+SEARCH_PAGE_SIZE = int(os.getenv("UI_SEARCH_PAGE_SIZE", "10"))
 
 # Initialize DB schema
 init_schema()
 
+# Preload the LLM and embedder in the background (no-op once they are ready)
+if WARMUP_ON_START:
+    start_warm_up()
+
 st.set_page_config(page_title=APP_TITLE, layout="wide")
 
 # ----- Session state init -----
@@ -31,14 +59,41 @@ if "current_conversation_id" not in st.session_state:
     st.session_state.current_conversation_id = None
 
 if "messages" not in st.session_state:
-    st.session_state.messages = []  # list of {"role": "user"|"assistant", "content": str}
+    # Loaded tail of the conversation: {"role": "user"|"assistant", "content": str, "order_index": int}
+    st.session_state.messages = []
+
+if "conversation_pages" not in st.session_state:
+    st.session_state.conversation_pages = 1
+
+if "search_pages" not in st.session_state:
+    st.session_state.search_pages = 1
 
 if "is_renaming_conversation" not in st.session_state:
     st.session_state.is_renaming_conversation = False
 
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Keeps the model-warm heartbeat running while this session is active
+touch_session(st.session_state.session_id)
+
+
+@st.fragment(run_every=3)
+def _model_status():
+    status = warmup_status()
+    llm, embedder = status["llm"], status["embedder"]
+    if llm["status"] == "ready" and embedder["status"] in ("ready", "cold"):
+        st.caption("🟢 Model ready")
+    elif "error" in (llm["status"], embedder["status"]):
+        error = llm["error"] or embedder["error"]
+        st.caption(f"🔴 Model unavailable: {error}")
+    else:
+        st.caption("🟡 Loading model… the first answer will start once it is ready")
+
 # ----- Sidebar: compact Settings -----
 with st.sidebar:
     st.markdown("## Product Atlas")
+    _model_status()
     with st.expander("Settings", expanded=False):
         top_k = st.slider(
             "Top-k documents per question",
@@ -47,9 +102,28 @@ with st.sidebar:
             value=DEFAULT_TOP_K,
             step=1,
         )
+        retrieval_mode = st.selectbox(
+            "Retrieval mode",
+            options=RETRIEVAL_MODES,
+            index=RETRIEVAL_MODES.index(RAG_RETRIEVAL_MODE) if RAG_RETRIEVAL_MODE in RETRIEVAL_MODES else 0,
+            help="hybrid = embeddings + keyword (BM25) search, good for ticket keys and metric names",
+        )
+        use_rerank = st.checkbox(
+            "Rerank with cross-encoder",
+            value=RERANK_ENABLED,
+            help="Over-fetch candidates and keep the top-k best by a cross-encoder score",
+        )
         st.write(f"Collection: {os.getenv('INGEST_COLLECTION_NAME', 'pm_docs')}")
         st.write(f"Data dir: {os.getenv('INGEST_DATA_DIR', 'data/raw')}")
 
+        # Per-stage timings since the server started (ms; tokens_per_s in tokens/s)
+        st.markdown("**Latency**")
+        latency_rows = latency_summary()
+        if latency_rows:
+            st.dataframe(latency_rows, hide_index=True)
+        else:
+            st.caption("No requests yet.")
+
 # ----- Sidebar: compact Projects -----
 with st.sidebar:
     with st.expander("Projects", expanded=False):
@@ -66,10 +140,23 @@ with st.sidebar:
                 key="project_select",
             )
 
+        if selected_project_name:
+            selected = next(p for p in projects if p["name"] == selected_project_name)
+            # Retrieval in this project's chats only searches documents from this folder
+            doc_tag = st.text_input(
+                "Documents folder",
+                value=selected.get("doc_tag") or "",
+                key=f"doc_tag_{selected['id']}",
+                help="Top-level folder under the ingest directory; empty searches all documents",
+            )
+            if doc_tag.strip() != (selected.get("doc_tag") or ""):
+                set_project_doc_tag(selected["id"], doc_tag.strip())
+
         new_project_name = st.text_input("New project name", value="")
+        new_project_tag = st.text_input("Documents folder (optional)", value="", key="new_project_doc_tag")
         if st.button("Create project"):
             if new_project_name.strip():
-                pid = create_project(new_project_name.strip(), "")
+                pid = create_project(new_project_name.strip(), "", doc_tag=new_project_tag.strip())
                 st.session_state.current_project_id = pid
                 st.session_state.current_conversation_id = None
                 st.session_state.messages = []
@@ -93,9 +180,61 @@ if selected_project_name:
         st.session_state.current_conversation_id = None
         st.session_state.messages = []
         st.session_state.is_renaming_conversation = False
+        st.session_state.conversation_pages = 1
 
 current_project_id = st.session_state.current_project_id
 
+
+def _open_search_hit(hit):
+    # Runs as a button callback, before widgets are created, so the project
+    # selectbox can be switched to the hit's project
+    project_name = next((p["name"] for p in projects if p["id"] == hit["project_id"]), None)
+    if project_name:
+        st.session_state.project_select = project_name
+    st.session_state.current_project_id = hit["project_id"]
+    st.session_state.current_conversation_id = hit["conversation_id"]
+    st.session_state.is_renaming_conversation = False
+    st.session_state.conversation_pages = 1
+    # Load back far enough that the matching message is on screen
+    limit = MESSAGES_PAGE_SIZE
+    if hit["order_index"]:
+        limit = max(limit, count_messages(hit["conversation_id"]) - hit["order_index"] + 1)
+    st.session_state.messages = load_messages_page(hit["conversation_id"], limit=limit)
+
+
+# ----- Sidebar: search across conversation history -----
+with st.sidebar:
+    with st.expander("Search conversations", expanded=False):
+        search_text = st.text_input("Search", value="", key="conversation_search", label_visibility="collapsed",
+                                    placeholder="e.g. pricing tiers")
+        search_this_project = st.checkbox("This project only", value=False, key="search_this_project")
+        if search_text != st.session_state.get("last_search_text"):
+            st.session_state.last_search_text = search_text
+            st.session_state.search_pages = 1
+
+        if search_text.strip():
+            hits, more_hits = search_conversations(
+                search_text,
+                project_id=current_project_id if search_this_project else None,
+                limit=SEARCH_PAGE_SIZE * st.session_state.search_pages,
+            )
+            for i, hit in enumerate(hits):
+                where = "title" if hit["order_index"] is None else f"{hit['role']} #{hit['order_index']}"
+                st.button(
+                    hit.get("title") or hit["conversation_id"],
+                    key=f"search_hit_{i}",
+                    type="tertiary",
+                    on_click=_open_search_hit,
+                    args=(hit,),
+                )
+                st.caption(f"{where}: {hit['snippet']}")
+            if not hits:
+                st.write("No matches.")
+            if more_hits:
+                if st.button("More results", key="more_search_results"):
+                    st.session_state.search_pages += 1
+                    st.rerun()
+
 # ----- Sidebar: Conversations list (compact, link-like) -----
 with st.sidebar:
     col_title, col_button = st.sidebar.columns([0.6, 0.4])
@@ -114,8 +253,19 @@ with st.sidebar:
             st.rerun()
 
     conv_list = []
+    more_conversations = False
     if current_project_id:
-        conv_list = list_conversations(project_id=current_project_id)
+        cursor = None
+        for _ in range(st.session_state.conversation_pages):
+            page, cursor = list_conversations_page(
+                project_id=current_project_id,
+                limit=CONVERSATIONS_PAGE_SIZE,
+                before=cursor,
+            )
+            conv_list.extend(page)
+            if cursor is None:
+                break
+        more_conversations = cursor is not None
 
     current_conv_id = st.session_state.current_conversation_id
 
@@ -133,9 +283,13 @@ with st.sidebar:
                 # other convos: very small, text-like button
                 if st.button(title, key=f"conv_button_{cid}", type="tertiary"):
                     st.session_state.current_conversation_id = cid
-                    st.session_state.messages = load_conversation_messages(cid)
+                    st.session_state.messages = load_messages_page(cid, limit=MESSAGES_PAGE_SIZE)
                     st.session_state.is_renaming_conversation = False
                     st.rerun()
+        if more_conversations:
+            if st.button("Show more", key="more_conversations_button", type="tertiary"):
+                st.session_state.conversation_pages += 1
+                st.rerun()
     else:
         st.write("No conversations yet. Click 'New chat' to start one.")
 
@@ -184,11 +338,13 @@ if current_conv_id and st.session_state.confirm_delete_conv:
             st.session_state.is_renaming_conversation = False
 
             # Reload conversations for current project
-            convs_after = list_conversations(project_id=st.session_state.current_project_id)
+            convs_after, _ = list_conversations_page(
+                project_id=st.session_state.current_project_id, limit=1
+            )
             if convs_after:
                 first_conv = convs_after[0]
                 st.session_state.current_conversation_id = first_conv["id"]
-                st.session_state.messages = load_conversation_messages(first_conv["id"])
+                st.session_state.messages = load_messages_page(first_conv["id"], limit=MESSAGES_PAGE_SIZE)
             else:
                 st.session_state.current_conversation_id = None
                 st.session_state.messages = []
@@ -224,6 +380,18 @@ st.markdown("---")
 
 
 # ----- Main area: chat history -----
+# Only the loaded tail is rendered; older pages are fetched on demand
+loaded = st.session_state.messages
+if current_conv_id and loaded and loaded[0].get("order_index", 1) > 1:
+    if st.button("Load earlier messages", key="load_earlier_button", type="tertiary"):
+        older = load_messages_page(
+            current_conv_id,
+            limit=MESSAGES_PAGE_SIZE,
+            before_index=loaded[0]["order_index"],
+        )
+        st.session_state.messages = older + loaded
+        st.rerun()
+
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
@@ -254,25 +422,36 @@ if user_input:
         update_conversation_title(conv_id, title)
 
     # Save user message
-    append_message(conv_id, "user", user_input)
-    st.session_state.messages.append({"role": "user", "content": user_input})
+    user_index = append_message(conv_id, "user", user_input)
+    st.session_state.messages.append({"role": "user", "content": user_input, "order_index": user_index})
 
     with st.chat_message("user"):
         st.markdown(user_input)
 
-    # Build history for LLM (all messages so far)
-    history_for_llm = st.session_state.messages.copy()
+    # Build bounded history for LLM: rolling summary + recent turns within a token budget
+    # (the current question is passed separately as user_message)
+    history_for_llm = build_history(conv_id, st.session_state.messages[:-1])
 
-    # Get assistant answer via conversational RAG
+    # Get assistant answer via conversational RAG, rendering tokens as they arrive
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            answer = conversational_rag_answer(
+        if not is_ready("llm"):
+            with st.spinner("Loading the model… this only happens after a restart or a long idle period"):
+                start_warm_up(embedder=False)
+                wait_until_ready("llm", timeout=OLLAMA_READ_TIMEOUT)
+        answer = st.write_stream(
+            conversational_rag_answer_stream(
                 user_message=user_input,
                 history=history_for_llm,
                 k=top_k,
+                mode=retrieval_mode,
+                rerank=use_rerank,
+                project=get_conversation_doc_tag(conv_id),
             )
-            st.markdown(answer)
+        )
+
+    # Save assistant message once the stream has completed
+    answer_index = append_message(conv_id, "assistant", answer)
+    st.session_state.messages.append({"role": "assistant", "content": answer, "order_index": answer_index})
 
-    # Save assistant message
-    append_message(conv_id, "assistant", answer)
-    st.session_state.messages.append({"role": "assistant", "content": answer})
+    # Fold older turns into the stored summary in the background
+    refresh_summary_async(conv_id)
@@ -0,0 +1,597 @@
+"""
+Component benchmarks for Product Atlas's hot paths.
+
+Runs offline: Ollama is replaced by a local stub server with fixed latency
+and token rate, the embedding model by a deterministic hashing embedder,
+and every database / index lives in a temporary directory.
+
+    python -m benchmarks.run                                  # everything
+    python -m benchmarks.run --only chunk_text,conversations  # a subset
+    python -m benchmarks.run --quick                          # smaller sizes, fewer repeats
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json   # exit 1 on regression
+
+Results are written as JSON (--out); timings are in milliseconds.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.stubs import (  # noqa: E402
+    StubOllamaServer,
+    install_stub_embedder,
+    stable_id,
+    synthetic_markdown,
+    synthetic_text,
+    write_pdf,
+)
+
+DEFAULT_OUT = PROJECT_ROOT / "benchmarks" / "results" / "latest.json"
+# A benchmark regresses when its median is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.25
+# ...and by at least this many milliseconds (ignores noise on sub-ms timings)
+NOISE_FLOOR_MS = 0.05
+
+
+# ---------- Timing ----------
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1,
+            setup: Optional[Callable[[], Any]] = None, **extra) -> Dict[str, Any]:
+    """
+    Time `fn` `repeat` times after `warmup` untimed calls. If `setup` is
+    given it runs (untimed) before every call and its return value is
+    passed to `fn`.
+    """
+    samples = []
+    for i in range(warmup + repeat):
+        arg = setup() if setup is not None else None
+        started = time.perf_counter()
+        if setup is not None:
+            fn(arg)
+        else:
+            fn()
+        if i >= warmup:
+            samples.append(time.perf_counter() - started)
+
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "median_ms": statistics.median(ms),
+        "mean_ms": statistics.fmean(ms),
+        "min_ms": ms[0],
+        "p95_ms": ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))],
+        "repeat": repeat,
+        **extra,
+    }
+
+
+class Suite:
+    def __init__(self, workdir: Path, quick: bool, repeat: Optional[int]):
+        self.workdir = workdir
+        self.quick = quick
+        self.repeat = repeat or (3 if quick else 10)
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, result: Dict[str, Any]) -> None:
+        self.results[name] = result
+        if "skipped" in result:
+            print(f"  {name:<48} skipped: {result['skipped']}")
+        else:
+            print(f"  {name:<48} median {result['median_ms']:10.3f} ms   p95 {result['p95_ms']:10.3f} ms")
+
+    def skip(self, prefix: str, reason: str) -> None:
+        self.record(prefix, {"skipped": reason})
+
+
+def _has_chromadb() -> bool:
+    try:
+        import chromadb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ---------- Benchmarks ----------
+
+
+def bench_chunk_text(s: Suite) -> None:
+    from app.ingestion.chunking import chunk_markdown, chunk_plain_text
+    from app.ingestion.ingest import chunk_text
+
+    sizes = (10_000, 100_000) if s.quick else (10_000, 100_000, 1_000_000)
+    for n_chars in sizes:
+        text = synthetic_text(n_chars // 6, seed=n_chars)[:n_chars]
+        s.record(f"chunk_text[{n_chars // 1000}k_chars]",
+                 measure(lambda: chunk_text(text), s.repeat, chars=len(text),
+                         chunks=len(chunk_text(text))))
+        s.record(f"chunk_structured[{n_chars // 1000}k_chars]",
+                 measure(lambda: chunk_plain_text(text), s.repeat, chars=len(text),
+                         chunks=len(chunk_plain_text(text))))
+    md = synthetic_markdown(40, 250, seed=1)
+    s.record("chunk_structured[md]",
+             measure(lambda: chunk_markdown(md), s.repeat, chars=len(md), chunks=len(chunk_markdown(md))))
+
+
+def bench_load_file(s: Suite) -> None:
+    from app.ingestion.ingest import load_file
+    from app.ingestion.pdf_text import get_pdf_text_cache
+
+    docs = s.workdir / "load_file"
+    docs.mkdir(exist_ok=True)
+    md = docs / "brief.md"
+    md.write_text(synthetic_markdown(40, 250, seed=1), encoding="utf-8")
+    txt = docs / "notes.txt"
+    txt.write_text(synthetic_text(40_000, seed=2), encoding="utf-8")
+    n_pages = 10 if s.quick else 50
+    pdf = docs / "spec.pdf"
+    write_pdf(str(pdf), [synthetic_text(350, seed=100 + i) for i in range(n_pages)])
+
+    s.record("load_file[md]", measure(lambda: load_file(str(md)), s.repeat, bytes=md.stat().st_size))
+    s.record("load_file[txt]", measure(lambda: load_file(str(txt)), s.repeat, bytes=txt.stat().st_size))
+    cache = get_pdf_text_cache()
+    s.record(f"load_file[pdf_{n_pages}p]",
+             measure(lambda _: load_file(str(pdf)), s.repeat, setup=cache.clear,
+                     pages=n_pages, bytes=pdf.stat().st_size))
+    s.record(f"load_file[pdf_{n_pages}p_cached]",
+             measure(lambda: load_file(str(pdf)), s.repeat, pages=n_pages, bytes=pdf.stat().st_size))
+
+
+def _make_corpus(root: Path, n_files: int) -> int:
+    root.mkdir(parents=True, exist_ok=True)
+    total = 0
+    for i in range(n_files):
+        kind = i % 3
+        if kind == 0:
+            path = root / f"brief_{i}.md"
+            path.write_text(synthetic_markdown(8, 200, seed=i), encoding="utf-8")
+        elif kind == 1:
+            path = root / f"notes_{i}.txt"
+            path.write_text(synthetic_text(1500, seed=i), encoding="utf-8")
+        else:
+            path = root / f"spec_{i}.pdf"
+            write_pdf(str(path), [synthetic_text(300, seed=i * 100 + p) for p in range(5)])
+        total += path.stat().st_size
+    return total
+
+
+def bench_ingest_folder(s: Suite) -> None:
+    if not _has_chromadb():
+        s.skip("ingest_folder", "chromadb not installed")
+        return
+    from app.ingestion.ingest import INGEST_WORKERS, ingest_folder
+
+    n_files = 12 if s.quick else 60
+    template = s.workdir / "corpus_template"
+    size = _make_corpus(template, n_files)
+    runs = iter(range(10_000))
+
+    def setup():
+        # Fresh paths and collection per run, so nothing is skipped as unchanged
+        run = next(runs)
+        folder = s.workdir / f"corpus_{run}"
+        shutil.copytree(template, folder)
+        return str(folder), f"bench_ingest_{run}"
+
+    repeat = max(1, s.repeat // 3)
+    s.record(
+        f"ingest_folder[{n_files}_files]",
+        measure(lambda args: ingest_folder(args[0], args[1], workers=INGEST_WORKERS),
+                repeat, warmup=1, setup=setup, files=n_files, bytes=size, workers=INGEST_WORKERS),
+    )
+
+
+def bench_vector_query(s: Suite) -> None:
+    if not _has_chromadb():
+        s.skip("vector_store.query", "chromadb not installed")
+        return
+    from app.core.embeddings import embed_texts
+    from app.core.vector_store import get_collection, query, upsert_docs
+
+    sizes = (1_000,) if s.quick else (1_000, 10_000, 50_000)
+    queries = [synthetic_text(12, seed=9000 + i) for i in range(20)]
+    for size in sizes:
+        coll = get_collection(f"bench_query_{size}")
+        for start in range(coll.count(), size, 1000):
+            texts = [synthetic_text(120, seed=start + i) for i in range(min(1000, size - start))]
+            ids = [stable_id(size, start + i) for i in range(len(texts))]
+            metas = [{"source": f"doc_{(start + i) // 20}.md", "chunk_index": (start + i) % 20}
+                     for i in range(len(texts))]
+            upsert_docs(coll, ids, texts, metas, embeddings=embed_texts(texts))
+        it = iter(range(10 ** 9))
+        s.record(f"vector_store.query[{size}_chunks,k=5]",
+                 measure(lambda: query(coll, queries[next(it) % len(queries)], k=5), s.repeat * 2,
+                         chunks=size))
+
+
+# Embedding width for the backend comparison (bge-small / MiniLM size; bge-m3 is 1024)
+VECTOR_BENCH_DIM = 384
+# Share of chunks in the project used for filtered queries (1 in 20 projects)
+VECTOR_BENCH_PROJECTS = 20
+
+_COLD_START = """
+import json, resource, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import numpy as np
+from app.core.vector_store import get_collection
+coll = get_collection({name!r}, backend={backend!r})
+coll.query(query_embeddings=np.ones((1, {dim}), dtype="float32"), n_results=5)
+elapsed = time.perf_counter() - started
+peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+print(json.dumps({{"ms": elapsed * 1000, "peak_rss_mb": peak_kb / 1024}}))
+"""
+
+
+def _fill_backend(coll, size: int, dim: int) -> None:
+    # Random unit vectors: search cost depends on count and width, not on content
+    rng = np.random.default_rng(size)
+    for start in range(coll.count(), size, 5000):
+        n = min(5000, size - start)
+        vectors = rng.standard_normal((n, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        coll.upsert(
+            ids=[stable_id(size, start + i) for i in range(n)],
+            documents=[f"chunk {start + i}" for i in range(n)],
+            metadatas=[{"source": f"doc_{(start + i) // 20}.md", "project": f"p{(start + i) % VECTOR_BENCH_PROJECTS}"}
+                       for i in range(n)],
+            embeddings=vectors,
+        )
+
+
+def _cold_start(backend: str, name: str, dim: int) -> Dict[str, float]:
+    # Fresh interpreter: imports + opening the collection + the first query, and peak RSS
+    code = _COLD_START.format(root=str(PROJECT_ROOT), name=name, backend=backend, dim=dim)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def bench_vector_backends(s: Suite) -> None:
+    """
+    Chroma vs the memory-mapped backend on the same vectors: cold start
+    (new process, open, first query) with its peak RSS, then warm query latency,
+    unfiltered and filtered to one project.
+    """
+    from app.core.vector_store import get_collection
+
+    sizes = (10_000,) if s.quick else (10_000, 100_000, 1_000_000)
+    backends = ["mmap"] + (["chroma"] if _has_chromadb() else [])
+    if not _has_chromadb():
+        s.skip("vector_backend[chroma]", "chromadb not installed")
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((20, VECTOR_BENCH_DIM), dtype=np.float32)
+    for size in sizes:
+        for backend in backends:
+            name = f"bench_backend_{size}"
+            coll = get_collection(name, backend=backend)
+            _fill_backend(coll, size, VECTOR_BENCH_DIM)
+            prefix = f"vector_backend[{backend},{size}_chunks]"
+
+            starts = [_cold_start(backend, name, VECTOR_BENCH_DIM) for _ in range(max(1, s.repeat // 3))]
+            ms = sorted(r["ms"] for r in starts)
+            s.record(f"{prefix}.cold_start", {
+                "median_ms": statistics.median(ms),
+                "mean_ms": statistics.fmean(ms),
+                "min_ms": ms[0],
+                "p95_ms": ms[-1],
+                "repeat": len(ms),
+                "peak_rss_mb": statistics.median(r["peak_rss_mb"] for r in starts),
+                "chunks": size,
+            })
+            it = iter(range(10 ** 9))
+            s.record(f"{prefix}.query[k=5]",
+                     measure(lambda: coll.query(query_embeddings=queries[next(it) % 20][None], n_results=5),
+                             s.repeat * 2, chunks=size))
+            s.record(f"{prefix}.query[k=5,project]",
+                     measure(lambda: coll.query(query_embeddings=queries[next(it) % 20][None], n_results=5,
+                                                where={"project": "p3"}),
+                             s.repeat * 2, chunks=size // VECTOR_BENCH_PROJECTS))
+
+
+# Entry points of the CLI tools and the UI, cheapest first
+IMPORT_BENCH_MODULES = (
+    "app.core.db",
+    "app.core.conversations_sqlite",
+    "app.core.vector_store",
+    "app.core.embeddings",
+    "app.core.retrieval",
+    "app.core.rag",
+    "app.core.batch_qa",
+    "app.ingestion.ingest",
+    "app.ui.ui_streamlit",
+)
+
+_IMPORT_TIME = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+sys.stderr.write("-- start\\n")
+sys.stderr.flush()
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - started) * 1000}}))
+"""
+
+
+def _import_time(module: str) -> Dict[str, Any]:
+    # Fresh interpreter with -X importtime: wall time of the import, plus the
+    # cumulative cost of each third-party top-level package it pulled in
+    # (interpreter startup, e.g. site, comes before the marker and is left out)
+    code = _IMPORT_TIME.format(root=str(PROJECT_ROOT), module=module)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, check=True)
+    packages: Dict[str, float] = {}
+    for line in proc.stderr.split("-- start\n", 1)[-1].splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if cumulative.strip().isdigit() and "." not in name and name != "app" \
+                and name not in sys.stdlib_module_names:
+            packages[name] = max(packages.get(name, 0.0), int(cumulative) / 1000)
+    return {"ms": json.loads(proc.stdout.strip().splitlines()[-1])["ms"], "packages": packages}
+
+
+def bench_import_time(s: Suite) -> None:
+    """
+    Cost of importing each entry point in a new process: what every CLI run
+    and worker process pays before doing any work. Imports must stay free of
+    model loading, database connections and network calls.
+    """
+    for module in IMPORT_BENCH_MODULES:
+        if module.startswith("app.ui") and importlib.util.find_spec("streamlit") is None:
+            s.skip(f"import[{module}]", "streamlit not installed")
+            continue
+        runs = [_import_time(module) for _ in range(max(3, s.repeat // 2))]
+        ms = sorted(r["ms"] for r in runs)
+        # Packages by the cost of their first import (median over runs), heaviest first
+        heaviest = sorted(
+            ((name, statistics.median(r["packages"].get(name, 0.0) for r in runs)) for name in runs[0]["packages"]),
+            key=lambda item: item[1], reverse=True,
+        )[:5]
+        s.record(f"import[{module}]", {
+            "median_ms": statistics.median(ms),
+            "mean_ms": statistics.fmean(ms),
+            "min_ms": ms[0],
+            "p95_ms": ms[-1],
+            "repeat": len(ms),
+            "heaviest": {name: round(cost, 2) for name, cost in heaviest},
+        })
+
+
+def bench_build_context(s: Suite) -> None:
+    # rag.build_context is a thin wrapper over pack_context; importing rag would pull in Chroma
+    from app.core.context_packer import pack_context
+
+    max_tokens = int(os.getenv("RAG_MAX_CONTEXT_TOKENS", "2000"))
+
+    def results(n: int) -> Dict[str, Any]:
+        # Mix of adjacent (mergeable) and unrelated chunks, like real top-k output
+        base = synthetic_text(200 * n, seed=n)
+        step = len(base) // n
+        docs, metas = [], []
+        for i in range(n):
+            start = max(0, i * step - 200)
+            docs.append(base[start:start + step + 200])
+            metas.append({"source": f"doc_{i % 3}.md", "chunk_index": i})
+        return {"documents": [docs], "metadatas": [metas]}
+
+    for n in (5, 20):
+        r = results(n)
+        s.record(f"build_context[{n}_chunks]",
+                 measure(lambda: pack_context(r, max_tokens), s.repeat * 5, chunks=n, max_tokens=max_tokens))
+
+
+def bench_conversations(s: Suite) -> None:
+    from app.core import conversations_sqlite as cs
+
+    n_messages = 200 if s.quick else 2000
+    project_id = cs.create_project("Benchmarks", "")
+    conv_id = cs.create_conversation(project_id, "Pricing tiers review")
+    for i in range(n_messages):
+        cs.append_message(conv_id, "user" if i % 2 == 0 else "assistant", synthetic_text(60, seed=i))
+    for i in range(200):
+        cs.create_conversation(project_id, synthetic_text(5, seed=50_000 + i))
+
+    it = iter(range(10 ** 9))
+    s.record("conversations.create_conversation",
+             measure(lambda: cs.create_conversation(project_id, "Bench"), s.repeat * 10))
+    s.record("conversations.append_message",
+             measure(lambda: cs.append_message(conv_id, "user", synthetic_text(60, seed=next(it))),
+                     s.repeat * 10))
+    s.record(f"conversations.load_messages_page[{n_messages}_msgs]",
+             measure(lambda: cs.load_messages_page(conv_id, limit=30), s.repeat * 10))
+    s.record(f"conversations.load_conversation_messages[{n_messages}_msgs]",
+             measure(lambda: cs.load_conversation_messages(conv_id), s.repeat))
+    s.record("conversations.list_conversations_page",
+             measure(lambda: cs.list_conversations_page(project_id, limit=30), s.repeat * 10))
+    s.record("conversations.search_conversations",
+             measure(lambda: cs.search_conversations("pricing tier", project_id=project_id), s.repeat * 5))
+    s.record("conversations.update_conversation_title",
+             measure(lambda: cs.update_conversation_title(conv_id, f"Title {next(it)}"), s.repeat * 10))
+
+    def setup():
+        cid = cs.create_conversation(project_id, "To delete")
+        for i in range(20):
+            cs.append_message(cid, "user", synthetic_text(30, seed=i))
+        return cid
+
+    s.record("conversations.delete_conversation[20_msgs]",
+             measure(cs.delete_conversation, s.repeat * 3, setup=setup))
+
+
+def bench_llm(s: Suite) -> None:
+    from app.core.llm_client import chat, chat_stream
+
+    messages = [{"role": "user", "content": synthetic_text(200, seed=7)}]
+    s.record("llm_client.chat[stub]", measure(lambda: chat(messages), s.repeat))
+
+    ttft: List[float] = []
+
+    def stream():
+        started = time.perf_counter()
+        for i, _ in enumerate(chat_stream(messages)):
+            if i == 0:
+                ttft.append((time.perf_counter() - started) * 1000)
+
+    result = measure(stream, s.repeat)
+    result["ttft_median_ms"] = statistics.median(ttft[-s.repeat:])
+    s.record("llm_client.chat_stream[stub]", result)
+
+
+BENCHMARKS: Dict[str, Callable[[Suite], None]] = {
+    "chunk_text": bench_chunk_text,
+    "load_file": bench_load_file,
+    "ingest_folder": bench_ingest_folder,
+    "vector_query": bench_vector_query,
+    "vector_backends": bench_vector_backends,
+    "build_context": bench_build_context,
+    "conversations": bench_conversations,
+    "llm": bench_llm,
+    "import_time": bench_import_time,
+}
+
+
+# ---------- Baseline comparison ----------
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float) -> Dict[str, Dict[str, Any]]:
+    """
+    Per benchmark present in both runs: ratio of medians and whether it
+    counts as a regression (slower by more than `threshold` and NOISE_FLOOR_MS).
+    """
+    out = {}
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or "median_ms" not in base or "median_ms" not in current:
+            continue
+        ratio = current["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+        delta = current["median_ms"] - base["median_ms"]
+        out[name] = {
+            "baseline_median_ms": base["median_ms"],
+            "median_ms": current["median_ms"],
+            "ratio": ratio,
+            "regression": ratio > 1 + threshold and delta > NOISE_FLOOR_MS,
+        }
+    return out
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _isolate(workdir: Path, ollama_url: str) -> None:
+    # Must run before any app module is imported: config is read at import time
+    os.environ.update({
+        "PRODUCT_ATLAS_DB": str(workdir / "product_atlas.db"),
+        "CHROMA_PERSIST_DIR": str(workdir / "chroma"),
+        "MMAP_STORE_DIR": str(workdir / "vector_index"),
+        "LEXICAL_INDEX_PATH": str(workdir / "lexical_index.db"),
+        "INGEST_MANIFEST_PATH": str(workdir / "ingested.db"),
+        "PDF_TEXT_CACHE_PATH": str(workdir / "pdf_text_cache.db"),
+        "ANSWER_CACHE_PATH": str(workdir / "answer_cache.db"),
+        "TRACING_FILE_PATH": str(workdir / "traces.jsonl"),
+        "EMBEDDING_CACHE_ENABLED": "false",
+        "EMBEDDING_MODEL_NAME": "benchmark/hash-embedder",
+        "OLLAMA_URL": ollama_url,
+        "LLM_TOKENIZER": "",
+        "INGEST_PROGRESS_EVERY": "3600",
+    })
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run Product Atlas component benchmarks")
+    parser.add_argument("--only", default="", help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs and fewer repeats")
+    parser.add_argument("--repeat", type=int, default=None, help="Base repeat count per benchmark")
+    parser.add_argument("--out", default=str(DEFAULT_OUT), help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", default=None, help="Also write the results here as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown of the median before it counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--llm-first-token-ms", type=float, default=50.0)
+    parser.add_argument("--llm-tokens-per-s", type=float, default=200.0)
+    parser.add_argument("--keep-workdir", action="store_true", help="Don't delete the temporary data directory")
+    args = parser.parse_args(argv)
+
+    selected = [b.strip() for b in args.only.split(",") if b.strip()] or list(BENCHMARKS)
+    unknown = [b for b in selected if b not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="product_atlas_bench_"))
+    server = StubOllamaServer(first_token_ms=args.llm_first_token_ms, tokens_per_s=args.llm_tokens_per_s).start()
+    _isolate(workdir, server.url)
+    install_stub_embedder()
+
+    suite = Suite(workdir, quick=args.quick, repeat=args.repeat)
+    print(f"Benchmarks ({'quick' if args.quick else 'full'}), data in {workdir}")
+    try:
+        for name in selected:
+            print(f"[{name}]")
+            BENCHMARKS[name](suite)
+    finally:
+        server.stop()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": args.quick,
+            "stub_llm": {"first_token_ms": args.llm_first_token_ms, "tokens_per_s": args.llm_tokens_per_s},
+        },
+        "results": suite.results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        comparison = compare(suite.results, baseline, args.threshold)
+        report["comparison"] = comparison
+        regressions = [n for n, c in comparison.items() if c["regression"]]
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        for name, c in comparison.items():
+            flag = "  REGRESSION" if c["regression"] else ""
+            print(f"  {name:<48} {c['baseline_median_ms']:10.3f} -> {c['median_ms']:10.3f} ms  x{c['ratio']:.2f}{flag}")
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            exit_code = 1
+
+    for path in filter(None, (args.out, args.save_baseline)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {path}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
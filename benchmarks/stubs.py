@@ -0,0 +1,295 @@
+"""
+Offline stand-ins used by the benchmark suite: a local Ollama-compatible
+HTTP server with fixed latency / token rate, a deterministic hashing
+embedder, and synthetic document generators (text, markdown, PDF).
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+
+# ---------- Stub Ollama ----------
+
+
+class StubOllamaServer:
+    """
+    Minimal Ollama API on 127.0.0.1 (/api/chat, /api/generate, /api/tags, /api/ps).
+    Every answer waits `first_token_ms`, then emits `answer_tokens` tokens
+    at `tokens_per_s`, and reports eval_count / eval_duration like Ollama.
+
+        with StubOllamaServer(first_token_ms=50, tokens_per_s=200) as server:
+            os.environ["OLLAMA_URL"] = server.url
+    """
+
+    def __init__(self, first_token_ms: float = 50.0, tokens_per_s: float = 200.0,
+                 answer_tokens: int = 32, port: int = 0):
+        self.first_token_ms = first_token_ms
+        self.tokens_per_s = tokens_per_s
+        self.answer_tokens = answer_tokens
+        self.requests = 0
+        self.loaded = set()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # no 40 ms delayed-ACK stalls on small writes
+
+            def log_message(self, *args):  # keep benchmark output clean
+                pass
+
+            def _send_json(self, body: dict, status: int = 200) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": "stub:latest"}]})
+                elif self.path == "/api/ps":
+                    self._send_json({"models": [{"name": m, "model": m} for m in sorted(stub.loaded)]})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                stub.requests += 1
+                if self.path not in ("/api/chat", "/api/generate"):
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+                chat = self.path == "/api/chat"
+                if payload.get("model"):
+                    stub.loaded.add(payload["model"])
+                if not chat and not payload.get("prompt"):
+                    # Empty generate = load the model only, like Ollama
+                    self._send_json({"model": payload.get("model"), "response": "", "done": True})
+                    return
+                limit = (payload.get("options") or {}).get("num_predict") or stub.answer_tokens
+                n_tokens = min(stub.answer_tokens, limit) if limit > 0 else stub.answer_tokens
+                prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", [])) \
+                    if chat else len(payload.get("prompt", ""))
+                if payload.get("stream", True):
+                    self._stream(chat, payload, n_tokens, prompt_chars)
+                else:
+                    started = time.perf_counter()
+                    time.sleep(stub.first_token_ms / 1000 + n_tokens / stub.tokens_per_s)
+                    text = "".join(f"tok{i} " for i in range(n_tokens))
+                    self._send_json(self._final(chat, payload, text, n_tokens, prompt_chars, started))
+
+            def _stream(self, chat, payload, n_tokens, prompt_chars):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                started = time.perf_counter()
+                time.sleep(stub.first_token_ms / 1000)
+                for i in range(n_tokens):
+                    if i:
+                        time.sleep(1 / stub.tokens_per_s)
+                    token = f"tok{i} "
+                    body = {"message": {"role": "assistant", "content": token}} if chat else {"response": token}
+                    self._chunk({"model": payload.get("model"), **body, "done": False})
+                self._chunk(self._final(chat, payload, "", n_tokens, prompt_chars, started))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, body: dict) -> None:
+                data = json.dumps(body).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            @staticmethod
+            def _final(chat, payload, text, n_tokens, prompt_chars, started) -> dict:
+                total_ns = int((time.perf_counter() - started) * 1e9)
+                eval_ns = int(n_tokens / stub.tokens_per_s * 1e9)
+                body = {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+                return {
+                    "model": payload.get("model"),
+                    **body,
+                    "done": True,
+                    "total_duration": total_ns,
+                    "load_duration": 0,
+                    "prompt_eval_count": max(1, prompt_chars // 4),
+                    "prompt_eval_duration": int(stub.first_token_ms * 1e6),
+                    "eval_count": n_tokens,
+                    "eval_duration": eval_ns,
+                }
+
+        return Handler
+
+
+# ---------- Stub embedder ----------
+
+
+class HashEmbedder:
+    """
+    Deterministic bag-of-words embedder (feature hashing into `dim` buckets).
+    Exposes the subset of SentenceTransformer.encode used by app.core.embeddings,
+    so it can be registered in place of the real model.
+    """
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+
+    def _vector(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype="float32")
+        for word in text.lower().split():
+            h = zlib.crc32(word.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 16) & 1 else -1.0
+        return vec
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = True,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **_):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        out = np.stack([self._vector(s) for s in sentences]) if sentences else \
+            np.zeros((0, self.dim), dtype="float32")
+        if normalize_embeddings and len(out):
+            norms = np.linalg.norm(out, axis=1, keepdims=True)
+            out = out / np.where(norms == 0, 1, norms)
+        return out
+
+
+def install_stub_embedder(dim: int = 64) -> HashEmbedder:
+    """
+    Register a HashEmbedder as the shared embedding model, so encode(), the
+    ingestion pipeline and the Chroma embedding function all use it.
+    """
+    from app.core import embeddings
+
+    model = HashEmbedder(dim)
+    key = (embeddings.EMBEDDING_MODEL_NAME, embeddings.EMBEDDING_DEVICE, embeddings.EMBEDDING_PRECISION)
+    with embeddings._models_lock:
+        embeddings._models[key] = model
+    return model
+
+
+# ---------- Synthetic documents ----------
+
+_VOCAB = (
+    "roadmap launch pricing tier enterprise churn retention onboarding funnel activation "
+    "metric dashboard sprint backlog okr customer interview persona segment revenue "
+    "experiment cohort conversion feature request integration api latency release "
+    "stakeholder alignment strategy competitor market discovery prototype feedback "
+    "the a of to and in for with on is that we should will by from this our"
+).split()
+
+
+def synthetic_text(n_words: int, seed: int = 0) -> str:
+    """
+    Deterministic prose-like text: sentences of vocabulary words, with a
+    paragraph break every few sentences.
+    """
+    rng = random.Random(seed)
+    sentences: List[str] = []
+    words = 0
+    while words < n_words:
+        length = rng.randint(6, 18)
+        sentence = " ".join(rng.choice(_VOCAB) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words += length
+    paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return "\n\n".join(paragraphs)
+
+
+def synthetic_markdown(n_sections: int, words_per_section: int = 200, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    parts = [f"# Product brief {seed}"]
+    for i in range(n_sections):
+        parts.append(f"## {rng.choice(_VOCAB).capitalize()} {i}")
+        parts.append(synthetic_text(words_per_section, seed=seed * 1000 + i))
+        if i % 3 == 0:
+            parts.append("\n".join(f"- {synthetic_text(8, seed=seed + i + j)}" for j in range(4)))
+    return "\n\n".join(parts)
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[str], line_chars: int = 90) -> None:
+    """
+    Write a minimal text-only PDF (Helvetica, one content stream per page)
+    without third-party dependencies; pypdf extracts the text back.
+    """
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = len(objects) + 1 + 2 * len(pages)  # reserved: placed after the page objects
+    page_ids = []
+    for text in pages:
+        words, lines, line = text.split(), [], ""
+        for w in words:
+            if line and len(line) + 1 + len(w) > line_chars:
+                lines.append(line)
+                line = w
+            else:
+                line = f"{line} {w}".strip()
+        if line:
+            lines.append(line)
+        ops = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        ops += [f"({_pdf_escape(ln)}) Tj T*" for ln in lines[:64]]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font, content)
+        ))
+    kids = b" ".join(b"%d 0 R" % p for p in page_ids)
+    assert add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))) == pages_id
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref)
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+
+def stable_id(*parts) -> str:
+    return hashlib.sha256("|".join(map(str, parts)).encode("utf-8")).hexdigest()[:32]
@@ -30,10 +30,13 @@ def main():
         ("Embeddings / Chroma", [
             "EMBEDDING_MODEL_NAME",
             "CHROMA_PERSIST_DIR",
+            "VECTOR_STORE_BACKEND",
+            "MMAP_STORE_DIR",
         ]),
         ("RAG", [
             "RAG_TOP_K",
-            "RAG_MAX_CONTEXT_CHARS",
+            "RAG_MAX_CONTEXT_TOKENS",
+            "LLM_TOKENIZER",
         ]),
         ("Ingestion / Chunking", [
             "INGEST_DATA_DIR",